@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import platform
+import threading
+import subprocess
+from config import LOG_PATH
+
+AGENT_SOCKET = os.path.expanduser("~/.alias_manager_agent.sock")
+DEFAULT_IDLE_TIMEOUT = 1800  # seconds without requests before the agent exits
+# Config, journal, snapshot, cache and Windows alias paths are derived from these when the
+# modules are imported, so the agent only serves callers that share its values.
+HOME_ENV = ("HOME", "LOCALAPPDATA")
+
+class _StreamWriter:
+    """File-like object that forwards everything written to it to the client as frames."""
+
+    def __init__(self, conn, stream):
+        self.conn = conn
+        self.stream = stream
+        self.broken = False
+
+    def write(self, text):
+        if text and not self.broken:
+            try:
+                _send(self.conn, {"stream": self.stream, "data": text})
+            except OSError:
+                # The client went away; finish the request anyway.
+                self.broken = True
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+class _NoInput:
+    """stdin for requests run in the agent: there is no terminal to prompt on."""
+
+    def readline(self, *args):
+        raise EOFError("The alias agent cannot prompt for input; pass every value as an argument")
+
+    read = readline
+
+    def isatty(self):
+        return False
+
+class AliasAgent:
+    """Keeps main.py warm in a background process and runs requests sent over a Unix socket.
+
+    Imports (paramiko and its crypto), the parsed config file, profile indexes and
+    pooled SSH sessions survive between requests, so a request pays only for the
+    work itself. Requests are newline-delimited JSON:
+
+        {"op": "run", "argv": ["--sync"], "cwd": "/home/me", "env": {"SHELL": "/bin/zsh", ...}}
+            -> output frames, then {"exit": 0}; {"refused": reason} if HOME or LOCALAPPDATA differ
+        {"op": "ping"} / {"op": "stop"}
+
+    Requests run one at a time, since each one redirects the process's stdout and
+    stderr to its client. The agent exits after `idle_timeout` seconds without requests.
+    """
+
+    def __init__(self, path=AGENT_SOCKET, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.served = 0
+        self.last_request = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sock = None
+
+    def serve_forever(self):
+        if not hasattr(socket, "AF_UNIX"):
+            raise IOError("The alias agent needs Unix domain sockets, which this platform lacks")
+        if ping(self.path) is not None:
+            raise IOError(f"An alias agent is already listening on {self.path}")
+        try:
+            os.remove(self.path)  # Left behind by an agent that was killed
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)  # Only the owner may talk to the agent
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self._sock.listen(64)
+        self._sock.settimeout(1)
+        logging.info("Alias agent listening on %s (pid %d).", self.path, os.getpid())
+        threading.Thread(target=self.warm, name="agent-warm", daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    if not self._lock.locked() and time.monotonic() - self.last_request > self.idle_timeout:
+                        logging.info("Alias agent idle for %d seconds; exiting.", self.idle_timeout)
+                        break
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), name="agent-request", daemon=True).start()
+        finally:
+            self._sock.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def warm(self):
+        """Import the heavy modules, read the config and open the remote SSH session ahead of time."""
+        try:
+            import main
+            from config import read_config
+            from ssh_pool import pool_from_config
+            config = read_config()
+            local_os = platform.system()
+            manager = main.get_local_manager(local_os)
+            if manager is not None:
+                manager.list_aliases()
+            remote_os, _ = main.get_remote_os(local_os)
+            if remote_os and config.get("remote_host") and config.get("remote_username"):
+                pool_from_config(config).get_client(config["remote_host"], config["remote_username"],
+                                                    config.get("remote_password"))
+            logging.info("Alias agent warmed up.")
+        except Exception as e:
+            logging.warning("Alias agent warm-up incomplete: %s", e)
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                request = json.loads(conn.makefile("r", encoding="utf-8").readline() or "{}")
+            except (OSError, ValueError) as e:
+                logging.warning("Bad agent request: %s", e)
+                return
+            op = request.get("op")
+            try:
+                if op == "ping":
+                    _send(conn, {"pid": os.getpid(), "started": self.started, "served": self.served})
+                elif op == "stop":
+                    self._stop.set()
+                    _send(conn, {"stopping": True})
+                elif op == "run":
+                    env = request.get("env") or {}
+                    differing = [name for name in HOME_ENV if name in env and env[name] != os.environ.get(name)]
+                    if differing:
+                        _send(conn, {"refused": f"The agent runs with a different {' and '.join(differing)}"})
+                        return
+                    env = {name: value for name, value in env.items() if name not in HOME_ENV}
+                    _send(conn, {"exit": self._run(conn, request.get("argv") or [], request.get("cwd"), env)})
+                else:
+                    _send(conn, {"error": f"Unknown request: {op}"})
+            except OSError as e:
+                logging.info("Agent client disconnected: %s", e)
+
+    def _run(self, conn, argv, cwd, env=None):
+        """Run main.main(argv) with the client's cwd and environment variables (None unsets one)."""
+        import main
+        with self._lock:
+            self.last_request = time.monotonic()
+            saved = (sys.stdin, sys.stdout, sys.stderr, sys.argv, os.getcwd())
+            saved_env = {name: os.environ.get(name) for name in env or {}}
+            _set_env(env or {})
+            sys.argv = ["main.py"] + list(argv)
+            sys.stdin = _NoInput()
+            sys.stdout = _StreamWriter(conn, "out")
+            sys.stderr = _StreamWriter(conn, "err")
+            status = 0
+            try:
+                if cwd:
+                    os.chdir(cwd)
+                main.main(argv)
+            except SystemExit as e:
+                if isinstance(e.code, int) or e.code is None:
+                    status = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    status = 1
+            except (Exception, KeyboardInterrupt) as e:
+                logging.exception("Agent request %s failed", argv)
+                print(f"Error: {e}", file=sys.stderr)
+                status = 1
+            finally:
+                sys.stdin, sys.stdout, sys.stderr, sys.argv = saved[:4]
+                os.chdir(saved[4])
+                _set_env(saved_env)
+                self.served += 1
+                self.last_request = time.monotonic()
+            return status
+
+def _set_env(values):
+    for name, value in values.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+def _send(conn, message):
+    conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+def _request(message, path=AGENT_SOCKET, timeout=2):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+        _send(sock, message)
+        return json.loads(sock.makefile("r", encoding="utf-8").readline())
+    finally:
+        sock.close()
+
+def ping(path=AGENT_SOCKET):
+    """Return the running agent's status, or None if no agent answers on `path`."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        return _request({"op": "ping"}, path)
+    except (OSError, ValueError):
+        return None
+
+def stop(path=AGENT_SOCKET):
+    try:
+        return bool(_request({"op": "stop"}, path).get("stopping"))
+    except (OSError, ValueError):
+        return False
+
+def spawn_agent(path=AGENT_SOCKET, wait=10):
+    """Start a detached agent and wait until it answers; return its status or None."""
+    status = ping(path)
+    if status is not None:
+        return status
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "run"],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     cwd=os.path.dirname(os.path.abspath(__file__)), start_new_session=True)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        status = ping(path)
+        if status is not None:
+            return status
+    return None
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if command == "run":
+        from config import read_config
+        idle_timeout = read_config().get("agent_idle_timeout", DEFAULT_IDLE_TIMEOUT)
+        try:
+            AliasAgent(idle_timeout=idle_timeout).serve_forever()
+        except IOError as e:
+            sys.exit(str(e))
+    elif command == "start":
+        status = spawn_agent()
+        if status is None:
+            sys.exit(f"The alias agent did not start; see {LOG_PATH}.")
+        print(f"Alias agent running (pid {status['pid']}).")
+    elif command == "stop":
+        print("Alias agent stopped." if stop() else "No alias agent is running.")
+    elif command == "status":
+        status = ping()
+        if status is None:
+            print("No alias agent is running.")
+            sys.exit(1)
+        print(f"Alias agent running (pid {status['pid']}), up {time.time() - status['started']:.0f}s, "
+              f"{status['served']} requests served.")
+    else:
+        sys.exit("Usage: python3 agent.py [run|start|stop|status]")
+
+if __name__ == "__main__":
+    logging.basicConfig(filename=LOG_PATH,
+                        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
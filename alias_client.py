@@ -0,0 +1,73 @@
+"""Fast entry point with the same arguments as main.py.
+
+    python3 alias_client.py --sync
+    python3 alias_client.py --alias ll --command "ls -la"
+
+When an alias agent is running (python3 agent.py start), the request is forwarded to
+it over its Unix socket and its output is streamed back, so nothing heavy is imported
+here. Without an agent, or for requests that need a terminal, main.py runs in this
+process as usual.
+"""
+import os
+import sys
+import json
+import socket
+
+AGENT_SOCKET = os.path.expanduser("~/.alias_manager_agent.sock")
+CONFIG_PATH = os.path.expanduser("~/.alias_manager_config.json")
+# Modes that never prompt; without one of them main.py needs --alias and --command.
+NON_INTERACTIVE = ("--manifest", "--history", "--restore", "--sync", "--audit", "--flush", "--search")
+# Option sets that together answer every prompt.
+ANSWERED = ({"--alias", "--command"}, {"--suggest", "--accept"})
+# Long-running modes that belong to the caller's own process.
+LOCAL_ONLY = ("--watch", "--measure-startup")
+# The caller's environment decides which profile and history file are used. HOME and
+# LOCALAPPDATA are only compared: the agent refuses callers whose values differ from its own.
+FORWARDED_ENV = ("SHELL", "HISTFILE", "HOME", "LOCALAPPDATA")
+
+def can_forward(argv):
+    if not argv or not hasattr(socket, "AF_UNIX"):
+        return False
+    options = {arg.split("=", 1)[0] for arg in argv if arg.startswith("--")}
+    if options.intersection(LOCAL_ONLY):
+        return False
+    if not options.intersection(NON_INTERACTIVE) and not any(needed <= options for needed in ANSWERED):
+        return False
+    # Without a config file main.py asks for the remote details.
+    return os.path.exists(CONFIG_PATH)
+
+def forward(argv):
+    """Run argv in the agent; return its exit status, or None if no agent is listening or it refused."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(AGENT_SOCKET)
+    except OSError:
+        sock.close()
+        return None
+    with sock:
+        request = {"op": "run", "argv": argv, "cwd": os.getcwd(),
+                   "env": {name: os.environ.get(name) for name in FORWARDED_ENV}}
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        for line in sock.makefile("r", encoding="utf-8"):
+            message = json.loads(line)
+            if "exit" in message:
+                return message["exit"]
+            if "refused" in message:
+                return None
+            stream = sys.stdout if message.get("stream") == "out" else sys.stderr
+            stream.write(message.get("data", ""))
+            stream.flush()
+    print("The alias agent closed the connection before the request finished.", file=sys.stderr)
+    return 1
+
+def main():
+    argv = sys.argv[1:]
+    if can_forward(argv):
+        status = forward(argv)
+        if status is not None:
+            sys.exit(status)
+    import main as alias_main
+    alias_main.main(argv)
+
+if __name__ == "__main__":
+    main()
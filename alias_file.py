@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import subprocess
+from atomic_file import write_atomic
+from profile_index import parse_aliases, format_alias_line
+from timing import timed
+
+ALIAS_FILE = os.path.expanduser("~/.alias_manager_aliases.sh")
+LAZY_SUFFIX = ".lazy"
+SOURCE_MARKER = "# AliasManager generated aliases"
+NEW_MARKER = "# AliasManager new aliases:"
+EAGER_LIMIT = 500
+HISTORY_BYTES = 1024 * 1024
+STARTUP_LOG = os.path.expanduser("~/.alias_manager_startup.json")
+# Builtins (and common shell functions) whose effect is lost when run in a subshell.
+STATEFUL_WORDS = {
+    ".", "source", "cd", "pushd", "popd", "export", "unset", "alias", "unalias", "set", "shopt",
+    "setopt", "unsetopt", "declare", "typeset", "local", "readonly", "eval", "exec", "exit", "logout",
+    "umask", "ulimit", "trap", "hash", "rehash", "bindkey", "autoload", "emulate", "fg", "bg", "disown",
+    "history", "fc", "activate", "deactivate", "conda", "nvm", "pyenv", "rbenv", "workon",
+}
+_SEPARATORS = re.compile(r"&&|\|\||[;&|(){}\n]")
+
+# Runs a lazily loaded alias when it is typed: looks the name up in the lazy file and runs
+# its command with the given arguments. A handler the shell already had (Ubuntu's
+# command-not-found, for one) is kept as _alias_manager_cnf_prev and still runs for any
+# other name; sourcing the file again does not chain the dispatcher to itself. Both
+# shells call the handler in a subshell, so the command cannot change the interactive
+# shell; aliases that need to stay eager for that.
+ZSH_DISPATCHER = r"""if (( ${+functions[command_not_found_handler]} )) && [[ $functions[command_not_found_handler] != *_alias_manager_cnf_prev* ]]; then
+  functions[_alias_manager_cnf_prev]=$functions[command_not_found_handler]
+fi
+command_not_found_handler() {
+  local cmd
+  cmd=$(command awk -F '\t' -v n="$1" '$1 == n { print substr($0, length(n) + 2); exit }' "%(lazy)s" 2>/dev/null)
+  if [[ -z $cmd ]]; then
+    if (( ${+functions[_alias_manager_cnf_prev]} )); then _alias_manager_cnf_prev "$@"; return; fi
+    print -u2 "zsh: command not found: $1"; return 127
+  fi
+  shift
+  eval "$cmd ${(q)@}"
+}
+"""
+
+BASH_DISPATCHER = r"""_alias_manager_cnf_def=$(declare -f command_not_found_handle)
+if [ -n "$_alias_manager_cnf_def" ] && [[ $_alias_manager_cnf_def != *_alias_manager_cnf_prev* ]]; then
+  eval "_alias_manager_cnf_prev${_alias_manager_cnf_def#command_not_found_handle}"
+fi
+unset _alias_manager_cnf_def
+command_not_found_handle() {
+  local cmd
+  cmd=$(command awk -F '\t' -v n="$1" '$1 == n { print substr($0, length(n) + 2); exit }' "%(lazy)s" 2>/dev/null)
+  if [ -z "$cmd" ]; then
+    if declare -F _alias_manager_cnf_prev >/dev/null; then _alias_manager_cnf_prev "$@"; return; fi
+    printf 'bash: %%s: command not found\n' "$1" >&2; return 127
+  fi
+  shift
+  eval "$cmd $(printf '%%q ' "$@")"
+}
+"""
+
+class GeneratedAliasFile:
+    """Aliases kept in a dedicated generated file that the shell profile sources.
+
+    The profile only gains one guarded `source` line, so its size no longer grows with
+    the alias count. For zsh the file is precompiled with zcompile, which `source` then
+    loads instead of parsing the text. With lazy=True, only aliases seen in the shell
+    history (at most eager_limit) are defined at startup; the others are kept in a
+    side file and looked up by a command-not-found dispatcher when typed. bash and zsh
+    run that dispatcher in a subshell, so aliases that change the shell's own state
+    (cd, export, source, ...) are always eager, as are aliases new since the last write,
+    which the history cannot know about yet.
+    """
+
+    def __init__(self, profile_path, shell="", path=ALIAS_FILE, lazy=False, eager_limit=EAGER_LIMIT):
+        self.profile_path = profile_path
+        self.zsh = "zsh" in shell
+        self.path = path
+        self.lazy_path = path + LAZY_SUFFIX
+        self.lazy = lazy
+        self.eager_limit = eager_limit
+
+    @timed("alias_file.load")
+    def load(self):
+        """Return every alias in the generated files, eager and lazy."""
+        aliases = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                aliases.update(parse_aliases(f))
+        if os.path.exists(self.lazy_path):
+            with open(self.lazy_path, "r") as f:
+                for line in f:
+                    name, _, command = line.rstrip("\n").partition("\t")
+                    if name:
+                        aliases[name] = command
+        return aliases
+
+    @timed("alias_file.write")
+    def write(self, aliases):
+        """Regenerate the alias files (and the zcompile output) for the given alias set."""
+        eager, lazy, new = self._split(aliases)
+        lines = [f"{SOURCE_MARKER}; do not edit, changes are overwritten.\n"]
+        if new:
+            lines.append(f"{NEW_MARKER} {' '.join(sorted(new))}\n")
+        if lazy:
+            dispatcher = ZSH_DISPATCHER if self.zsh else BASH_DISPATCHER
+            lines.append(dispatcher % {"lazy": self.lazy_path})
+        lines.extend(format_alias_line(name, eager[name]) for name in sorted(eager))
+        write_atomic(self.path, "".join(lines))
+        if lazy:
+            write_atomic(self.lazy_path, "".join(f"{name}\t{lazy[name]}\n" for name in sorted(lazy)))
+        elif os.path.exists(self.lazy_path):
+            os.remove(self.lazy_path)
+        if self.zsh:
+            self._zcompile()
+        logging.info("Generated %s with %d eager and %d lazy aliases.", self.path, len(eager), len(lazy))
+
+    def ensure_sourced(self):
+        """Add the guarded line that sources the generated file to the profile, once."""
+        with open(self.profile_path, "r") as f:
+            content = f.read()
+        if SOURCE_MARKER in content:
+            return False
+        path = self.path.replace(os.path.expanduser("~"), "$HOME", 1)
+        line = f'[ -r "{path}" ] && . "{path}"  {SOURCE_MARKER}\n'
+        with open(self.profile_path, "a") as f:
+            if content and not content.endswith("\n"):
+                f.write("\n")
+            f.write(line)
+        logging.info("Added the generated alias file to %s.", self.profile_path)
+        return True
+
+    def _split(self, aliases):
+        """Return (eager, lazy, new): new names stay eager until they turn up in the history."""
+        if not self.lazy:
+            return dict(aliases), {}, set()
+        counts = history_counts(set(aliases), self.zsh)
+        used = sorted((name for name in aliases if counts.get(name)), key=lambda n: -counts[n])
+        if os.path.exists(self.path):
+            known = set(self.load())
+            pinned = self._new_names()
+            new = {name for name in aliases
+                   if (name not in known or name in pinned) and not counts.get(name)}
+        else:
+            new = set()  # First generation: nothing is new, the history decides
+        eager_names = set(used[:self.eager_limit]) | new
+        eager_names.update(name for name, command in aliases.items() if changes_shell_state(command))
+        eager = {name: command for name, command in aliases.items() if name in eager_names}
+        lazy = {name: command for name, command in aliases.items() if name not in eager_names}
+        return eager, lazy, new
+
+    def _new_names(self):
+        with open(self.path, "r") as f:
+            for line in f:
+                if line.startswith(NEW_MARKER):
+                    return set(line[len(NEW_MARKER):].split())
+                if line.startswith("alias "):
+                    break
+        return set()
+
+    def _zcompile(self):
+        compiled = self.path + ".zwc"
+        zsh = shutil.which("zsh")
+        try:
+            if zsh is None:
+                raise OSError("zsh not found")
+            subprocess.run([zsh, "-fc", 'zcompile "$1"', "zsh", self.path], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30)
+        except (OSError, subprocess.SubprocessError) as e:
+            # A stale .zwc would be loaded instead of the new file, so never leave one behind.
+            if os.path.exists(compiled):
+                os.remove(compiled)
+            logging.warning("zcompile of %s failed: %s", self.path, e)
+
+def changes_shell_state(command):
+    """True if any simple command in `command` starts with a state changing builtin or is an assignment."""
+    for part in _SEPARATORS.split(command):
+        words = part.split()
+        while words and words[0] in ("command", "builtin", "noglob", "nocorrect", "-"):
+            words = words[1:]
+        if not words:
+            continue
+        if words[0] in STATEFUL_WORDS:
+            return True
+        if "=" in words[0] and len(words) == 1 and not words[0].startswith("="):
+            return True  # A bare VAR=value sets a shell variable
+    return False
+
+def history_counts(names, zsh=False):
+    """Count how often each alias name starts a command in the tail of the shell history."""
+    path = os.path.expanduser("~/.zsh_history" if zsh else "~/.bash_history")
+    counts = {}
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - HISTORY_BYTES))
+            data = f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return counts
+    for line in data.splitlines():
+        if line.startswith(": ") and ";" in line:
+            line = line.split(";", 1)[1]  # zsh extended history: ": <time>:<duration>;<command>"
+        words = line.split(None, 1)
+        if words and words[0] in names:
+            counts[words[0]] = counts.get(words[0], 0) + 1
+    return counts
+
+def measure_startup(shell, runs=10):
+    """Time `runs` interactive login shell startups; returns a dict of timings in seconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([shell, "-i", "-l", "-c", "exit"], stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {"shell": shell, "runs": runs, "min": timings[0], "median": timings[len(timings) // 2],
+            "mean": sum(timings) / len(timings), "time": time.time()}
+
+def record_startup(result, path=STARTUP_LOG):
+    """Append a measurement to the startup log and return the previous one for the same shell."""
+    try:
+        with open(path, "r") as f:
+            log = json.load(f)
+    except (IOError, ValueError):
+        log = []
+    previous = next((entry for entry in reversed(log) if entry["shell"] == result["shell"]), None)
+    log.append(result)
+    write_atomic(path, json.dumps(log[-100:], indent=2))
+    return previous
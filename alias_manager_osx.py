@@ -1,9 +1,14 @@
 import os
-import shutil
 import logging
+from atomic_file import write_atomic
+from config import read_config
+from manifest import coalesce_ops
+from profile_index import apply_ops_to_lines, get_profile_index
+from snapshots import SnapshotStore
+from timing import span, timed
 
 class OSXAliasManager:
-    def __init__(self):
+    def __init__(self, output=None, lazy=None):
         shell = os.environ.get("SHELL", "")
         # Choose appropriate profile file based on shell (defaulting to bash)
         if "zsh" in shell:
@@ -17,78 +22,216 @@ class OSXAliasManager:
             except Exception as e:
                 logging.exception("Could not create profile file: %s", self.profile_path)
                 raise IOError(f"Could not create profile file: {self.profile_path}. Error: {e}")
-        # Backup the profile
+        # Snapshot the profile (stored only if it changed since the last snapshot)
         try:
-            backup_path = self.profile_path + ".bak"
-            shutil.copy2(self.profile_path, backup_path)
-            logging.info("Backup of profile created at %s.", backup_path)
+            with span("osx.snapshot"):
+                SnapshotStore().snapshot(self.profile_path)
         except Exception as e:
             logging.warning("Could not backup profile file: %s. Error: %s", self.profile_path, e)
+        # Aliases go into the profile's managed block ("profile") or into a generated file
+        # that the profile sources ("file"); see alias_file.py.
+        config = read_config() if output is None or lazy is None else {}
+        output = output or config.get("alias_output", "profile")
+        self.alias_file = None
+        if output == "file":
+            from alias_file import GeneratedAliasFile
+            self.alias_file = GeneratedAliasFile(self.profile_path, shell,
+                                                 lazy=config.get("lazy_aliases", False) if lazy is None else lazy)
+            try:
+                self._use_alias_file()
+            except Exception as e:
+                logging.exception("Could not set up the generated alias file")
+                raise IOError(f"Could not set up the generated alias file: {e}")
 
+    @timed("osx.create")
     def create_alias(self, alias_name, command):
-        alias_line = f"alias {alias_name}='{command}'\n"
+        if self.alias_file:
+            self._apply_single("create", alias_name, command, "Failed to write alias")
+            print(f"Added alias '{alias_name}' to {self.alias_file.path}.")
+            return
         try:
-            with open(self.profile_path, "a") as f:
-                f.write(alias_line)
+            index = get_profile_index(self.profile_path)
+            index.set_alias(alias_name, command)
+            index.write_block()
         except Exception as e:
             logging.exception("Failed to write alias to %s", self.profile_path)
             raise IOError(f"Failed to write alias to {self.profile_path}: {e}")
         logging.info("Added alias '%s' to %s.", alias_name, self.profile_path)
         print(f"Added alias '{alias_name}' to {self.profile_path}.")
 
+    @timed("osx.list")
     def list_aliases(self):
-        aliases = {}
         try:
-            with open(self.profile_path, "r") as f:
-                lines = f.readlines()
-            for line in lines:
-                line = line.strip()
-                if line.startswith("alias "):
-                    # Expected format: alias name='command'
-                    parts = line.split("=", 1)
-                    if len(parts) == 2:
-                        alias_def = parts[0].strip()  # e.g., "alias ll"
-                        command_def = parts[1].strip().strip("'")
-                        alias_key = alias_def[6:]  # Remove 'alias ' prefix
-                        aliases[alias_key] = command_def
+            if self.alias_file:
+                aliases = dict(get_profile_index(self.profile_path).outside_aliases)
+                aliases.update(self.alias_file.load())
+                return aliases
+            return get_profile_index(self.profile_path).aliases()
         except Exception as e:
             logging.exception("Error listing aliases from %s", self.profile_path)
             raise IOError(f"Error listing aliases: {e}")
-        return aliases
 
+    @timed("osx.update")
     def update_alias(self, alias_name, new_command):
-        updated = False
+        if self.alias_file:
+            self._apply_single("update", alias_name, new_command, "Error updating alias")
+            return
         try:
-            with open(self.profile_path, "r") as f:
-                lines = f.readlines()
-            with open(self.profile_path, "w") as f:
-                for line in lines:
-                    if line.startswith(f"alias {alias_name}="):
-                        f.write(f"alias {alias_name}='{new_command}'\n")
-                        updated = True
-                    else:
-                        f.write(line)
-            if not updated:
+            index = get_profile_index(self.profile_path)
+            if alias_name in index.block_aliases:
+                index.set_alias(alias_name, new_command)
+                index.write_block()
+            elif alias_name in index.outside_aliases:
+                self._rewrite_outside_block([("update", alias_name, new_command)])
+            else:
                 raise ValueError(f"Alias '{alias_name}' not found")
         except Exception as e:
             logging.exception("Error updating alias %s", alias_name)
             raise IOError(f"Error updating alias {alias_name}: {e}")
         logging.info("Updated alias '%s' in %s.", alias_name, self.profile_path)
 
+    @timed("osx.delete")
     def delete_alias(self, alias_name):
-        found = False
+        if self.alias_file:
+            self._apply_single("delete", alias_name, None, "Error deleting alias")
+            return
         try:
-            with open(self.profile_path, "r") as f:
-                lines = f.readlines()
-            with open(self.profile_path, "w") as f:
-                for line in lines:
-                    if line.startswith(f"alias {alias_name}="):
-                        found = True
-                        continue  # Skip the alias line
-                    f.write(line)
-            if not found:
+            index = get_profile_index(self.profile_path)
+            outside = alias_name in index.outside_aliases
+            if index.remove_alias(alias_name):
+                index.write_block()
+            elif not outside:
                 raise ValueError(f"Alias '{alias_name}' not found")
+            if outside:
+                self._rewrite_outside_block([("delete", alias_name, None)])
         except Exception as e:
             logging.exception("Error deleting alias %s", alias_name)
             raise IOError(f"Error deleting alias {alias_name}: {e}")
-        logging.info("Deleted alias '%s' from %s.", alias_name, self.profile_path)
\ No newline at end of file
+        logging.info("Deleted alias '%s' from %s.", alias_name, self.profile_path)
+
+    @timed("osx.apply_batch")
+    def apply_batch(self, ops):
+        """Apply (action, name, command) operations with a single rewrite of the managed block."""
+        if self.alias_file:
+            return self._apply_batch_to_file(ops)
+        summary = {"created": 0, "updated": 0, "deleted": 0, "missing": []}
+        outside_ops = []
+        try:
+            index = get_profile_index(self.profile_path)
+            block_changed = False
+            for alias_name, (action, command) in coalesce_ops(ops).items():
+                in_block = alias_name in index.block_aliases
+                outside = alias_name in index.outside_aliases
+                if action == "delete":
+                    block_changed |= index.remove_alias(alias_name)
+                    if outside:
+                        outside_ops.append((action, alias_name, None))
+                    if in_block or outside:
+                        summary["deleted"] += 1
+                    else:
+                        summary["missing"].append(alias_name)
+                elif action == "update" and not in_block:
+                    if outside:
+                        outside_ops.append((action, alias_name, command))
+                        summary["updated"] += 1
+                    else:
+                        summary["missing"].append(alias_name)
+                else:
+                    index.set_alias(alias_name, command)
+                    block_changed = True
+                    summary["updated" if in_block else "created"] += 1
+            # Write the block first: rewriting the rest of the file invalidates its offsets.
+            if block_changed:
+                index.write_block()
+            if outside_ops:
+                self._rewrite_outside_block(outside_ops)
+        except Exception as e:
+            logging.exception("Error applying alias batch to %s", self.profile_path)
+            raise IOError(f"Error applying alias batch to {self.profile_path}: {e}")
+        if summary["missing"]:
+            logging.warning("Aliases not found in %s: %s", self.profile_path, ", ".join(summary["missing"]))
+        logging.info("Applied alias batch to %s: %d created, %d updated, %d deleted.",
+                     self.profile_path, summary["created"], summary["updated"], summary["deleted"])
+        return summary
+
+    def _apply_batch_to_file(self, ops):
+        summary = {"created": 0, "updated": 0, "deleted": 0, "missing": []}
+        outside_ops = []
+        try:
+            index = get_profile_index(self.profile_path)
+            aliases = self.alias_file.load()
+            changed = False
+            for alias_name, (action, command) in coalesce_ops(ops).items():
+                in_file = alias_name in aliases
+                outside = alias_name in index.outside_aliases
+                if action == "delete":
+                    changed |= aliases.pop(alias_name, None) is not None
+                    if outside:
+                        outside_ops.append((action, alias_name, None))
+                    if in_file or outside:
+                        summary["deleted"] += 1
+                    else:
+                        summary["missing"].append(alias_name)
+                elif action == "update" and not in_file:
+                    if outside:
+                        outside_ops.append((action, alias_name, command))
+                        summary["updated"] += 1
+                    else:
+                        summary["missing"].append(alias_name)
+                else:
+                    aliases[alias_name] = command
+                    changed = True
+                    summary["updated" if in_file else "created"] += 1
+            if changed:
+                self.alias_file.write(aliases)
+            if outside_ops:
+                self._rewrite_outside_block(outside_ops)
+        except Exception as e:
+            logging.exception("Error applying alias batch to %s", self.alias_file.path)
+            raise IOError(f"Error applying alias batch to {self.alias_file.path}: {e}")
+        logging.info("Applied alias batch to %s: %d created, %d updated, %d deleted.",
+                     self.alias_file.path, summary["created"], summary["updated"], summary["deleted"])
+        return summary
+
+    def _apply_single(self, action, alias_name, command, error_message):
+        summary = self._apply_batch_to_file([(action, alias_name, command)])
+        if summary["missing"]:
+            raise IOError(f"{error_message} {alias_name}: Alias '{alias_name}' not found")
+        logging.info("%s alias '%s' in %s.", action.capitalize() + "d", alias_name, self.alias_file.path)
+
+    def _use_alias_file(self):
+        # Move aliases from the profile's managed block into the generated file, once.
+        index = get_profile_index(self.profile_path)
+        if index.block_aliases:
+            aliases = self.alias_file.load()
+            aliases.update(index.block_commands)
+            self.alias_file.write(aliases)
+            for alias_name in list(index.block_aliases):
+                index.remove_alias(alias_name)
+            index.write_block()
+            logging.info("Moved the managed aliases of %s to %s.", self.profile_path, self.alias_file.path)
+        elif not os.path.exists(self.alias_file.path):
+            self.alias_file.write({})
+        self.alias_file.ensure_sourced()
+
+    @timed("profile.rewrite")
+    def _rewrite_outside_block(self, ops):
+        # Aliases written before the managed block existed live elsewhere in the profile;
+        # editing those needs a full rewrite.
+        with open(self.profile_path, "r") as f:
+            lines = f.readlines()
+        output, _ = apply_ops_to_lines(lines, ops)
+        write_atomic(self.profile_path, "".join(output))
+
+    def history(self):
+        return SnapshotStore().history(self.profile_path)
+
+    def restore(self, ref):
+        """Restore the profile to a snapshot given by hash prefix or history index."""
+        try:
+            return SnapshotStore().restore(self.profile_path, ref)
+        except ValueError:
+            raise
+        except Exception as e:
+            logging.exception("Error restoring %s", self.profile_path)
+            raise IOError(f"Error restoring {self.profile_path}: {e}")
@@ -1,125 +1,710 @@
+import os
+import re
+import json
+import shlex
+import socket
+import inspect
 import paramiko
 import logging
+import functools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from auth_cache import get_auth_method, remember_auth_method
+from manifest import coalesce_ops
+from ps_session import POWERSHELL_COMMAND, SessionError, SessionTimeout, drop_session, get_session, get_sessions
+from profile_index import parse_alias_line
+from remote_exec import DEFAULT_MAX_CHANNELS, ChannelScheduler, RemoteCommand
+from sftp_profile import SFTPProfileEditor
+from timing import span, timed
+
+# Emits {"name": ..., "command": ...} per marked alias file, one compressed JSON object per line.
+WINDOWS_LIST_SCRIPT = (
+    "Select-String -Path 'C:\\Windows\\System32\\*.bat' -SimpleMatch -Pattern 'REM AliasManager' -List "
+    "-ErrorAction SilentlyContinue | ForEach-Object { "
+    "$lines = @(Get-Content -LiteralPath $_.Path -TotalCount 3); "
+    "[pscustomobject]@{ name = [IO.Path]::GetFileNameWithoutExtension($_.Path); "
+    "command = $(if ($lines.Count -ge 3) { $lines[2] } else { '' }) } | ConvertTo-Json -Compress }\n"
+)
+
+DEFAULT_KEY_FILES = (
+    (paramiko.Ed25519Key, "id_ed25519"),
+    (paramiko.ECDSAKey, "id_ecdsa"),
+    (paramiko.RSAKey, "id_rsa"),
+)
+
+def connect_client(host, username, password, timeout=10):
+    """Open an authenticated SSHClient using a single TCP connection and key exchange.
+
+    The auth method that worked last time for this host is tried first; if it fails,
+    the other method is tried on the same transport instead of reconnecting. A port
+    other than 22 can be given as "host:port".
+    """
+    hostname, port = split_host_port(host)
+    preferred = get_auth_method(host, username)
+    if preferred != "password" or not password:
+        preferred = "key"
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        sock = _open_socket(hostname, port, timeout)
+        with span("ssh.handshake", host=host):
+            if preferred == "password":
+                client.connect(hostname=hostname, port=port, username=username, password=password,
+                               allow_agent=False, look_for_keys=False, timeout=timeout,
+                               banner_timeout=timeout, auth_timeout=timeout, sock=sock)
+            else:
+                client.connect(hostname=hostname, port=port, username=username,
+                               allow_agent=True, look_for_keys=True, timeout=timeout,
+                               banner_timeout=timeout, auth_timeout=timeout, sock=sock)
+        method = preferred
+    except paramiko.SSHException as first_exc:
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            client.close()
+            logging.exception("SSH connection failed for %s", host)
+            raise ConnectionError(f"Failed to connect to {host}: {first_exc}")
+        logging.warning("%s authentication failed for %s: %s", preferred.capitalize(), host, first_exc)
+        method = "key" if preferred == "password" else "password"
+        try:
+            with span("ssh.auth_fallback", host=host):
+                if method == "password":
+                    if not password:
+                        raise paramiko.AuthenticationException("No password configured")
+                    transport.auth_password(username, password)
+                else:
+                    _auth_with_keys(transport, username)
+        except Exception as second_exc:
+            client.close()
+            logging.exception("SSH connection failed for %s", host)
+            raise ConnectionError(f"Failed to connect to {host}: {second_exc}")
+    except Exception as e:
+        client.close()
+        logging.exception("SSH connection failed for %s", host)
+        raise ConnectionError(f"Failed to connect to {host}: {e}")
+    remember_auth_method(host, username, method)
+    logging.info("SSH connection established with %s using %s authentication.",
+                 host, "key-based" if method == "key" else "password")
+    return client
+
+def _open_socket(hostname, port, timeout):
+    """Resolve and connect separately so both show up in the timing breakdown."""
+    with span("ssh.resolve", host=hostname):
+        addresses = socket.getaddrinfo(hostname, port, 0, socket.SOCK_STREAM)
+    error = None
+    with span("ssh.tcp_connect", host=hostname):
+        for family, socktype, proto, _, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(address)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+    raise error or OSError(f"No address found for {hostname}")
+
+def split_host_port(host):
+    """Split "host:port" into (host, port); bare hosts and IPv6 addresses use port 22."""
+    if host.count(":") == 1:
+        hostname, port = host.split(":")
+        if port.isdigit():
+            return hostname, int(port)
+    return host, 22
+
+def _auth_with_keys(transport, username):
+    """Try agent keys, then the default key files, on an already negotiated transport."""
+    keys = []
+    agent = paramiko.Agent()
+    try:
+        keys.extend(agent.get_keys())
+        for key_class, filename in DEFAULT_KEY_FILES:
+            path = os.path.expanduser(os.path.join("~", ".ssh", filename))
+            if not os.path.exists(path):
+                continue
+            try:
+                keys.append(key_class.from_private_key_file(path))
+            except (paramiko.SSHException, IOError) as e:
+                logging.debug("Skipping key file %s: %s", path, e)
+        for key in keys:
+            try:
+                transport.auth_publickey(username, key)
+                return
+            except paramiko.SSHException as e:
+                logging.debug("Key %s rejected: %s", key.get_name(), e)
+    finally:
+        agent.close()
+    raise paramiko.AuthenticationException("No SSH key was accepted")
+
+# Reads the remote profile (first argument) into %aliases, parsing alias lines like
+# profile_index.parse_alias_line; digests match those computed by alias_sync.
+_OSX_PERL_ALIASES = r"""
+use strict;
+use Digest::MD5 qw(md5_hex);
+my ($path, @args) = @ARGV;
+my %aliases;
+if (open(my $fh, '<', $path)) {
+    while (my $line = <$fh>) {
+        $line =~ s/^\s+|\s+$//g;
+        next unless $line =~ /^alias /;
+        my ($def, $cmd) = split(/=/, $line, 2);
+        next unless defined $cmd;
+        $def =~ s/^\s+|\s+$//g;
+        $cmd =~ s/^\s+|\s+$//g;
+        $cmd =~ s/^'+|'+$//g;
+        $aliases{substr($def, 6)} = $cmd;
+    }
+}
+"""
+
+# Per-alias digests for `alias_sync`: prints "ROOT <digest> <count>", then "<name> <digest>"
+# lines unless the root equals the expected one passed as the second argument.
+OSX_DIGEST_SCRIPT = _OSX_PERL_ALIASES + r"""
+my $expected = $args[0];
+my @lines = map { "$_ " . md5_hex("$_\n$aliases{$_}") } sort keys %aliases;
+my $root = md5_hex(join("\n", @lines));
+print "ROOT $root ", scalar(@lines), "\n";
+exit 0 if defined $expected && $root eq $expected;
+print "$_\n" for @lines;
+"""
+
+# Hash tree for `fleet_audit`, aliases bucketed by the hex of their name's first byte.
+# Mode "root" prints "ROOT <digest> <count>", "buckets" prints "BUCKET <key> <digest>" per
+# bucket and "aliases" prints "ALIAS <name> <digest>" for the comma separated bucket keys.
+OSX_TREE_SCRIPT = _OSX_PERL_ALIASES + r"""
+my ($mode, $wanted) = @args;
+my %buckets;
+push @{$buckets{unpack('H2', $_)}}, "$_ " . md5_hex("$_\n$aliases{$_}") for sort keys %aliases;
+my %digests = map { $_ => md5_hex(join("\n", @{$buckets{$_}})) } keys %buckets;
+if ($mode eq 'root') {
+    print "ROOT ", md5_hex(join("\n", map { "$_ $digests{$_}" } sort keys %digests)), " ",
+        scalar(keys %aliases), "\n";
+} elsif ($mode eq 'buckets') {
+    print "BUCKET $_ $digests{$_}\n" for sort keys %digests;
+} else {
+    for my $key (split(/,/, $wanted)) {
+        print "ALIAS $_\n" for @{$buckets{$key} || []};
+    }
+}
+"""
+
+# Fills $aliases (name -> command) from the marked .bat files and defines __am_hash.
+_WINDOWS_PS_ALIASES = (
+    "$md5 = [Security.Cryptography.MD5]::Create()\n"
+    "function __am_hash($s) { -join ($md5.ComputeHash([Text.Encoding]::UTF8.GetBytes($s)) | "
+    "ForEach-Object { $_.ToString('x2') }) }\n"
+    "$aliases = @{}\n"
+    "Select-String -Path 'C:\\Windows\\System32\\*.bat' -SimpleMatch -Pattern 'REM AliasManager' -List "
+    "-ErrorAction SilentlyContinue | ForEach-Object { "
+    "$lines = @(Get-Content -LiteralPath $_.Path -TotalCount 3); "
+    "$aliases[[IO.Path]::GetFileNameWithoutExtension($_.Path)] = $(if ($lines.Count -ge 3) { $lines[2] } else { '' }) }\n"
+    "[string[]]$names = @($aliases.Keys); [Array]::Sort($names, [StringComparer]::Ordinal)\n"
+)
+
+WINDOWS_DIGEST_SCRIPT = _WINDOWS_PS_ALIASES + (
+    "$digests = @($names | ForEach-Object { \"$_ \" + (__am_hash (\"$_`n\" + $aliases[$_])) })\n"
+    "$root = __am_hash ($digests -join \"`n\")\n"
+    "[Console]::Out.WriteLine(\"ROOT $root $($digests.Count)\")\n"
+    "if ($root -ne '{expected}') { $digests | ForEach-Object { [Console]::Out.WriteLine($_) } }\n"
+)
+
+WINDOWS_TREE_SCRIPT = _WINDOWS_PS_ALIASES + (
+    "$buckets = @{}\n"
+    "foreach ($n in $names) { $key = [Text.Encoding]::UTF8.GetBytes($n)[0].ToString('x2'); "
+    "if (-not $buckets.ContainsKey($key)) { $buckets[$key] = New-Object Collections.Generic.List[string] }; "
+    "$buckets[$key].Add(\"$n \" + (__am_hash (\"$n`n\" + $aliases[$n]))) }\n"
+    "[string[]]$keys = @($buckets.Keys); [Array]::Sort($keys, [StringComparer]::Ordinal)\n"
+    "$mode = '{mode}'\n"
+    "if ($mode -eq 'root') { "
+    "$root = __am_hash (@($keys | ForEach-Object { \"$_ \" + (__am_hash ($buckets[$_] -join \"`n\")) }) -join \"`n\"); "
+    "[Console]::Out.WriteLine(\"ROOT $root $($names.Count)\") }\n"
+    "elseif ($mode -eq 'buckets') { $keys | ForEach-Object { "
+    "[Console]::Out.WriteLine(\"BUCKET $_ \" + (__am_hash ($buckets[$_] -join \"`n\"))) } }\n"
+    "else { '{buckets}'.Split(',') | Where-Object { $buckets.ContainsKey($_) } | ForEach-Object { "
+    "$buckets[$_] | ForEach-Object { [Console]::Out.WriteLine(\"ALIAS $_\") } } }\n"
+)
+
+# Windows batches at least this large are split over several concurrent channels.
+WINDOWS_PARALLEL_BATCH = 200
+
+def _leased(method):
+    """Hold a pool lease on the manager's connection while `method` (or its generator) runs."""
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator(self, *args, **kwargs):
+            with self._lease():
+                yield from method(self, *args, **kwargs)
+        return generator
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lease():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class RemoteAliasManager:
-    def __init__(self, remote_os, host, username, password):
+    def __init__(self, remote_os, host, username, password, timeout=10, pool=None,
+                 persistent_powershell=True, osx_engine="shell", max_channels=DEFAULT_MAX_CHANNELS):
         self.remote_os = remote_os.lower()
         self.host = host
         self.username = username
         self.password = password
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        # Try key-based authentication first; if that fails, use password.
-        try:
-            self.client.connect(hostname=host, username=username,
-                                allow_agent=True, look_for_keys=True, timeout=10)
-            logging.info("SSH connection established with %s using key-based authentication.", host)
-        except Exception as key_exc:
-            logging.warning("Key-based authentication failed for %s: %s", host, key_exc)
-            try:
-                self.client.connect(hostname=host, username=username, password=password,
-                                    allow_agent=False, look_for_keys=False, timeout=10)
-                logging.info("SSH connection established with %s using password authentication.", host)
-            except Exception as pass_exc:
-                logging.exception("SSH connection failed for %s", host)
-                raise ConnectionError(f"Failed to connect to {host}: {pass_exc}")
+        self.timeout = timeout
+        self.pool = pool
+        # Windows operations share one long-lived PowerShell process per connection.
+        self.persistent_powershell = persistent_powershell
+        # macOS profiles are edited with remote shell commands ("shell") or by a single
+        # SFTP download/upload per batch ("sftp").
+        self.osx_engine = osx_engine
+        # Independent commands run on up to this many concurrent channels of the one connection.
+        self.max_channels = max_channels
+        self._leases = 0  # leases this manager holds on self.client
+        with span("remote.connect", host=host):
+            if pool is not None:
+                self.client = pool.get_client(host, username, password, timeout)
+            else:
+                self.client = connect_client(host, username, password, timeout)
 
+    @timed("remote.create")
+    @_leased
     def create_alias(self, alias_name, command):
+        if self._uses_sftp():
+            self._apply_sftp([("create", alias_name, command)], "Failed to create remote alias")
+            logging.info("Created remote alias '%s' on host %s.", alias_name, self.host)
+            return
         if self.remote_os == "osx":
-            profile_path = "~/.bash_profile"
-            alias_line = f"alias {alias_name}='{command}'"
-            cmd = f'echo "{alias_line}" >> {profile_path}'
+            # The batch script replaces an existing definition rather than appending another,
+            # and passes the command in a quoted here-document the remote shell leaves alone.
+            error = self._run_script(self._osx_batch_script({alias_name: ("create", command)}))
         elif self.remote_os == "windows":
-            bat_file = f"C:\\Windows\\System32\\{alias_name}.bat"
-            alias_content = f"@echo off`nREM AliasManager`n{command}"
-            cmd = f"powershell -Command \"Set-Content -Path '{bat_file}' -Value '{alias_content}'\""
+            error = self._run_powershell(_windows_set_script(alias_name, command))
         else:
             raise ValueError("Unsupported remote OS type. Use 'osx' or 'windows'.")
-        stdin, stdout, stderr = self.client.exec_command(cmd)
-        error = stderr.read().decode().strip()
         if error:
             logging.error("Failed to create remote alias: %s", error)
             raise IOError(f"Failed to create remote alias: {error}")
         logging.info("Created remote alias '%s' on host %s.", alias_name, self.host)
 
+    @timed("remote.list")
     def list_aliases(self):
-        aliases = {}
+        return dict(self.iter_aliases())
+
+    @_leased
+    def iter_aliases(self):
+        """Yield (name, command) pairs as the remote alias definitions arrive."""
+        if self._uses_sftp():
+            with self.profile_editor() as editor:
+                yield from editor.iter_aliases()
+            return
         if self.remote_os == "osx":
-            profile_path = "~/.bash_profile"
-            cmd = f"cat {profile_path}"
-            stdin, stdout, stderr = self.client.exec_command(cmd)
-            output = stdout.read().decode()
-            err = stderr.read().decode().strip()
-            if err:
+            # Only alias lines cross the wire; the filtering happens on the remote side.
+            cmd = "awk '/^[ \t]*alias /' ~/.bash_profile"
+            try:
+                for line in self._run_command(cmd).iter_lines():
+                    parsed = parse_alias_line(line)
+                    if parsed:
+                        yield parsed
+            except IOError as err:
                 logging.error("Error listing remote aliases: %s", err)
                 raise IOError(f"Error listing remote aliases: {err}")
-            lines = output.splitlines()
-            for line in lines:
-                line = line.strip()
-                if line.startswith("alias "):
-                    parts = line.split("=", 1)
-                    if len(parts) == 2:
-                        alias_def = parts[0].strip()  # "alias name"
-                        command_def = parts[1].strip().strip("'")
-                        alias_key = alias_def[6:]
-                        aliases[alias_key] = command_def
         elif self.remote_os == "windows":
-            # List .bat files in System32 containing our marker.
-            cmd = r"powershell -Command \"Get-ChildItem -Path 'C:\Windows\System32' -Filter '*.bat' | ForEach-Object { if (Get-Content $_.FullName | Select-String 'REM AliasManager') { Write-Output ($_.Name) } }\""
-            stdin, stdout, stderr = self.client.exec_command(cmd)
-            output = stdout.read().decode()
-            err = stderr.read().decode().strip()
-            if err:
+            # One PowerShell run scans every marked .bat file and emits one JSON object per alias.
+            try:
+                for line in self._powershell_lines(WINDOWS_LIST_SCRIPT):
+                    line = line.strip()
+                    if not line.startswith("{"):
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logging.warning("Skipping malformed alias record from %s: %s", self.host, line)
+                        continue
+                    yield entry["name"], entry.get("command") or ""
+            except IOError as err:
                 logging.error("Error listing remote aliases on Windows: %s", err)
                 raise IOError(f"Error listing remote aliases: {err}")
-            files = output.splitlines()
-            for filename in files:
-                if filename.endswith(".bat"):
-                    alias_name = filename[:-4]
-                    # Read the file content to get the command (assumed on line 3)
-                    cmd_read = f"powershell -Command \"Get-Content -Path 'C:\\Windows\\System32\\{filename}'\""
-                    stdin, stdout, stderr = self.client.exec_command(cmd_read)
-                    content = stdout.read().decode().splitlines()
-                    command_line = content[2] if len(content) >= 3 else ""
-                    aliases[alias_name] = command_line
         else:
             raise ValueError("Unsupported remote OS type for listing aliases.")
-        return aliases
 
+    @timed("remote.update")
+    @_leased
     def update_alias(self, alias_name, new_command):
+        if self._uses_sftp():
+            self._apply_sftp([("update", alias_name, new_command)], "Error updating remote alias")
+            logging.info("Updated remote alias '%s' on host %s.", alias_name, self.host)
+            return
         if self.remote_os == "osx":
             profile_path = "~/.bash_profile"
-            # Using sed to update the alias. For macOS, sed -i '' is required.
-            cmd = f"sed -i '' 's/^alias {alias_name}=.*/alias {alias_name}=\\'{new_command}\\'/g' {profile_path}"
+            # Using sed to update the alias. A backup suffix attached to -i works with both
+            # BSD (macOS) and GNU sed; the backup is removed afterwards.
+            line = _sed_replacement(f"alias {alias_name}='{new_command}'")
+            expression = shlex.quote(f"s/^alias {_sed_pattern(alias_name)}=.*/{line}/g")
+            cmd = f"sed -i.aliasmgr-bak {expression} {profile_path} && rm -f {profile_path}.aliasmgr-bak"
         elif self.remote_os == "windows":
-            bat_file = f"C:\\Windows\\System32\\{alias_name}.bat"
-            cmd = f"powershell -Command \"Set-Content -Path '{bat_file}' -Value '@echo off`nREM AliasManager`n{new_command}'\""
+            script = _windows_set_script(alias_name, new_command)
         else:
             raise ValueError("Unsupported remote OS type for updating alias.")
-        stdin, stdout, stderr = self.client.exec_command(cmd)
-        error = stderr.read().decode().strip()
+        if self.remote_os == "windows":
+            error = self._run_powershell(script)
+        else:
+            error = self._run_shell(cmd)
         if error:
             logging.error("Error updating remote alias: %s", error)
             raise IOError(f"Error updating remote alias: {error}")
         logging.info("Updated remote alias '%s' on host %s.", alias_name, self.host)
 
+    @timed("remote.delete")
+    @_leased
     def delete_alias(self, alias_name):
+        if self._uses_sftp():
+            self._apply_sftp([("delete", alias_name, None)], "Error deleting remote alias")
+            logging.info("Deleted remote alias '%s' on host %s.", alias_name, self.host)
+            return
         if self.remote_os == "osx":
             profile_path = "~/.bash_profile"
-            cmd = f"sed -i '' '/^alias {alias_name}=/d' {profile_path}"
+            expression = shlex.quote(f"/^alias {_sed_pattern(alias_name)}=/d")
+            cmd = (f"sed -i.aliasmgr-bak {expression} {profile_path}"
+                   f" && rm -f {profile_path}.aliasmgr-bak")
         elif self.remote_os == "windows":
-            bat_file = f"C:\\Windows\\System32\\{alias_name}.bat"
-            cmd = f"del /F /Q \"{bat_file}\""
+            script = f"Remove-Item -LiteralPath {_ps_quote(_windows_bat_path(alias_name))} -Force"
         else:
             raise ValueError("Unsupported remote OS type for deleting alias.")
-        stdin, stdout, stderr = self.client.exec_command(cmd)
-        error = stderr.read().decode().strip()
+        if self.remote_os == "windows":
+            error = self._run_powershell(script)
+        else:
+            error = self._run_shell(cmd)
         if error:
             logging.error("Error deleting remote alias: %s", error)
             raise IOError(f"Error deleting remote alias: {error}")
         logging.info("Deleted remote alias '%s' on host %s.", alias_name, self.host)
 
-    def __del__(self):
-        if self.client:
+    @timed("remote.apply_batch")
+    @_leased
+    def apply_batch(self, ops):
+        """Send a list of (action, name, command) operations as one remote script over one channel."""
+        pending = coalesce_ops(ops)
+        if not pending:
+            return {"applied": 0}
+        if self._uses_sftp():
+            summary = self._apply_sftp(ops, "Remote alias batch failed")
+            return dict(summary, applied=len(pending))
+        if self.remote_os == "osx":
+            try:
+                self._start_script(self._osx_batch_script(pending)).wait()
+            except IOError as e:
+                logging.error("Remote alias batch failed on %s: %s", self.host, e)
+                raise IOError(f"Remote alias batch failed: {e}")
+        elif self.remote_os == "windows":
+            if len(pending) >= WINDOWS_PARALLEL_BATCH and self.max_channels > 1:
+                error = self._windows_parallel_batch(pending)
+            else:
+                error = self._run_powershell(self._windows_batch_script(pending))
+            if error:
+                logging.error("Remote alias batch failed on %s: %s", self.host, error)
+                raise IOError(f"Remote alias batch failed: {error}")
+        else:
+            raise ValueError("Unsupported remote OS type for batch apply.")
+        logging.info("Applied batch of %d aliases on host %s.", len(pending), self.host)
+        return {"applied": len(pending)}
+
+    @timed("remote.digests")
+    @_leased
+    def alias_digests(self, expected_root=None):
+        """Return (root, {name: digest}) for the remote alias set in one round trip.
+
+        The digests are computed on the remote side. When the remote root equals
+        expected_root, only the root is sent back and the dict is None.
+        """
+        expected = expected_root or "-"
+        lines = self._digest_lines(OSX_DIGEST_SCRIPT, [expected],
+                                   WINDOWS_DIGEST_SCRIPT.replace("{expected}", expected))
+        root = None
+        digests = {}
+        for line in lines:
+            if line.startswith("ROOT "):
+                root = line.split()[1]
+            elif root is not None and " " in line:
+                name, digest = line.rsplit(" ", 1)
+                digests[name] = digest
+        if root is None:
+            raise IOError(f"No alias digest received from {self.host}")
+        if root == expected_root:
+            return root, None
+        return root, digests
+
+    @timed("remote.tree")
+    @_leased
+    def alias_tree(self, level="root", buckets=None):
+        """Return one level of the remote alias hash tree (see alias_sync.build_tree).
+
+        "root" returns (root, alias_count), "buckets" returns {bucket: digest} and
+        "aliases" returns {name: digest} for the aliases in the given buckets.
+        """
+        if level not in ("root", "buckets", "aliases"):
+            raise ValueError(f"Unknown alias tree level: {level}")
+        # Bucket keys are hex, so they need no quoting in either shell.
+        wanted = ",".join(buckets or [])
+        lines = self._digest_lines(OSX_TREE_SCRIPT, [level, wanted or "-"],
+                                   WINDOWS_TREE_SCRIPT.replace("{mode}", level).replace("{buckets}", wanted))
+        if level == "root":
+            root = None
+            for line in lines:
+                if line.startswith("ROOT "):
+                    _, digest, count = line.split()
+                    root = (digest, int(count))
+            if root is None:
+                raise IOError(f"No alias digest received from {self.host}")
+            return root
+        result = {}
+        prefix = "BUCKET " if level == "buckets" else "ALIAS "
+        for line in lines:
+            if line.startswith(prefix):
+                key, digest = line[len(prefix):].rsplit(" ", 1)
+                result[key] = digest
+        return result
+
+    @timed("remote.run_commands")
+    @_leased
+    def run_commands(self, commands, max_channels=None):
+        """Run independent commands concurrently over this manager's one SSH connection.
+
+        `commands` are command strings or (command, stdin_text) pairs. Returns one
+        {"command", "ok", "lines", "error", "exit_status"} dict per command, in order.
+        """
+        client = self._live_client()
+
+        def start(cmd):
+            with span("remote.exec_command", host=self.host):
+                return RemoteCommand(*client.exec_command(cmd, timeout=self.timeout))
+
+        return ChannelScheduler(start, max_channels or self.max_channels).run(commands)
+
+    def profile_editor(self):
+        """Return an SFTPProfileEditor for the remote macOS profile; use it as a context manager."""
+        if self.remote_os != "osx":
+            raise ValueError("SFTP profile editing is only available for macOS remotes.")
+        return SFTPProfileEditor(self.client)
+
+    def _uses_sftp(self):
+        return self.remote_os == "osx" and self.osx_engine == "sftp"
+
+    def _apply_sftp(self, ops, error_message):
+        try:
+            with self.profile_editor() as editor:
+                summary = editor.apply(ops)
+        except Exception as e:
+            logging.error("%s: %s", error_message, e)
+            raise IOError(f"{error_message}: {e}")
+        if summary["missing"] and len(ops) == 1:
+            raise ValueError(f"Alias '{summary['missing'][0]}' not found")
+        return summary
+
+    def _exec_command(self, cmd):
+        try:
+            with span("remote.exec_command", host=self.host):
+                return self.client.exec_command(cmd, timeout=self.timeout)
+        except (paramiko.SSHException, EOFError, OSError):
+            if self.pool is None:
+                raise
+            # A pooled transport can die while idle; reconnect once and retry.
+            logging.warning("SSH transport to %s dropped; reconnecting.", self.host)
+            self._reconnect()
+            return self.client.exec_command(cmd, timeout=self.timeout)
+
+    def _live_client(self):
+        # Concurrent channels must not each try to reconnect, so check the transport once up front.
+        transport = self.client.get_transport()
+        if self.pool is not None and (transport is None or not transport.is_active()):
+            logging.warning("SSH transport to %s dropped; reconnecting.", self.host)
+            self._reconnect()
+        return self.client
+
+    def _windows_parallel_batch(self, pending):
+        """Split a large batch over concurrent PowerShell channels; every alias is its own file.
+
+        With persistent sessions each part runs in a session of its own, which stays open,
+        so PowerShell starts once per channel rather than once per batch.
+        """
+        items = list(pending.items())
+        size = -(-len(items) // self.max_channels)
+        scripts = [self._windows_batch_script(dict(items[i:i + size])) for i in range(0, len(items), size)]
+        if not self.persistent_powershell:
+            results = self.run_commands([(POWERSHELL_COMMAND, script) for script in scripts])
+            return "\n".join(r["error"] for r in results if not r["ok"])
+        try:
+            sessions = get_sessions(self._live_client(), len(scripts), self.timeout)
+        except SessionError as e:
+            drop_session(self.client)
+            return str(e)
+
+        def run(session, script):
+            try:
+                session.run_lines(script)
+            except IOError as e:
+                return str(e) or "PowerShell script failed"
+            return ""
+
+        with ThreadPoolExecutor(max_workers=len(scripts), thread_name_prefix="remote-channel") as executor:
+            errors = [error for error in executor.map(run, sessions, scripts) if error]
+        return "\n".join(errors)
+
+    def _digest_lines(self, osx_script, osx_args, windows_script):
+        """Run a digest script for the remote OS and yield its output lines."""
+        if self.remote_os not in ("osx", "windows"):
+            raise ValueError("Unsupported remote OS type for alias digests.")
+        try:
+            if self.remote_os == "osx":
+                args = " ".join(osx_args)
+                script = (f'perl - "$HOME/.bash_profile" {args} <<\'__ALIASMGR_PERL__\'\n'
+                          f"{osx_script}\n__ALIASMGR_PERL__\n")
+                lines = self._start_script(script).iter_lines()
+            else:
+                lines = self._powershell_lines(windows_script)
+            yield from lines
+        except IOError as e:
+            logging.error("Error computing remote alias digests on %s: %s", self.host, e)
+            raise IOError(f"Error computing remote alias digests: {e}")
+
+    def _start_script(self, script):
+        """Start the remote OS's script interpreter and feed it a script on stdin."""
+        if self.remote_os == "windows":
+            cmd = "powershell -NoProfile -NonInteractive -Command -"
+        else:
+            cmd = "/bin/sh -s"
+        command = self._run_command(cmd)
+        command.stdin.write(script)
+        command.stdin.channel.shutdown_write()
+        return command
+
+    def _run_command(self, cmd):
+        return RemoteCommand(*self._exec_command(cmd))
+
+    def _run_shell(self, cmd):
+        """Run a shell command and return its error text, or "" if it exited with status 0."""
+        try:
+            self._run_command(cmd).wait()
+        except IOError as e:
+            return str(e)
+        return ""
+
+    def _run_script(self, script):
+        """Run a script through _start_script and return its error text, or "" if it exited with status 0."""
+        try:
+            self._start_script(script).wait()
+        except IOError as e:
+            return str(e)
+        return ""
+
+    def _powershell_lines(self, script):
+        """Return or iterate the output lines of a PowerShell script, raising IOError if it fails."""
+        if not self.persistent_powershell:
+            return self._start_script(script).iter_lines()
+        try:
+            return get_session(self.client, self.timeout).run_lines(script)
+        except SessionError as e:
+            drop_session(self.client)
+            # A hung script would hang again; a dead pooled transport gets one fresh try.
+            if self.pool is None or isinstance(e, SessionTimeout):
+                raise
+            logging.warning("PowerShell session on %s failed (%s); reconnecting.", self.host, e)
+            self._reconnect()
+            return get_session(self.client, self.timeout).run_lines(script)
+
+    def _run_powershell(self, script):
+        """Run a PowerShell script and return its error text, or "" on success."""
+        try:
+            for _ in self._powershell_lines(script):
+                pass
+        except IOError as e:
+            return str(e) or "PowerShell script failed"
+        return ""
+
+    def _osx_batch_script(self, pending):
+        # Drop every touched alias from the profile, then append the surviving definitions.
+        names = "\n".join(pending)
+        alias_lines = "\n".join(f"alias {name}='{command}'"
+                                for name, (action, command) in pending.items() if action != "delete")
+        script = (
+            "set -e\n"
+            'profile="$HOME/.bash_profile"\n'
+            'tmp="$profile.aliasmgr.$$"\n'
+            'touch "$profile"\n'
+            "awk 'NR==FNR { drop[$0]=1; next } "
+            "/^alias / { n=$2; sub(/=.*/, \"\", n); if (n in drop) next } { print }' "
+            '- "$profile" > "$tmp" <<\'__ALIASMGR_NAMES__\'\n'
+            f"{names}\n"
+            "__ALIASMGR_NAMES__\n"
+        )
+        if alias_lines:
+            script += (
+                'cat >> "$tmp" <<\'__ALIASMGR_ALIASES__\'\n'
+                f"{alias_lines}\n"
+                "__ALIASMGR_ALIASES__\n"
+            )
+        return script + 'mv "$tmp" "$profile"\n'
+
+    def _windows_batch_script(self, pending):
+        lines = ["$ErrorActionPreference = 'Stop'"]
+        for name, (action, command) in pending.items():
+            if action == "delete":
+                bat_file = _ps_quote(_windows_bat_path(name))
+                lines.append(f"if (Test-Path -LiteralPath {bat_file}) {{ Remove-Item -LiteralPath {bat_file} -Force }}")
+            else:
+                lines.append(_windows_set_script(name, command))
+        return "\n".join(lines) + "\n"
+
+    @contextlib.contextmanager
+    def _lease(self):
+        if self.pool is None:
+            yield
+            return
+        self.pool.acquire(self.client)
+        self._leases += 1
+        try:
+            yield
+        finally:
+            self._leases -= 1
+            # Released on the current client, which a reconnect may have replaced.
+            self.pool.release(self.client)
+
+    def _reconnect(self):
+        """Replace the pooled client, moving the leases held on the old one to the new one."""
+        old = self.client
+        self.client = self.pool.get_client(self.host, self.username, self.password,
+                                           self.timeout, reconnect=True)
+        for _ in range(self._leases):
+            self.pool.release(old)
+            self.pool.acquire(self.client)
+
+    def close(self):
+        if getattr(self, "pool", None) is not None:
+            # Pooled connections stay open for the next manager; the pool closes them.
+            self.client = None
+        elif getattr(self, "client", None):
             self.client.close()
-            logging.info("SSH connection to %s closed.", self.host)
\ No newline at end of file
+            self.client = None
+            logging.info("SSH connection to %s closed.", self.host)
+
+    def __del__(self):
+        self.close()
+
+def _sed_pattern(text):
+    # Match `text` literally in a basic regular expression delimited by "/".
+    return re.sub(r"([.\[\]*^$\\/])", r"\\\1", text)
+
+def _sed_replacement(text):
+    # In a sed replacement a backslash and "&" are special, and "/" would end the s command.
+    if "\n" in text:
+        raise ValueError("Alias commands cannot span several lines.")
+    return re.sub(r"([\\&/])", r"\\\1", text)
+
+def _ps_quote(value):
+    """Quote a string as a PowerShell single-quoted literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+def _windows_bat_path(alias_name):
+    return f"C:\\Windows\\System32\\{alias_name}.bat"
+
+def _windows_set_script(alias_name, command):
+    """PowerShell statement that writes an alias .bat file with the AliasManager marker."""
+    return (f"Set-Content -LiteralPath {_ps_quote(_windows_bat_path(alias_name))} "
+            f"-Value @('@echo off', 'REM AliasManager', {_ps_quote(command)})")
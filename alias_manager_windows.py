@@ -1,75 +1,276 @@
 import os
-import shutil
+import json
 import logging
+from atomic_file import write_atomic
+from manifest import coalesce_ops
+from timing import span, timed
+
+ALIAS_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "AliasManager")
+LEGACY_DIR = r"C:\Windows\System32"
+INDEX_FILE = "aliases.json"
+MACRO_FILE = "aliases.doskey"
+SHIM_DIR = "bin"
+AUTORUN_KEY = r"Software\Microsoft\Command Processor"
+ENVIRONMENT_KEY = "Environment"
 
 class WindowsAliasManager:
-    def __init__(self):
-        # We'll use System32 to store our alias batch files.
-        self.system_dir = r"C:\Windows\System32"
-        if not os.path.isdir(self.system_dir):
-            raise IOError(f"System directory {self.system_dir} not found. Ensure you have administrative privileges.")
+    """Aliases kept in one JSON index and served to cmd.exe as doskey macros.
+
+    The index in `alias_dir` is the source of truth: listing reads that one file and
+    every change rewrites it atomically, along with the doskey macrofile generated from
+    it. cmd.exe loads the macrofile through its AutoRun setting, so running an alias
+    expands a macro in the current shell instead of starting a batch interpreter.
 
+    Doskey macros only exist at an interactive cmd prompt, so every alias also gets a
+    .bat shim in the `bin` directory next to the index, which is added to the user's
+    PATH; PowerShell, scripts and the Run dialog find the alias there. Aliases created
+    by earlier versions as marked .bat files in System32 are moved into the index the
+    first time the manager is used, and those files are only removed once their shims
+    exist and the shim directory is on PATH.
+    """
+
+    def __init__(self, alias_dir=ALIAS_DIR, legacy_dir=LEGACY_DIR):
+        self.alias_dir = alias_dir
+        self.legacy_dir = legacy_dir
+        self.index_path = os.path.join(alias_dir, INDEX_FILE)
+        self.macro_path = os.path.join(alias_dir, MACRO_FILE)
+        self.shim_dir = os.path.join(alias_dir, SHIM_DIR)
+        self._cache = None
+        self._cache_stamp = None
+        try:
+            os.makedirs(self.shim_dir, exist_ok=True)
+            on_path = self._register_path()
+            state = self._read_index()
+            if not state.get("migrated") or not state.get("shims"):
+                self._migrate(state, on_path)
+            elif on_path and state.get("legacy_files"):
+                self._remove_legacy(state)
+        except Exception as e:
+            logging.exception("Could not open alias index %s", self.index_path)
+            raise IOError(f"Could not open alias index {self.index_path}: {e}")
+        self._register_autorun()
+
+    @timed("windows.create")
     def create_alias(self, alias_name, command):
-        bat_file = os.path.join(self.system_dir, f"{alias_name}.bat")
-        # Backup existing file if present.
-        if os.path.exists(bat_file):
-            backup_file = bat_file + ".bak"
-            try:
-                shutil.copy2(bat_file, backup_file)
-                logging.info("Backup created for %s at %s.", bat_file, backup_file)
-            except Exception as e:
-                logging.warning("Could not backup %s: %s", bat_file, e)
         try:
-            with open(bat_file, "w") as f:
-                f.write("@echo off\n")
-                f.write("REM AliasManager\n")  # Marker to identify our alias files.
-                f.write(f"{command}\n")
-            logging.info("Created alias '%s' as %s.", alias_name, bat_file)
-            print(f"Alias '{alias_name}' created at {bat_file}.")
+            self.apply_batch([("create", alias_name, command)])
         except Exception as e:
-            logging.exception("Failed to create alias file %s", bat_file)
-            raise IOError(f"Failed to create alias file {bat_file}: {e}")
+            logging.exception("Failed to create alias %s", alias_name)
+            raise IOError(f"Failed to create alias {alias_name}: {e}")
+        logging.info("Created alias '%s' in %s.", alias_name, self.index_path)
+        print(f"Alias '{alias_name}' created in {self.index_path}.")
 
+    @timed("windows.list")
     def list_aliases(self):
-        aliases = {}
         try:
-            for filename in os.listdir(self.system_dir):
-                if filename.endswith(".bat"):
-                    file_path = os.path.join(self.system_dir, filename)
-                    with open(file_path, "r") as f:
-                        content = f.read()
-                    if "REM AliasManager" in content:
-                        alias_name = os.path.splitext(filename)[0]
-                        # Assume command is on the third line.
-                        lines = content.splitlines()
-                        command_line = lines[2] if len(lines) >= 3 else ""
-                        aliases[alias_name] = command_line
+            return dict(self._read_index()["aliases"])
         except Exception as e:
-            logging.exception("Error listing aliases in %s", self.system_dir)
+            logging.exception("Error reading alias index %s", self.index_path)
             raise IOError(f"Error listing aliases: {e}")
-        return aliases
 
+    @timed("windows.update")
     def update_alias(self, alias_name, new_command):
-        bat_file = os.path.join(self.system_dir, f"{alias_name}.bat")
-        if not os.path.exists(bat_file):
+        if alias_name not in self.list_aliases():
             raise ValueError(f"Alias '{alias_name}' not found")
         try:
-            with open(bat_file, "w") as f:
-                f.write("@echo off\n")
-                f.write("REM AliasManager\n")
-                f.write(f"{new_command}\n")
+            self.apply_batch([("update", alias_name, new_command)])
         except Exception as e:
-            logging.exception("Error updating alias file %s", bat_file)
+            logging.exception("Error updating alias %s", alias_name)
             raise IOError(f"Error updating alias {alias_name}: {e}")
-        logging.info("Updated alias '%s' in %s.", alias_name, bat_file)
+        logging.info("Updated alias '%s' in %s.", alias_name, self.index_path)
 
+    @timed("windows.delete")
     def delete_alias(self, alias_name):
-        bat_file = os.path.join(self.system_dir, f"{alias_name}.bat")
-        if not os.path.exists(bat_file):
+        if alias_name not in self.list_aliases():
             raise ValueError(f"Alias '{alias_name}' not found")
         try:
-            os.remove(bat_file)
+            self.apply_batch([("delete", alias_name, None)])
         except Exception as e:
-            logging.exception("Error deleting alias file %s", bat_file)
+            logging.exception("Error deleting alias %s", alias_name)
             raise IOError(f"Error deleting alias {alias_name}: {e}")
-        logging.info("Deleted alias '%s' from %s.", alias_name, bat_file)
\ No newline at end of file
+        logging.info("Deleted alias '%s' from %s.", alias_name, self.index_path)
+
+    @timed("windows.apply_batch")
+    def apply_batch(self, ops):
+        """Apply (action, name, command) operations with a single rewrite of the index."""
+        summary = {"created": 0, "updated": 0, "deleted": 0, "missing": []}
+        try:
+            state = self._read_index()
+            aliases = dict(state["aliases"])
+            for alias_name, (action, command) in coalesce_ops(ops).items():
+                exists = alias_name in aliases
+                if action == "delete":
+                    if not exists:
+                        summary["missing"].append(alias_name)
+                        continue
+                    del aliases[alias_name]
+                    summary["deleted"] += 1
+                elif action == "update" and not exists:
+                    summary["missing"].append(alias_name)
+                else:
+                    aliases[alias_name] = command
+                    summary["updated" if exists else "created"] += 1
+            if aliases != state["aliases"]:
+                self._write_index(dict(state, aliases=aliases), previous=state["aliases"])
+        except Exception as e:
+            logging.exception("Error applying alias batch to %s", self.index_path)
+            raise IOError(f"Error applying alias batch to {self.index_path}: {e}")
+        if summary["missing"]:
+            logging.warning("Aliases not found in %s: %s", self.index_path, ", ".join(summary["missing"]))
+        logging.info("Applied alias batch to %s: %d created, %d updated, %d deleted.",
+                     self.index_path, summary["created"], summary["updated"], summary["deleted"])
+        return summary
+
+    def _read_index(self):
+        # Re-read the index only when it changed since the last read.
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return {"aliases": {}}
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._cache is None or stamp != self._cache_stamp:
+            with span("windows.read_index"), open(self.index_path, "r", encoding="utf-8") as f:
+                self._cache = json.load(f)
+            self._cache.setdefault("aliases", {})
+            self._cache_stamp = stamp
+        return self._cache
+
+    @timed("windows.write_index")
+    def _write_index(self, state, previous=None):
+        """Write the index and macrofile, and the shims of aliases that differ from `previous`."""
+        aliases = state["aliases"]
+        previous = {} if previous is None else previous
+        for name, command in aliases.items():
+            if name not in previous or previous[name] != command:
+                _write_atomic(self._shim_path(name), f"@echo off\nREM AliasManager\n{command} %*\n")
+        for name in previous:
+            if name not in aliases:
+                try:
+                    os.remove(self._shim_path(name))
+                except FileNotFoundError:
+                    pass
+        _write_atomic(self.index_path, json.dumps(state, indent=2, sort_keys=True))
+        _write_atomic(self.macro_path, "".join(f"{name}={_doskey_escape(command)} $*\n"
+                                               for name, command in sorted(aliases.items())))
+        self._cache = None
+
+    def _shim_path(self, name):
+        return os.path.join(self.shim_dir, f"{name}.bat")
+
+    @timed("windows.migrate")
+    def _migrate(self, state, on_path):
+        """Move marked .bat aliases from the legacy directory into the index and write every shim.
+
+        The legacy directory is scanned once; the files found are listed in the index
+        and left in place until the shim directory is on PATH.
+        """
+        legacy = {}
+        if os.path.isdir(self.legacy_dir):
+            for entry in os.scandir(self.legacy_dir):
+                if entry.name.lower().endswith(".bat"):
+                    command = _read_bat_alias(entry.path)
+                    if command is not None:
+                        legacy[os.path.splitext(entry.name)[0]] = (entry.path, command)
+        aliases = {name: command for name, (path, command) in legacy.items()}
+        aliases.update(state["aliases"])
+        state = dict(state, aliases=aliases, migrated=True, shims=True,
+                     legacy_files=sorted(path for path, command in legacy.values()))
+        self._write_index(state)
+        if legacy:
+            logging.info("Migrated %d aliases from %s to %s.", len(legacy), self.legacy_dir, self.index_path)
+        if not on_path:
+            if legacy:
+                logging.warning("Keeping %d legacy aliases in %s until %s is on PATH.",
+                                len(legacy), self.legacy_dir, self.shim_dir)
+            return
+        self._remove_legacy(state)
+
+    def _remove_legacy(self, state):
+        """Remove the migrated legacy files whose shims exist; the rest stay listed for next time."""
+        kept = []
+        for path in state["legacy_files"]:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if not os.path.exists(self._shim_path(name)):
+                logging.warning("Keeping legacy alias %s: its shim was not written.", path)
+                kept.append(path)
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning("Migrated alias '%s' but could not remove %s: %s", name, path, e)
+        self._write_index(dict(state, legacy_files=kept), previous=state["aliases"])
+
+    def _register_autorun(self):
+        # Have every new cmd.exe load the macrofile, keeping any existing AutoRun command.
+        try:
+            import winreg
+        except ImportError:
+            return
+        command = f'doskey /macrofile="{self.macro_path}"'
+        try:
+            with winreg.CreateKey(winreg.HKEY_CURRENT_USER, AUTORUN_KEY) as key:
+                try:
+                    current = winreg.QueryValueEx(key, "AutoRun")[0]
+                except FileNotFoundError:
+                    current = ""
+                if command in current:
+                    return
+                value = f"{current} & {command}" if current else command
+                winreg.SetValueEx(key, "AutoRun", 0, winreg.REG_SZ, value)
+            logging.info("Registered %s in the cmd.exe AutoRun setting.", self.macro_path)
+        except OSError as e:
+            logging.warning("Could not register the alias macrofile for cmd.exe: %s", e)
+
+    def _register_path(self):
+        """Add the shim directory to the user's PATH; True once it is there (or off Windows)."""
+        try:
+            import winreg
+        except ImportError:
+            return True
+        try:
+            with winreg.CreateKey(winreg.HKEY_CURRENT_USER, ENVIRONMENT_KEY) as key:
+                try:
+                    current, kind = winreg.QueryValueEx(key, "Path")
+                except FileNotFoundError:
+                    current, kind = "", winreg.REG_EXPAND_SZ
+                entries = [entry for entry in current.split(";") if entry]
+                if any(os.path.normcase(entry) == os.path.normcase(self.shim_dir) for entry in entries):
+                    return True
+                winreg.SetValueEx(key, "Path", 0, kind, ";".join(entries + [self.shim_dir]))
+        except OSError as e:
+            logging.warning("Could not add %s to the user PATH: %s", self.shim_dir, e)
+            return False
+        _broadcast_environment_change()
+        logging.info("Added %s to the user PATH.", self.shim_dir)
+        return True
+
+def _broadcast_environment_change():
+    # Tell Explorer the environment changed, so programs started from now on see the new PATH.
+    try:
+        import ctypes
+        HWND_BROADCAST, WM_SETTINGCHANGE, SMTO_ABORTIFHUNG = 0xFFFF, 0x001A, 0x0002
+        ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment",
+                                                 SMTO_ABORTIFHUNG, 1000, None)
+    except (AttributeError, OSError) as e:
+        logging.debug("Could not broadcast the environment change: %s", e)
+
+def _doskey_escape(command):
+    # In doskey macros `$` starts a special sequence; `$$` is a literal dollar sign.
+    return command.replace("$", "$$")
+
+def _read_bat_alias(path):
+    try:
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+    except (IOError, UnicodeDecodeError):
+        return None
+    if "REM AliasManager" not in lines:
+        return None
+    # Assume command is on the third line.
+    return lines[2] if len(lines) >= 3 else ""
+
+def _write_atomic(path, text):
+    # Same line endings as a text-mode write: cmd.exe expects CRLF in batch files.
+    write_atomic(path, text.replace("\n", os.linesep))
@@ -0,0 +1,255 @@
+import math
+import heapq
+import threading
+from collections import Counter, deque
+
+NGRAM = 3
+DEFAULT_LIMIT = 20
+# A fuzzy hit must share at least this fraction of the query's n-grams.
+FUZZY_THRESHOLD = 0.6
+# Fuzzy ranking is skipped when a query's rarest trigrams still match more keys than this.
+FUZZY_CANDIDATE_LIMIT = 50000
+
+def ngrams(text, n=NGRAM, pad=True):
+    """Set of n-grams of `text`, lowercased and by default padded so word boundaries count too.
+
+    Indexed text is padded; a substring query uses its unpadded n-grams, which occur in
+    any text containing it wherever it sits in a word.
+    """
+    text = f" {text.lower()} " if pad else text.lower()
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+class AliasSearchIndex:
+    """In-memory search index over alias names and commands from several sources.
+
+    Names live in a prefix trie keyed by their lowercased characters (nested dicts; the
+    None key holds the names ending there) that is walked breadth first, so prefix
+    results come out shortest first, ignoring case, without visiting the whole subtree.
+    Names and commands are also split into trigrams with a posting set per trigram:
+    substring queries intersect the postings of their trigrams and fuzzy queries count
+    shared trigrams. set() and remove() touch only the entries of
+    one alias, so the index follows create/update/delete without being rebuilt.
+
+        index = AliasSearchIndex()
+        index.load(local_aliases, "local")
+        index.load(remote_aliases, "remote")
+        index.search("gst")    # -> [{"name", "score", "sources": {"local": command, ...}}, ...]
+    """
+
+    def __init__(self):
+        self.aliases = {}         # name -> {source: command}
+        self._trie = {}
+        self._name_grams = {}     # trigram -> set of names
+        self._command_grams = {}  # trigram -> set of command ids
+        self._command_ids = {}    # (name, source) -> command id; ints keep the posting sets cheap
+        self._commands = {}       # command id -> (name, source)
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def load(self, aliases, source):
+        """Replace everything known from `source` with the {name: command} mapping."""
+        with self._lock:
+            for name in [n for n, sources in self.aliases.items() if source in sources and n not in aliases]:
+                self.remove(name, source)
+            for name, command in aliases.items():
+                self.set(name, command, source)
+
+    def set(self, name, command, source="local"):
+        with self._lock:
+            sources = self.aliases.get(name)
+            if sources is None:
+                sources = self.aliases[name] = {}
+                self._trie_add(name)
+                _post(self._name_grams, ngrams(name), name)
+            previous = sources.get(source)
+            if previous == command:
+                return
+            if previous is None:
+                command_id = self._command_ids[name, source] = self._next_id
+                self._commands[command_id] = (name, source)
+                self._next_id += 1
+            else:
+                command_id = self._command_ids[name, source]
+                _unpost(self._command_grams, ngrams(previous), command_id)
+            sources[source] = command
+            _post(self._command_grams, ngrams(command), command_id)
+
+    def remove(self, name, source=None):
+        """Forget `name` from one source, or from every source when source is None."""
+        with self._lock:
+            sources = self.aliases.get(name)
+            if sources is None:
+                return False
+            for src in [source] if source is not None else list(sources):
+                command = sources.pop(src, None)
+                if command is not None:
+                    command_id = self._command_ids.pop((name, src))
+                    del self._commands[command_id]
+                    _unpost(self._command_grams, ngrams(command), command_id)
+            if not sources:
+                del self.aliases[name]
+                self._trie_remove(name)
+                _unpost(self._name_grams, ngrams(name), name)
+            return True
+
+    def apply_ops(self, ops, source="local"):
+        """Follow a list of applied (action, name, command) operations."""
+        for action, name, command in ops:
+            if action == "delete":
+                self.remove(name, source)
+            else:
+                self.set(name, command, source)
+
+    def complete_name(self, prefix, limit=DEFAULT_LIMIT):
+        """Names starting with `prefix` in any case, shortest first, then alphabetically."""
+        with self._lock:
+            node = self._trie
+            for ch in prefix.lower():
+                node = node.get(ch)
+                if node is None:
+                    return []
+            found = []
+            level = deque([node])
+            while level and len(found) < limit:
+                next_level = deque()
+                for node in level:
+                    if None in node:
+                        found.extend(sorted(node[None]))
+                    next_level.extend(child for ch, child in sorted(
+                        (k, v) for k, v in node.items() if k is not None))
+                level = next_level
+            return found[:limit]
+
+    def search(self, query, limit=DEFAULT_LIMIT, fields=("name", "command")):
+        """Ranked matches for `query` in alias names and/or commands.
+
+        Exact names rank first, then name prefixes, then names and commands that
+        contain the query, then fuzzy matches sharing most of its trigrams. Matching
+        ignores case.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        needle = query.lower()
+        scores = {}
+
+        def score(name, value):
+            if value > scores.get(name, 0):
+                scores[name] = value
+
+        with self._lock:
+            if "name" in fields:
+                for name in self.complete_name(query, limit):
+                    score(name, 100 if name == query else 80 + 10 * len(query) / len(name))
+                for name, fraction in self._matches(self._name_grams, needle, limit, len):
+                    if needle in name.lower():
+                        score(name, 60 + 10 * len(needle) / len(name))
+                    elif fraction >= FUZZY_THRESHOLD:
+                        score(name, 30 * fraction)
+            if "command" in fields:
+                for command_id, fraction in self._matches(self._command_grams, needle, limit, self._command_length):
+                    name, source = self._commands[command_id]
+                    command = self.aliases[name][source]
+                    if needle in command.lower():
+                        score(name, 40 + 10 * len(needle) / max(len(command), 1))
+                    elif fraction >= FUZZY_THRESHOLD:
+                        score(name, 20 * fraction)
+            best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            return [{"name": name, "score": round(value, 2), "sources": dict(self.aliases[name])}
+                    for name, value in best]
+
+    def _matches(self, postings, needle, limit, length):
+        """Yield (key, shared fraction) for keys that may contain `needle`, or failing enough
+        of those, that share most of its padded trigrams."""
+        if len(needle) >= NGRAM:
+            exact = sorted((postings.get(g, ()) for g in ngrams(needle, pad=False)), key=len)
+            full = set(exact[0]).intersection(*exact[1:]) if exact[0] else set()
+        else:
+            # Shorter than a trigram: any key with a trigram containing it.
+            full = set().union(*(keys for gram, keys in postings.items() if needle in gram))
+        # Many full matches: keep the shortest keys, they are the most specific.
+        if len(full) > limit * 4:
+            full = heapq.nsmallest(limit * 4, full, key=length)
+        for key in full:
+            yield key, 1.0
+        if len(full) >= limit:
+            return
+        # A key sharing `needed` of the trigrams must hold one of any len - needed + 1 of
+        # them, so candidates only come from that many of the rarest postings.
+        grams = ngrams(needle)
+        lists = sorted((postings.get(g, ()) for g in grams), key=len)
+        needed = max(1, math.ceil(FUZZY_THRESHOLD * len(grams)))
+        candidates = set().union(*lists[:len(grams) - needed + 1])
+        candidates.difference_update(full)
+        if len(candidates) > FUZZY_CANDIDATE_LIMIT:
+            return  # Too unspecific to rank fuzzily; the exact tiers already matched.
+        counts = Counter()
+        for posting in lists:
+            counts.update(candidates.intersection(posting))
+        partial = [key for key, n in counts.items() if n >= needed]
+        for key in heapq.nsmallest(limit * 4, partial, key=lambda k: (-counts[k], length(k))):
+            yield key, counts[key] / len(grams)
+
+    def _command_length(self, command_id):
+        name, source = self._commands[command_id]
+        return len(self.aliases[name][source])
+
+    def _trie_add(self, name):
+        node = self._trie
+        for ch in name.lower():
+            node = node.setdefault(ch, {})
+        node.setdefault(None, set()).add(name)
+
+    def _trie_remove(self, name):
+        key = name.lower()
+        path = [self._trie]
+        for ch in key:
+            node = path[-1].get(ch)
+            if node is None:
+                return
+            path.append(node)
+        names = path[-1].get(None)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del path[-1][None]
+        # Prune the nodes that no longer lead to any name.
+        for depth in range(len(key), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][key[depth - 1]]
+
+def _post(postings, grams, key):
+    for gram in grams:
+        bucket = postings.get(gram)
+        if bucket is None:
+            postings[gram] = {key}
+        else:
+            bucket.add(key)
+
+def _unpost(postings, grams, key):
+    for gram in grams:
+        bucket = postings.get(gram)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del postings[gram]
+
+def format_results(results):
+    """Human readable lines for search() results."""
+    if not results:
+        return "No matching aliases."
+    lines = []
+    for r in results:
+        commands = r["sources"]
+        if len(set(commands.values())) == 1:
+            lines.append(f"{r['name']:<24} {next(iter(commands.values()))}  [{', '.join(sorted(commands))}]")
+        else:
+            lines.append(r["name"])
+            lines.extend(f"    {source:<8} {command}" for source, command in sorted(commands.items()))
+    return "\n".join(lines)
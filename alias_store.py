@@ -0,0 +1,419 @@
+import os
+import sys
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from config import LOG_PATH
+from manifest import coalesce_ops
+from timing import span
+
+STORE_PATH = os.path.expanduser("~/.alias_manager.db")
+GLOBAL = ""
+PLATFORMS = ("osx", "windows")
+NAME_BATCH = 500  # names per IN (...) list, well under SQLite's parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS aliases (
+    name TEXT NOT NULL,
+    scope TEXT NOT NULL,          -- '' for every machine, 'platform:osx', 'host:build-01'
+    command TEXT,                 -- NULL once deleted, so renders still see the deletion
+    version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    seq INTEGER NOT NULL,         -- changes.seq of the last change
+    PRIMARY KEY (name, scope)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS aliases_scope ON aliases (scope, name);
+CREATE INDEX IF NOT EXISTS aliases_seq ON aliases (seq);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    action TEXT NOT NULL,
+    command TEXT,
+    version INTEGER NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_name ON changes (name, seq);
+CREATE TABLE IF NOT EXISTS renders (
+    target TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    at REAL NOT NULL
+);
+"""
+
+def scope_for(platform=None, host=None):
+    if host:
+        return f"host:{host}"
+    if platform:
+        return f"platform:{platform}"
+    return GLOBAL
+
+def target_scopes(platform, host):
+    """Scopes that apply to one machine, most specific first."""
+    return (f"host:{host}", f"platform:{platform}", GLOBAL)
+
+def local_platform():
+    return {"darwin": "osx", "win32": "windows"}.get(sys.platform, sys.platform)
+
+class AliasStore:
+    """Aliases in a local SQLite database, with per-platform and per-host overrides.
+
+    Every alias row is keyed by name and scope. A machine sees the row of the most
+    specific scope that has one: its host, then its platform, then the global row.
+    Each change bumps the row's version and is appended to the changes table, whose
+    sequence number is also stamped on the row; outputs remember the last sequence
+    number they were rendered at, so a render only reads the rows changed since
+    then. Deleted rows keep their name with a NULL command for the same reason.
+
+        store = AliasStore()
+        store.apply_ops([("create", "gst", "git status")])
+        store.apply_ops([("create", "gst", "git status -sb")], scope=scope_for(host="laptop"))
+        store.aliases("osx", "laptop")   # -> {"gst": "git status -sb"}
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")  # readers in other processes are not blocked
+            self._db.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            logging.exception("Could not open alias store %s", path)
+            raise IOError(f"Could not open alias store {path}: {e}")
+
+    def close(self):
+        self._db.close()
+
+    def is_empty(self):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM aliases LIMIT 1").fetchone() is None
+
+    def apply_ops(self, ops, scope=GLOBAL):
+        """Apply (action, name, command) operations to one scope in a single transaction.
+
+        Returns the same summary as the managers' apply_batch. Setting an alias to the
+        command it already has is not a change and leaves version and history alone.
+        """
+        summary = {"created": 0, "updated": 0, "deleted": 0, "missing": []}
+        now = time.time()
+        try:
+            with span("store.apply", ops=len(ops)), self._lock, self._db:
+                for name, (action, command) in coalesce_ops(ops).items():
+                    row = self._db.execute("SELECT command, version FROM aliases WHERE name = ? AND scope = ?",
+                                           (name, scope)).fetchone()
+                    live = row is not None and row[0] is not None
+                    if action == "delete" or (action == "update" and not live):
+                        if not live:
+                            summary["missing"].append(name)
+                            continue
+                        command = None
+                    elif live and row[0] == command:
+                        continue
+                    kind = "delete" if command is None else "update" if live else "create"
+                    version = row[1] + 1 if row else 1
+                    seq = self._db.execute(
+                        "INSERT INTO changes (name, scope, action, command, version, at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, scope, kind, command, version, now)).lastrowid
+                    self._db.execute(
+                        "INSERT INTO aliases (name, scope, command, version, created, updated, seq) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (name, scope) DO UPDATE SET "
+                        "command = excluded.command, version = excluded.version, "
+                        "updated = excluded.updated, seq = excluded.seq",
+                        (name, scope, command, version, now, now, seq))
+                    summary[kind + "d"] += 1
+        except sqlite3.Error as e:
+            logging.exception("Error applying alias batch to %s", self.path)
+            raise IOError(f"Error applying alias batch to {self.path}: {e}")
+        return summary
+
+    def aliases(self, platform, host, names=None, pattern=None, since=None):
+        """{name: command} as seen by one machine.
+
+        Optionally only for `names`, for names matching a GLOB `pattern`, or for names
+        whose rows in this machine's scopes changed after sequence number `since`.
+        """
+        scopes = target_scopes(platform, host)
+        query = ("SELECT name, command, MIN(CASE scope WHEN ? THEN 0 WHEN ? THEN 1 ELSE 2 END) "
+                 "FROM aliases WHERE scope IN (?, ?, ?) AND command IS NOT NULL")
+        params = list(scopes[:2]) + list(scopes)
+        if pattern:
+            query += " AND name GLOB ?"
+            params.append(pattern)
+        if since is not None:
+            query += " AND name IN (SELECT name FROM aliases WHERE seq > ? AND scope IN (?, ?, ?))"
+            params += [since] + list(scopes)
+        return self._select_by_name(query, params, names)
+
+    def overrides(self, names, platform, host):
+        """{name: command} for the names among `names` that a platform or host row overrides."""
+        scopes = target_scopes(platform, host)[:2]
+        query = ("SELECT name, command, MIN(CASE scope WHEN ? THEN 0 ELSE 1 END) FROM aliases "
+                 "WHERE scope IN (?, ?) AND command IS NOT NULL")
+        return self._select_by_name(query, [scopes[0]] + list(scopes), names)
+
+    def scope_of(self, name, platform, host):
+        """The scope whose row one machine sees for `name`, or None if it sees none."""
+        scopes = target_scopes(platform, host)
+        with self._lock:
+            found = {scope for (scope,) in self._db.execute(
+                "SELECT scope FROM aliases WHERE name = ? AND scope IN (?, ?, ?) AND command IS NOT NULL",
+                [name] + list(scopes))}
+        return next((scope for scope in scopes if scope in found), None)
+
+    def _select_by_name(self, query, params, names):
+        # SQLite takes the bare columns of a MIN() aggregate from the row holding the minimum.
+        result = {}
+        if names is None:
+            batches = [None]
+        else:
+            names = list(names)
+            batches = [names[i:i + NAME_BATCH] for i in range(0, len(names), NAME_BATCH)]
+        with span("store.query"), self._lock:
+            for batch in batches:
+                sql, args = query, params
+                if batch is not None:
+                    sql += f" AND name IN ({', '.join('?' * len(batch))})"
+                    args = params + batch
+                result.update((name, command) for name, command, _ in
+                              self._db.execute(sql + " GROUP BY name", args))
+        return result
+
+    def rows(self, scope=None, pattern=None):
+        """Raw rows (name, scope, command, version, updated), filtered by scope and/or name GLOB."""
+        query = "SELECT name, scope, command, version, updated FROM aliases WHERE command IS NOT NULL"
+        params = []
+        if scope is not None:
+            query += " AND scope = ?"
+            params.append(scope)
+        if pattern:
+            query += " AND name GLOB ?"
+            params.append(pattern)
+        with self._lock:
+            return self._db.execute(query + " ORDER BY name, scope", params).fetchall()
+
+    def history(self, name=None, limit=50):
+        """Newest changes first, for one alias or for all of them."""
+        query = "SELECT seq, name, scope, action, command, version, at FROM changes"
+        params = []
+        if name:
+            query += " WHERE name = ?"
+            params.append(name)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY seq DESC LIMIT ?", params + [limit]).fetchall()
+        keys = ("seq", "name", "scope", "action", "command", "version", "at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def diff(self, a, b):
+        """Compare what two (platform, host) machines see: {"only_a", "only_b", "changed"}."""
+        left = self.aliases(*a)
+        right = self.aliases(*b)
+        return {"only_a": sorted(set(left) - set(right)),
+                "only_b": sorted(set(right) - set(left)),
+                "changed": sorted(name for name in set(left) & set(right) if left[name] != right[name])}
+
+    def pending(self, target, platform, host):
+        """(ops, seq) bringing `target` up to date: the rows of its scopes changed since its last render."""
+        scopes = target_scopes(platform, host)
+        with self._lock:
+            row = self._db.execute("SELECT seq FROM renders WHERE target = ?", (target,)).fetchone()
+            last = row[0] if row else 0
+            # Changes committed by another process after this point are left for the next render.
+            seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            changed = [name for (name,) in self._db.execute(
+                "SELECT DISTINCT name FROM aliases WHERE seq > ? AND seq <= ? AND scope IN (?, ?, ?)",
+                [last, seq] + list(scopes))]
+        current = self.aliases(platform, host, since=last)
+        ops = [("create", name, current[name]) if name in current else ("delete", name, None)
+               for name in changed]
+        return ops, seq
+
+    def mark_rendered(self, target, seq):
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO renders (target, seq, at) VALUES (?, ?, ?) ON CONFLICT (target) "
+                             "DO UPDATE SET seq = excluded.seq, at = excluded.at", (target, seq, time.time()))
+
+    def rendered_seq(self, target):
+        with self._lock:
+            row = self._db.execute("SELECT seq FROM renders WHERE target = ?", (target,)).fetchone()
+        return row[0] if row else None
+
+class StoreBackedManager:
+    """Puts an AliasStore in front of a local alias manager.
+
+    Changes are written to the store, then only the rows changed since the last
+    render are passed to the wrapped manager's apply_batch, which writes the profile
+    or the doskey macrofile as before. Listing is a query on the store and does not
+    read those files. The first time, the manager's current aliases are imported.
+    """
+
+    def __init__(self, manager, store=None, platform=None, host=None, target="local"):
+        self.manager = manager
+        self.store = store or AliasStore()
+        self.platform = platform or local_platform()
+        self.host = host or socket.gethostname()
+        self.target = target
+        if self.store.rendered_seq(target) is None:
+            self._import()
+
+    def __getattr__(self, attr):
+        # history(), restore(), profile_path and the like belong to the wrapped manager.
+        return getattr(self.manager, attr)
+
+    def create_alias(self, alias_name, command):
+        self.apply_batch([("create", alias_name, command)])
+        print(f"Added alias '{alias_name}' to {self.store.path}.")
+
+    def list_aliases(self):
+        try:
+            return self.store.aliases(self.platform, self.host)
+        except sqlite3.Error as e:
+            logging.exception("Error listing aliases from %s", self.store.path)
+            raise IOError(f"Error listing aliases: {e}")
+
+    def update_alias(self, alias_name, new_command):
+        # Edit the row this machine sees, which may be a platform or host override.
+        scope = self.store.scope_of(alias_name, self.platform, self.host)
+        if scope is None:
+            raise ValueError(f"Alias '{alias_name}' not found")
+        self.apply_batch([("update", alias_name, new_command)], scope)
+
+    def delete_alias(self, alias_name):
+        """Delete the row this machine sees; a less specific row for the name then applies, if any."""
+        scope = self.store.scope_of(alias_name, self.platform, self.host)
+        if scope is None:
+            raise ValueError(f"Alias '{alias_name}' not found")
+        self.apply_batch([("delete", alias_name, None)], scope)
+        if scope != GLOBAL and alias_name in self.store.aliases(self.platform, self.host, [alias_name]):
+            print(f"Removed the {scope} override of '{alias_name}'; the less specific definition now applies.")
+
+    def apply_batch(self, ops, scope=GLOBAL):
+        summary = self.store.apply_ops(ops, scope)
+        self.render()
+        return summary
+
+    def set_for(self, alias_name, command, platform=None, host=None):
+        """Create (command) or remove (None) an alias for one platform or host only."""
+        action = "delete" if command is None else "create"
+        return self.apply_batch([(action, alias_name, command)], scope_for(platform, host))
+
+    def remote_ops(self, ops, remote_os, remote_host):
+        """Rewrite global ops for a remote host, using its platform and host overrides where it has them."""
+        overrides = self.store.overrides({name for _, name, _ in ops}, remote_os, remote_host)
+        return [("create", name, overrides[name]) if name in overrides else (action, name, command)
+                for action, name, command in ops]
+
+    def render(self):
+        """Write the rows changed since the last render to the wrapped manager's output."""
+        ops, seq = self.store.pending(self.target, self.platform, self.host)
+        if ops:
+            with span("store.render", ops=len(ops)):
+                # "update" edits an alias where it is, even outside the managed block.
+                existing = self.manager.list_aliases()
+                self.manager.apply_batch([("update" if action == "create" and name in existing else action,
+                                           name, command) for action, name, command in ops])
+            logging.info("Rendered %d changed aliases from %s.", len(ops), self.store.path)
+        self.store.mark_rendered(self.target, seq)
+        return len(ops)
+
+    def _import(self):
+        aliases = self.manager.list_aliases()
+        if self.store.is_empty():
+            self.store.apply_ops([("create", name, command) for name, command in aliases.items()])
+            logging.info("Imported %d aliases into %s.", len(aliases), self.store.path)
+        # The output already holds the imported aliases; later renders start from here.
+        ops, seq = self.store.pending(self.target, self.platform, self.host)
+        if any(aliases.get(name) != command for _, name, command in ops):
+            self.manager.apply_batch([op for op in ops if aliases.get(op[1]) != op[2]])
+        self.store.mark_rendered(self.target, seq)
+
+def parse_target(text):
+    """"osx", "windows@build-01" or "@build-01" -> (platform, host)."""
+    platform, _, host = text.partition("@")
+    return platform or local_platform(), host or None
+
+def format_history(changes):
+    if not changes:
+        return "No changes recorded."
+    lines = []
+    for c in changes:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(c["at"]))
+        scope = c["scope"] or "global"
+        command = "" if c["command"] is None else c["command"]
+        lines.append(f"{c['seq']:>6}  {when}  {c['action']:<6} {c['name']:<20} v{c['version']:<3} {scope:<20} {command}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and edit the SQLite alias store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="Aliases one machine sees (default: this one), or raw rows with --scope")
+    p.add_argument("--platform", choices=PLATFORMS)
+    p.add_argument("--host")
+    p.add_argument("--scope", help="Show the rows of one scope: global, platform:osx, host:NAME")
+    p.add_argument("--match", metavar="GLOB", help="Only names matching a shell pattern, e.g. 'g*'")
+    p = sub.add_parser("set", help="Set an alias for every machine, one platform or one host")
+    p.add_argument("name")
+    p.add_argument("alias_command", metavar="command")
+    p.add_argument("--platform", choices=PLATFORMS)
+    p.add_argument("--host")
+    p = sub.add_parser("unset", help="Remove an alias, or only its platform or host override")
+    p.add_argument("name")
+    p.add_argument("--platform", choices=PLATFORMS)
+    p.add_argument("--host")
+    p = sub.add_parser("log", help="Change history, newest first")
+    p.add_argument("name", nargs="?")
+    p.add_argument("--limit", type=int, default=50)
+    p = sub.add_parser("diff", help="Compare two machines, e.g. osx@laptop windows@build-01")
+    p.add_argument("a")
+    p.add_argument("b")
+    sub.add_parser("render", help="Write pending changes to this machine's profile or macrofile")
+    args = parser.parse_args(argv)
+
+    store = AliasStore()
+    if args.command == "list":
+        if args.scope:
+            scope = GLOBAL if args.scope == "global" else args.scope
+            for name, scope, command, version, _ in store.rows(scope, args.match):
+                print(f"{name:<24} v{version:<3} {command}")
+            return
+        aliases = store.aliases(args.platform or local_platform(), args.host or socket.gethostname(),
+                                pattern=args.match)
+        for name in sorted(aliases):
+            print(f"{name:<24} {aliases[name]}")
+        if not aliases:
+            print("No aliases in the store.")
+    elif args.command == "log":
+        print(format_history(store.history(args.name, args.limit)))
+    elif args.command == "diff":
+        a, b = parse_target(args.a), parse_target(args.b)
+        result = store.diff((a[0], a[1] or socket.gethostname()), (b[0], b[1] or socket.gethostname()))
+        for key, label in (("only_a", f"only on {args.a}"), ("only_b", f"only on {args.b}"), ("changed", "different")):
+            if result[key]:
+                print(f"{label}: {', '.join(result[key])}")
+        if not any(result.values()):
+            print("Both see the same aliases.")
+    else:
+        import main as alias_main
+        manager = alias_main.get_local_manager(alias_main.platform.system(), store=store)
+        if manager is None:
+            sys.exit("Unsupported local OS for alias rendering.")
+        if args.command == "set":
+            summary = manager.set_for(args.name, args.alias_command, args.platform, args.host)
+            print(f"{args.name}: {'unchanged' if not summary['created'] + summary['updated'] else 'saved'}.")
+        elif args.command == "unset":
+            summary = manager.set_for(args.name, None, args.platform, args.host)
+            print(f"{args.name}: {'removed' if summary['deleted'] else 'not found'}.")
+        else:
+            print(f"{manager.render()} changed aliases rendered.")
+
+if __name__ == "__main__":
+    logging.basicConfig(filename=LOG_PATH,
+                        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        main()
+    except IOError as e:
+        sys.exit(str(e))
@@ -0,0 +1,70 @@
+import hashlib
+import logging
+
+def alias_digest(alias_name, command):
+    """Digest of one alias; the remote scripts compute exactly the same value."""
+    return hashlib.md5(f"{alias_name}\n{command}".encode("utf-8")).hexdigest()
+
+def digest_map(aliases):
+    return {name: alias_digest(name, command) for name, command in aliases.items()}
+
+def root_digest(digests):
+    """Digest of a whole alias set given its per-alias digests."""
+    lines = [f"{name} {digests[name]}" for name in sorted(digests)]
+    return hashlib.md5("\n".join(lines).encode("utf-8")).hexdigest()
+
+def bucket_key(alias_name):
+    """Hash tree bucket of an alias: the hex of the first byte of its name."""
+    return alias_name.encode("utf-8")[:1].hex()
+
+def build_tree(aliases):
+    """Build the two-level hash tree the remote tree scripts compute.
+
+    Returns {"root": digest, "buckets": {bucket: digest}, "aliases": {bucket: {name: digest}}}.
+    A bucket's digest covers the sorted "name digest" lines of its aliases and the
+    root covers the sorted "bucket digest" lines.
+    """
+    grouped = {}
+    for name in sorted(aliases):
+        grouped.setdefault(bucket_key(name), {})[name] = alias_digest(name, aliases[name])
+    buckets = {key: root_digest(digests) for key, digests in grouped.items()}
+    return {"root": root_digest(buckets), "buckets": buckets, "aliases": grouped}
+
+def plan_sync(local_aliases, remote_digests, prune=True):
+    """Return the (action, name, command) operations that make the remote match local."""
+    ops = []
+    for name, command in local_aliases.items():
+        remote = remote_digests.get(name)
+        if remote is None:
+            ops.append(("create", name, command))
+        elif remote != alias_digest(name, command):
+            ops.append(("update", name, command))
+    if prune:
+        for name in remote_digests:
+            if name not in local_aliases:
+                ops.append(("delete", name, None))
+    return ops
+
+def sync_aliases(local_aliases, remote_manager, prune=True, dry_run=False):
+    """Bring a remote alias set in line with local_aliases.
+
+    The local root digest is sent along with the digest request, so when both sides
+    already match the remote answers with just its root and nothing else is sent.
+    Otherwise the per-alias digests come back in the same round trip and only the
+    missing, changed and (with prune) extra aliases are pushed in one batch.
+    """
+    local_root = root_digest(digest_map(local_aliases))
+    remote_root, remote_digests = remote_manager.alias_digests(expected_root=local_root)
+    summary = {"host": remote_manager.host, "in_sync": remote_root == local_root,
+               "created": 0, "updated": 0, "deleted": 0}
+    if summary["in_sync"]:
+        logging.info("Aliases on %s already in sync (%s).", remote_manager.host, local_root[:12])
+        return summary
+    ops = plan_sync(local_aliases, remote_digests, prune=prune)
+    for action, _, _ in ops:
+        summary[action + "d"] += 1
+    if ops and not dry_run:
+        remote_manager.apply_batch(ops)
+    logging.info("Synced aliases on %s: %d created, %d updated, %d deleted%s.", remote_manager.host,
+                 summary["created"], summary["updated"], summary["deleted"], " (dry run)" if dry_run else "")
+    return summary
@@ -0,0 +1,31 @@
+import os
+import uuid
+import shutil
+
+def write_atomic(path, data):
+    """Replace the file at `path` with `data` (str or bytes) in one rename.
+
+    A symlinked file (e.g. a dotfile linked into a dotfiles repository) stays a link:
+    the file it points to is the one replaced. The temporary file is created next to
+    that real file, so the rename never crosses filesystems, and it takes over the
+    original's permissions; a new file gets the usual umask-based mode.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="surrogateescape")
+    real_path = os.path.realpath(path)
+    tmp_path = f"{real_path}.{uuid.uuid4().hex[:8]}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(real_path):
+            shutil.copymode(real_path, tmp_path)
+        os.replace(tmp_path, real_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,43 @@
+import json
+import os
+import logging
+import threading
+
+AUTH_CACHE_PATH = os.path.expanduser("~/.alias_manager_auth_cache.json")
+
+_lock = threading.Lock()
+_cache = None
+
+def _load():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if os.path.exists(AUTH_CACHE_PATH):
+            try:
+                with open(AUTH_CACHE_PATH, "r") as f:
+                    _cache = json.load(f)
+            except Exception as e:
+                logging.warning("Ignoring unreadable auth cache %s: %s", AUTH_CACHE_PATH, e)
+                _cache = {}
+    return _cache
+
+def get_auth_method(host, username):
+    """Return the auth method ("key" or "password") that last worked for this host, or None."""
+    with _lock:
+        return _load().get(f"{username}@{host}")
+
+def remember_auth_method(host, username, method):
+    """Record the auth method that worked for this host, writing the cache only if it changed."""
+    key = f"{username}@{host}"
+    with _lock:
+        cache = _load()
+        if cache.get(key) == method:
+            return
+        cache[key] = method
+        try:
+            tmp_path = AUTH_CACHE_PATH + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(cache, f, indent=4)
+            os.replace(tmp_path, AUTH_CACHE_PATH)
+        except Exception as e:
+            logging.warning("Could not save auth cache %s: %s", AUTH_CACHE_PATH, e)
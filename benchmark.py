@@ -0,0 +1,234 @@
+"""Benchmark the alias managers against synthetic profiles and alias indexes.
+
+    python3 benchmark.py --sizes 10,1000,100000 --output bench.json
+    python3 benchmark.py --baseline bench.json            # fail on p50 regressions
+    python3 benchmark.py --backends remote --latency 0.05 --bandwidth 1000000
+
+Every backend is run at every size for single create/list/update/delete and for bulk
+create/update/delete through apply_batch. Remote backends talk to an in-process SSH
+stand-in (ssh_stand_in.py) playing a macOS host, with optional injected latency and
+bandwidth. Everything runs under a temporary HOME, so your own profile, snapshots and
+caches are never touched.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import contextlib
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+DEFAULT_SIZES = "10,1000,100000"
+BACKENDS = ("osx", "windows", "remote", "remote-sftp")
+REGRESSION_THRESHOLD = 0.2
+
+def make_aliases(count):
+    return {f"a{i}": f"echo alias number {i}" for i in range(count)}
+
+def write_profile(path, aliases):
+    from profile_index import BLOCK_START, BLOCK_END, format_alias_line
+    with open(path, "w") as f:
+        f.write("export PATH=$PATH:/usr/local/bin\n")
+        f.write(BLOCK_START + "\n")
+        f.writelines(format_alias_line(name, command) for name, command in aliases.items())
+        f.write(BLOCK_END + "\n")
+
+def write_windows_index(alias_dir, aliases):
+    os.makedirs(alias_dir, exist_ok=True)
+    with open(os.path.join(alias_dir, "aliases.json"), "w") as f:
+        json.dump({"aliases": aliases, "migrated": True, "shims": True}, f)
+
+def peak_alloc_kb(fn, manager, i):
+    """Peak Python allocation of one extra run of an operation, in KB.
+
+    Traced separately from the timed runs, since tracing slows every allocation down.
+    For the remote backends this includes the in-process stand-in server.
+    """
+    tracemalloc.start()
+    try:
+        fn(manager, i)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+def summarize(durations):
+    durations = sorted(durations)
+    total = sum(durations)
+    return {
+        "runs": len(durations),
+        "ops_per_sec": round(len(durations) / total, 2) if total else None,
+        "p50_ms": round(durations[len(durations) // 2] * 1000, 3),
+        "p99_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1000, 3),
+    }
+
+def operations(size, bulk):
+    """(name, fn(manager, i)) for every benchmarked operation, in an order that leaves the set intact."""
+    def bulk_ops(action, i):
+        return [(action, f"bulk{i}_{j}", None if action == "delete" else f"echo bulk {action}")
+                for j in range(bulk)]
+    return [
+        ("create", lambda m, i: m.create_alias(f"new{i}", "echo new")),
+        ("list", lambda m, i: m.list_aliases()),
+        ("update", lambda m, i: m.update_alias(f"a{i % size}", f"echo updated {i}")),
+        ("delete", lambda m, i: m.delete_alias(f"new{i}")),
+        ("bulk_create", lambda m, i: m.apply_batch(bulk_ops("create", i))),
+        ("bulk_update", lambda m, i: m.apply_batch(bulk_ops("update", i))),
+        ("bulk_delete", lambda m, i: m.apply_batch(bulk_ops("delete", i))),
+    ]
+
+def remote_operations(jobs=16):
+    """Independent remote commands one after another versus over concurrent channels."""
+    commands = [f"echo {j}" for j in range(jobs)]
+    return [
+        (f"exec_x{jobs}_serial", lambda m, i: [m.run_commands([c], max_channels=1) for c in commands]),
+        (f"exec_x{jobs}_channels", lambda m, i: m.run_commands(commands)),
+    ]
+
+def run_backend(backend, size, runs, bulk, workdir, latency, bandwidth):
+    aliases = make_aliases(size)
+    server = None
+    if backend == "osx":
+        from alias_manager_osx import OSXAliasManager
+        write_profile(os.path.join(workdir, ".bash_profile"), aliases)
+        manager = OSXAliasManager(output="profile")
+    elif backend == "windows":
+        from alias_manager_windows import WindowsAliasManager
+        alias_dir = os.path.join(workdir, "AliasManager")
+        write_windows_index(alias_dir, aliases)
+        manager = WindowsAliasManager(alias_dir, legacy_dir=os.path.join(workdir, "no-legacy"))
+    else:
+        from alias_manager_remote import RemoteAliasManager
+        from ssh_stand_in import StandInSSHServer
+        remote_home = os.path.join(workdir, "remote")
+        os.makedirs(remote_home, exist_ok=True)
+        write_profile(os.path.join(remote_home, ".bash_profile"), aliases)
+        server = StandInSSHServer(remote_home, latency=latency, bandwidth=bandwidth)
+        port = server.start()
+        manager = RemoteAliasManager("osx", f"127.0.0.1:{port}", server.username, server.password,
+                                     timeout=120, osx_engine="sftp" if backend == "remote-sftp" else "shell")
+    results = []
+    quiet = open(os.devnull, "w")
+    try:
+        cases = operations(size, bulk)
+        if backend == "remote":
+            cases += remote_operations()
+        for name, fn in cases:
+            durations = []
+            error = None
+            for i in range(runs):
+                start = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(quiet):
+                        fn(manager, i)
+                except Exception as e:
+                    error = str(e)
+                    break
+                durations.append(time.perf_counter() - start)
+            result = {"backend": backend, "operation": name, "size": size}
+            result.update(summarize(durations) if durations else {"runs": 0})
+            if not error:
+                try:
+                    with contextlib.redirect_stdout(quiet):
+                        result["peak_alloc_kb"] = peak_alloc_kb(fn, manager, runs)
+                except Exception as e:
+                    error = str(e)
+            if error:
+                result["error"] = error
+            results.append(result)
+            print(format_result(result), flush=True)
+    finally:
+        quiet.close()
+        if backend.startswith("remote"):
+            manager.close()
+            server.stop()
+    return results
+
+def format_result(r):
+    if not r["runs"]:
+        return f"{r['backend']:<12} {r['operation']:<18} {r['size']:>8}  FAILED: {r.get('error')}"
+    return (f"{r['backend']:<12} {r['operation']:<18} {r['size']:>8}  {r['ops_per_sec']:>10} ops/s  "
+            f"p50 {r['p50_ms']:>9} ms  p99 {r['p99_ms']:>9} ms  peak {r.get('peak_alloc_kb')} KB")
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return the results whose p50 is more than `threshold` slower than in the baseline."""
+    previous = {(r["backend"], r["operation"], r["size"]): r for r in baseline["results"] if r.get("runs")}
+    regressions = []
+    for r in results:
+        before = previous.get((r["backend"], r["operation"], r["size"]))
+        if before is None or not r.get("runs"):
+            continue
+        change = (r["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0
+        r["baseline_p50_ms"] = before["p50_ms"]
+        r["change"] = round(change, 3)
+        if change > threshold:
+            regressions.append(r)
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the alias managers.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated alias counts (default {DEFAULT_SIZES}; up to 1000000)")
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help=f"Comma-separated subset of {', '.join(BACKENDS)}")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per operation (fewer above 10k aliases)")
+    parser.add_argument("--bulk", type=int, default=100, help="Aliases per bulk operation")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected round-trip time in seconds")
+    parser.add_argument("--bandwidth", type=int, default=None, help="Injected bandwidth cap in bytes/s")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed p50 slowdown against the baseline (default 0.2 = 20%%)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        sys.exit(f"Unknown backends: {', '.join(sorted(unknown))}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    output = os.path.abspath(args.output)
+
+    workdir = tempfile.mkdtemp(prefix="alias-bench-")
+    # Module-level paths (snapshots, caches) are derived from HOME on import.
+    os.environ["HOME"] = workdir
+    os.environ["SHELL"] = "/bin/bash"
+    import logging
+    logging.basicConfig(filename=os.path.join(workdir, "alias_manager.log"), level=logging.WARNING)
+
+    results = []
+    try:
+        for size in sizes:
+            runs = args.repeat if size <= 10000 else max(3, args.repeat // 5)
+            for backend in backends:
+                results.extend(run_backend(backend, size, runs, args.bulk, workdir,
+                                           args.latency, args.bandwidth))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {"time": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+                 "sizes": sizes, "repeat": args.repeat, "bulk": args.bulk,
+                 "latency": args.latency, "bandwidth": args.bandwidth},
+        "results": results,
+    }
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}.")
+    if baseline:
+        for r in regressions:
+            print(f"REGRESSION {r['backend']}/{r['operation']}/{r['size']}: p50 {r['baseline_p50_ms']} -> "
+                  f"{r['p50_ms']} ms ({r['change']:+.0%})")
+        print(f"{len(regressions)} regression(s) against {args.baseline}.")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
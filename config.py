@@ -1,8 +1,10 @@
 import json
 import os
 from getpass import getpass
+from timing import timed
 
 CONFIG_PATH = os.path.expanduser("~/.alias_manager_config.json")
+LOG_PATH = os.path.expanduser("~/.alias_manager.log")
 
 def setup_config():
     print("Remote configuration not found. Please enter remote SSH details.")
@@ -22,12 +24,31 @@ def setup_config():
         print("Error saving configuration file:", e)
     return config
 
+# (mtime, size) of the config file and its parsed contents, so a long-running
+# process (the agent, the watcher) only re-reads the file after it changed.
+_cache = (None, None)
+
+def _read_cached():
+    global _cache
+    st = os.stat(CONFIG_PATH)
+    stamp = (st.st_mtime_ns, st.st_size)
+    if _cache[0] != stamp:
+        with open(CONFIG_PATH, "r") as f:
+            _cache = (stamp, json.load(f))
+    return dict(_cache[1])
+
+def read_config():
+    """Return the saved configuration, or {} if there is none; never prompts."""
+    try:
+        return _read_cached()
+    except (IOError, ValueError):
+        return {}
+
+@timed("config.load")
 def load_config():
     if os.path.exists(CONFIG_PATH):
         try:
-            with open(CONFIG_PATH, "r") as f:
-                config = json.load(f)
-            return config
+            return _read_cached()
         except Exception as e:
             print("Error reading configuration file:", e)
             # If there's an error reading, force re-setup
@@ -0,0 +1,62 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 30
+
+def run_on_host(target, operation, timeout, pool=None):
+    """Connect to one target, run operation(manager) and return a result dict."""
+    from alias_manager_remote import RemoteAliasManager
+    start = time.monotonic()
+    result = {"name": target["name"], "host": target["host"], "ok": False, "result": None, "error": None}
+    manager = None
+    try:
+        manager = RemoteAliasManager(target["os"], target["host"], target["username"],
+                                     target["password"], timeout=timeout, pool=pool)
+        result["result"] = operation(manager)
+        result["ok"] = True
+    except Exception as e:
+        logging.exception("Fan-out operation failed on %s", target["host"])
+        result["error"] = str(e)
+    finally:
+        if manager is not None:
+            manager.close()
+        result["elapsed"] = time.monotonic() - start
+    return result
+
+def run_fanout(targets, operation, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+               on_result=None, pool=None):
+    """Run operation(manager) against every target concurrently.
+
+    At most `concurrency` hosts are worked on at once; `timeout` bounds the connect and
+    every remote command on each host. Results are returned in the order of `targets`,
+    and on_result(result) is called as each host finishes. Pass an SSHConnectionPool as
+    `pool` to keep the connections open for later runs.
+    """
+    results = {}
+    workers = max(1, min(concurrency, len(targets)))
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_on_host, target, operation, timeout, pool): index
+                   for index, target in enumerate(targets)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result:
+                on_result(result)
+    ordered = [results[index] for index in range(len(targets))]
+    failed = sum(1 for r in ordered if not r["ok"])
+    logging.info("Fan-out finished on %d hosts in %.2fs (%d failed).",
+                 len(ordered), time.monotonic() - start, failed)
+    return ordered
+
+def format_summary(results):
+    """Return a human readable per-host summary of fan-out results."""
+    lines = []
+    for r in results:
+        status = "OK" if r["ok"] else f"FAILED: {r['error']}"
+        lines.append(f"{r['name']:<24} {r['elapsed']:6.2f}s  {status}")
+    ok = sum(1 for r in results if r["ok"])
+    lines.append(f"{ok}/{len(results)} hosts succeeded.")
+    return "\n".join(lines)
@@ -0,0 +1,80 @@
+import time
+import logging
+from alias_sync import build_tree, bucket_key
+from fanout import run_fanout, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+
+def audit_host(manager, tree):
+    """Compare one host's alias hash tree against the canonical tree.
+
+    Only the root digest is fetched from a host that matches. Otherwise the bucket
+    digests are fetched, then the alias digests of just the buckets that differ and
+    exist on the host, so the work done grows with the drift rather than the alias count.
+    """
+    root, count = manager.alias_tree("root")
+    report = {"in_sync": root == tree["root"], "root": root, "alias_count": count,
+              "missing": [], "extra": [], "changed": [], "round_trips": 1}
+    if report["in_sync"]:
+        return report
+    remote_buckets = manager.alias_tree("buckets")
+    report["round_trips"] += 1
+    differing = sorted(key for key in set(tree["buckets"]) | set(remote_buckets)
+                       if tree["buckets"].get(key) != remote_buckets.get(key))
+    fetch = [key for key in differing if key in remote_buckets]
+    remote_digests = {}
+    if fetch:
+        remote_digests = manager.alias_tree("aliases", fetch)
+        report["round_trips"] += 1
+    for key in differing:
+        local = tree["aliases"].get(key, {})
+        for name, digest in local.items():
+            if name not in remote_digests:
+                report["missing"].append(name)
+            elif remote_digests[name] != digest:
+                report["changed"].append(name)
+    for name in remote_digests:
+        if name not in tree["aliases"].get(bucket_key(name), {}):
+            report["extra"].append(name)
+    for key in ("missing", "extra", "changed"):
+        report[key].sort()
+    return report
+
+def audit_fleet(targets, canonical_aliases, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                pool=None):
+    """Audit every target against canonical_aliases in parallel and return a drift report dict."""
+    tree = build_tree(canonical_aliases)
+    started = time.time()
+    results = run_fanout(targets, lambda manager: audit_host(manager, tree),
+                         concurrency=concurrency, timeout=timeout, pool=pool)
+    hosts = []
+    for r in results:
+        entry = {"name": r["name"], "host": r["host"], "ok": r["ok"], "error": r["error"],
+                 "elapsed": round(r["elapsed"], 3)}
+        if r["ok"]:
+            entry.update(r["result"])
+        hosts.append(entry)
+    summary = {
+        "hosts": len(hosts),
+        "in_sync": sum(1 for h in hosts if h["ok"] and h["in_sync"]),
+        "drifted": sum(1 for h in hosts if h["ok"] and not h["in_sync"]),
+        "failed": sum(1 for h in hosts if not h["ok"]),
+    }
+    logging.info("Audited %d hosts: %d in sync, %d drifted, %d failed.", summary["hosts"],
+                 summary["in_sync"], summary["drifted"], summary["failed"])
+    return {"generated": started, "canonical_root": tree["root"], "canonical_count": len(canonical_aliases),
+            "summary": summary, "hosts": hosts}
+
+def format_report(report):
+    """Return a human readable summary of a drift report."""
+    lines = []
+    for h in report["hosts"]:
+        if not h["ok"]:
+            status = f"FAILED: {h['error']}"
+        elif h["in_sync"]:
+            status = "in sync"
+        else:
+            status = (f"{len(h['missing'])} missing, {len(h['extra'])} extra, "
+                      f"{len(h['changed'])} changed")
+        lines.append(f"{h['name']:<24} {status}")
+    s = report["summary"]
+    lines.append(f"{s['in_sync']}/{s['hosts']} hosts in sync, {s['drifted']} drifted, {s['failed']} failed.")
+    return "\n".join(lines)
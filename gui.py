@@ -1,12 +1,16 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog, scrolledtext
+from tkinter import messagebox, simpledialog, scrolledtext, ttk
 import platform
 import logging
-from config import load_config
+import threading
+from config import LOG_PATH, load_config, read_config
+from ssh_pool import pool_from_config
+from gui_tasks import BackgroundTasks
+from alias_search import AliasSearchIndex
 
 # Set up logging
 logging.basicConfig(
-    filename='alias_manager.log',
+    filename=LOG_PATH,
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
@@ -24,96 +28,120 @@ else:
 # Import remote alias manager.
 from alias_manager_remote import RemoteAliasManager
 
-def create_alias():
-    alias_name = alias_entry.get().strip()
-    command = command_entry.get().strip()
-    if not alias_name or not command:
-        messagebox.showerror("Input Error", "Please provide both alias and command.")
-        return
-    try:
-        # Create local alias.
-        if local_os == "Darwin":
-            local_manager = OSXAliasManager()
-        elif local_os == "Windows":
-            local_manager = WindowsAliasManager()
-        local_manager.create_alias(alias_name, command)
-        logging.info("Local alias created: %s", alias_name)
-    except Exception as e:
-        logging.exception("Error creating local alias")
-        messagebox.showerror("Error", f"Error creating local alias: {e}")
-        return
+# Names and commands of the local and remote aliases, for autocomplete.
+search_index = AliasSearchIndex()
+# Local managers share the cached profile index (or the Windows alias index), which is
+# edited read-modify-write; tasks take turns on it while their remote parts overlap.
+local_lock = threading.Lock()
+
+class OperationError(Exception):
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
 
-    # Determine remote OS (assume remote is the opposite OS).
+def make_local_manager():
     if local_os == "Darwin":
-        remote_os = "windows"
-        remote_os_msg = "Windows"
-    elif local_os == "Windows":
-        remote_os = "osx"
-        remote_os_msg = "OSX"
+        manager, platform_name = OSXAliasManager(), "osx"
     else:
-        messagebox.showerror("OS Error", f"Unsupported local OS: {local_os}")
-        return
+        manager, platform_name = WindowsAliasManager(), "windows"
+    if read_config().get("alias_store"):
+        from alias_store import AliasStore, StoreBackedManager
+        return StoreBackedManager(manager, AliasStore(), platform=platform_name)
+    return manager
 
-    # Load remote configuration.
+def make_remote_manager(task):
+    """Connect to the configured remote host (the "other" OS); runs on a worker thread."""
+    remote_os = "windows" if local_os == "Darwin" else "osx"
     config = load_config()
     remote_host = config.get("remote_host")
     remote_username = config.get("remote_username")
     remote_password = config.get("remote_password")
     if not (remote_host and remote_username and remote_password):
-        messagebox.showerror("Configuration Error", "Remote configuration not found. Please set up the config file.")
+        raise OperationError("Configuration Error", "Remote configuration not found. Please set up the config file.")
+    task.report(f"Connecting to {remote_host}...")
+    return RemoteAliasManager(remote_os, remote_host, remote_username, remote_password,
+                              pool=pool_from_config(config))
+
+def show_error(exc):
+    if isinstance(exc, OperationError):
+        messagebox.showerror(exc.title, str(exc))
+    else:
+        messagebox.showerror("Error", str(exc))
+
+def show_success(message):
+    messagebox.showinfo("Success", message)
+
+def create_alias():
+    alias_name = alias_entry.get().strip()
+    command = command_entry.get().strip()
+    if not alias_name or not command:
+        messagebox.showerror("Input Error", "Please provide both alias and command.")
         return
 
-    try:
-        remote_manager = RemoteAliasManager(remote_os, remote_host, remote_username, remote_password)
-        remote_manager.create_alias(alias_name, command)
-        logging.info("Remote alias created on %s: %s", remote_os_msg, alias_name)
-        messagebox.showinfo("Success", "Alias created locally and remotely successfully!")
-    except Exception as e:
-        logging.exception("Error creating remote alias")
-        messagebox.showerror("Error", f"Error creating remote alias: {e}")
+    def work(task):
+        task.report("Creating local alias...")
+        try:
+            with local_lock:
+                make_local_manager().create_alias(alias_name, command)
+            search_index.set(alias_name, command, "local")
+            logging.info("Local alias created: %s", alias_name)
+        except Exception as e:
+            logging.exception("Error creating local alias")
+            raise OperationError("Error", f"Error creating local alias: {e}")
+        remote_manager = make_remote_manager(task)
+        task.report("Creating remote alias...")
+        try:
+            remote_manager.create_alias(alias_name, command)
+            search_index.set(alias_name, command, "remote")
+            logging.info("Remote alias created on %s: %s", remote_manager.remote_os, alias_name)
+        except Exception as e:
+            logging.exception("Error creating remote alias")
+            raise OperationError("Error", f"Error creating remote alias: {e}")
+        return "Alias created locally and remotely successfully!"
+
+    tasks.submit(f"Create {alias_name}", work, on_success=show_success, on_error=show_error)
 
 def list_aliases():
-    # List local aliases.
-    try:
-        if local_os == "Darwin":
-            local_manager = OSXAliasManager()
-        elif local_os == "Windows":
-            local_manager = WindowsAliasManager()
-        local_aliases = local_manager.list_aliases()
-    except Exception as e:
-        logging.exception("Error listing local aliases")
-        messagebox.showerror("Error", f"Error listing local aliases: {e}")
-        local_aliases = {}
-
-    # List remote aliases.
-    try:
-        if local_os == "Darwin":
-            remote_os = "windows"
-        elif local_os == "Windows":
-            remote_os = "osx"
-        config = load_config()
-        remote_host = config.get("remote_host")
-        remote_username = config.get("remote_username")
-        remote_password = config.get("remote_password")
-        remote_manager = RemoteAliasManager(remote_os, remote_host, remote_username, remote_password)
-        remote_aliases = remote_manager.list_aliases()
-    except Exception as e:
-        logging.exception("Error listing remote aliases")
-        messagebox.showerror("Error", f"Error listing remote aliases: {e}")
-        remote_aliases = {}
-
-    result = "Local Aliases:\n"
-    for k, v in local_aliases.items():
-        result += f"{k}: {v}\n"
-    result += "\nRemote Aliases:\n"
-    for k, v in remote_aliases.items():
-        result += f"{k}: {v}\n"
+    def work(task):
+        errors = []
+        task.report("Listing local aliases...")
+        try:
+            with local_lock:
+                local_aliases = make_local_manager().list_aliases()
+            search_index.load(local_aliases, "local")
+        except Exception as e:
+            logging.exception("Error listing local aliases")
+            errors.append(f"Error listing local aliases: {e}")
+            local_aliases = {}
+        try:
+            remote_manager = make_remote_manager(task)
+            task.report("Listing remote aliases...")
+            remote_aliases = remote_manager.list_aliases()
+            search_index.load(remote_aliases, "remote")
+        except Exception as e:
+            logging.exception("Error listing remote aliases")
+            errors.append(f"Error listing remote aliases: {e}")
+            remote_aliases = {}
+        return local_aliases, remote_aliases, errors
+
+    tasks.submit("List aliases", work, on_success=show_alias_list, on_error=show_error)
+
+def show_alias_list(result):
+    local_aliases, remote_aliases, errors = result
+    for error in errors:
+        messagebox.showerror("Error", error)
+
+    lines = ["Local Aliases:"]
+    lines.extend(f"{k}: {v}" for k, v in local_aliases.items())
+    lines.append("")
+    lines.append("Remote Aliases:")
+    lines.extend(f"{k}: {v}" for k, v in remote_aliases.items())
 
     list_window = tk.Toplevel(root)
     list_window.title("List of Aliases")
     text_area = scrolledtext.ScrolledText(list_window, width=60, height=20)
     text_area.pack(padx=10, pady=10)
-    text_area.insert(tk.END, result)
+    text_area.insert(tk.END, "\n".join(lines) + "\n")
     text_area.config(state=tk.DISABLED)
 
 def update_alias():
@@ -123,67 +151,190 @@ def update_alias():
     new_command = simpledialog.askstring("Update Alias", "Enter the new command:")
     if not new_command:
         return
-    try:
-        if local_os == "Darwin":
-            local_manager = OSXAliasManager()
-        elif local_os == "Windows":
-            local_manager = WindowsAliasManager()
-        local_manager.update_alias(alias_name, new_command)
-        logging.info("Local alias updated: %s", alias_name)
-    except Exception as e:
-        logging.exception("Error updating local alias")
-        messagebox.showerror("Error", f"Error updating local alias: {e}")
-        return
 
-    try:
-        if local_os == "Darwin":
-            remote_os = "windows"
-        elif local_os == "Windows":
-            remote_os = "osx"
-        config = load_config()
-        remote_host = config.get("remote_host")
-        remote_username = config.get("remote_username")
-        remote_password = config.get("remote_password")
-        remote_manager = RemoteAliasManager(remote_os, remote_host, remote_username, remote_password)
-        remote_manager.update_alias(alias_name, new_command)
-        logging.info("Remote alias updated: %s", alias_name)
-        messagebox.showinfo("Success", "Alias updated locally and remotely successfully!")
-    except Exception as e:
-        logging.exception("Error updating remote alias")
-        messagebox.showerror("Error", f"Error updating remote alias: {e}")
+    def work(task):
+        task.report("Updating local alias...")
+        try:
+            with local_lock:
+                make_local_manager().update_alias(alias_name, new_command)
+            search_index.set(alias_name, new_command, "local")
+            logging.info("Local alias updated: %s", alias_name)
+        except Exception as e:
+            logging.exception("Error updating local alias")
+            raise OperationError("Error", f"Error updating local alias: {e}")
+        try:
+            remote_manager = make_remote_manager(task)
+            task.report("Updating remote alias...")
+            remote_manager.update_alias(alias_name, new_command)
+            search_index.set(alias_name, new_command, "remote")
+            logging.info("Remote alias updated: %s", alias_name)
+        except OperationError:
+            raise
+        except Exception as e:
+            logging.exception("Error updating remote alias")
+            raise OperationError("Error", f"Error updating remote alias: {e}")
+        return "Alias updated locally and remotely successfully!"
+
+    tasks.submit(f"Update {alias_name}", work, on_success=show_success, on_error=show_error)
 
 def delete_alias():
     alias_name = simpledialog.askstring("Delete Alias", "Enter the alias name to delete:")
     if not alias_name:
         return
-    try:
-        if local_os == "Darwin":
-            local_manager = OSXAliasManager()
-        elif local_os == "Windows":
-            local_manager = WindowsAliasManager()
-        local_manager.delete_alias(alias_name)
-        logging.info("Local alias deleted: %s", alias_name)
-    except Exception as e:
-        logging.exception("Error deleting local alias")
-        messagebox.showerror("Error", f"Error deleting local alias: {e}")
-        return
 
-    try:
-        if local_os == "Darwin":
-            remote_os = "windows"
-        elif local_os == "Windows":
-            remote_os = "osx"
-        config = load_config()
-        remote_host = config.get("remote_host")
-        remote_username = config.get("remote_username")
-        remote_password = config.get("remote_password")
-        remote_manager = RemoteAliasManager(remote_os, remote_host, remote_username, remote_password)
-        remote_manager.delete_alias(alias_name)
-        logging.info("Remote alias deleted: %s", alias_name)
-        messagebox.showinfo("Success", "Alias deleted locally and remotely successfully!")
-    except Exception as e:
-        logging.exception("Error deleting remote alias")
-        messagebox.showerror("Error", f"Error deleting remote alias: {e}")
+    def work(task):
+        task.report("Deleting local alias...")
+        try:
+            with local_lock:
+                make_local_manager().delete_alias(alias_name)
+            search_index.remove(alias_name, "local")
+            logging.info("Local alias deleted: %s", alias_name)
+        except Exception as e:
+            logging.exception("Error deleting local alias")
+            raise OperationError("Error", f"Error deleting local alias: {e}")
+        try:
+            remote_manager = make_remote_manager(task)
+            task.report("Deleting remote alias...")
+            remote_manager.delete_alias(alias_name)
+            search_index.remove(alias_name, "remote")
+            logging.info("Remote alias deleted: %s", alias_name)
+        except OperationError:
+            raise
+        except Exception as e:
+            logging.exception("Error deleting remote alias")
+            raise OperationError("Error", f"Error deleting remote alias: {e}")
+        return "Alias deleted locally and remotely successfully!"
+
+    tasks.submit(f"Delete {alias_name}", work, on_success=show_success, on_error=show_error)
+
+def index_aliases():
+    """Fill the autocomplete index in the background; a missing remote only leaves its aliases out."""
+    def work(task):
+        task.report("Indexing local aliases...")
+        with local_lock:
+            local_aliases = make_local_manager().list_aliases()
+        search_index.load(local_aliases, "local")
+        try:
+            remote_manager = make_remote_manager(task)
+            task.report("Indexing remote aliases...")
+            search_index.load(remote_manager.list_aliases(), "remote")
+        except Exception as e:
+            logging.warning("Remote aliases not indexed for autocomplete: %s", e)
+        return len(search_index)
+
+    tasks.submit("Index aliases", work,
+                 on_success=lambda count: logging.info("Indexed %d aliases for autocomplete.", count),
+                 on_error=lambda exc: logging.warning("Alias index incomplete: %s", exc))
+
+class Autocomplete:
+    """Suggestion list shown under an entry while typing.
+
+    lookup(text) returns (label, value) pairs; choosing one (Down then Return, or a
+    double click) calls on_pick(value).
+    """
+
+    def __init__(self, entry, lookup, on_pick, rows=6):
+        self.entry = entry
+        self.lookup = lookup
+        self.on_pick = on_pick
+        self.rows = rows
+        self.values = []
+        self._pending = None
+        self.listbox = tk.Listbox(entry.master, height=rows)
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", self._focus_list, add="+")
+        entry.bind("<Escape>", lambda event: self.hide(), add="+")
+        entry.bind("<FocusOut>", lambda event: entry.after(200, self._hide_unless_focused), add="+")
+        self.listbox.bind("<Return>", self._pick)
+        self.listbox.bind("<Double-Button-1>", self._pick)
+        self.listbox.bind("<Escape>", lambda event: (self.hide(), self.entry.focus_set()))
+        self.listbox.bind("<FocusOut>", lambda event: entry.after(200, self._hide_unless_focused))
+
+    def refresh(self):
+        self._pending = None
+        text = self.entry.get().strip()
+        self.values = self.lookup(text) if text else []
+        if not self.values:
+            self.hide()
+            return
+        self.listbox.delete(0, tk.END)
+        for label, _ in self.values:
+            self.listbox.insert(tk.END, label)
+        self.listbox.config(height=min(len(self.values), self.rows))
+        self.listbox.place(in_=self.entry, x=0, rely=1.0, relwidth=1.0)
+        self.listbox.lift()
+
+    def hide(self):
+        self.listbox.place_forget()
+
+    def _on_key(self, event):
+        if event.keysym in ("Down", "Up", "Return", "Escape", "Tab"):
+            return
+        # Wait for a pause in typing before searching.
+        if self._pending is not None:
+            self.entry.after_cancel(self._pending)
+        self._pending = self.entry.after(120, self.refresh)
+
+    def _focus_list(self, event):
+        if self.values:
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+
+    def _pick(self, event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            self.on_pick(self.values[selection[0]][1])
+        self.hide()
+        self.entry.focus_set()
+
+    def _hide_unless_focused(self):
+        if root.focus_get() not in (self.entry, self.listbox):
+            self.hide()
+
+def suggest_aliases(text):
+    return [(f"{r['name']}  -  {next(iter(r['sources'].values()))}", r)
+            for r in search_index.search(text, limit=8, fields=("name",))]
+
+def suggest_commands(text):
+    suggestions = []
+    for r in search_index.search(text, limit=8, fields=("command",)):
+        for command in sorted(set(r["sources"].values())):
+            suggestions.append((f"{command}  ({r['name']})", command))
+    return suggestions[:8]
+
+def pick_alias(result):
+    # Choosing an existing alias fills in its command too, ready to change.
+    alias_entry.delete(0, tk.END)
+    alias_entry.insert(0, result["name"])
+    command_entry.delete(0, tk.END)
+    command_entry.insert(0, result["sources"].get("local") or next(iter(result["sources"].values())))
+
+def pick_command(command):
+    command_entry.delete(0, tk.END)
+    command_entry.insert(0, command)
+
+def refresh_task_list():
+    """Redraw the operations panel from the task states."""
+    shown = set(task_tree.get_children())
+    for task in tasks.tasks.values():
+        iid = str(task.id)
+        values = (task.label, task.progress if task.state == "running" else task.state,
+                  f"{task.elapsed():.1f}s")
+        if iid in shown:
+            task_tree.item(iid, values=values)
+            shown.discard(iid)
+        else:
+            task_tree.insert("", tk.END, iid=iid, values=values)
+    if shown:
+        task_tree.delete(*shown)
+    running = len(tasks.active())
+    status_var.set(f"{running} operation(s) in progress" if running else "Ready")
+
+def cancel_selected():
+    for iid in task_tree.selection():
+        tasks.cancel(int(iid))
 
 # Set up the main GUI window.
 root = tk.Tk()
@@ -216,4 +367,25 @@ update_button.grid(row=3, column=1, pady=5)
 delete_button = tk.Button(frame, text="Delete Alias", command=delete_alias)
 delete_button.grid(row=4, column=0, columnspan=2, pady=5)
 
+# Operations panel: every manager call runs in the background and is listed here.
+task_tree = ttk.Treeview(frame, columns=("operation", "status", "elapsed"), show="headings", height=5)
+task_tree.heading("operation", text="Operation")
+task_tree.heading("status", text="Status")
+task_tree.heading("elapsed", text="Time")
+task_tree.column("elapsed", width=60, anchor="e")
+task_tree.grid(row=5, column=0, columnspan=2, pady=(10, 5), sticky="we")
+cancel_button = tk.Button(frame, text="Cancel Selected", command=cancel_selected)
+cancel_button.grid(row=6, column=0, pady=5)
+clear_button = tk.Button(frame, text="Clear Finished", command=lambda: tasks.clear_finished())
+clear_button.grid(row=6, column=1, pady=5)
+status_var = tk.StringVar(value="Ready")
+status_label = tk.Label(frame, textvariable=status_var, anchor="w")
+status_label.grid(row=7, column=0, columnspan=2, sticky="we")
+
+tasks = BackgroundTasks(root, on_change=refresh_task_list)
+
+Autocomplete(alias_entry, suggest_aliases, pick_alias)
+Autocomplete(command_entry, suggest_commands, pick_command)
+index_aliases()
+
 root.mainloop()
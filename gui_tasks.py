@@ -0,0 +1,132 @@
+import time
+import queue
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL_MS = 30
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+class TaskCancelled(Exception):
+    pass
+
+class Task:
+    def __init__(self, task_id, label):
+        self.id = task_id
+        self.label = label
+        self.state = "queued"  # queued, running, done, failed or cancelled
+        self.progress = ""
+        self.started = time.monotonic()
+        self.finished = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Raise TaskCancelled if the user cancelled this task; call between steps."""
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report(self, progress):
+        """Set the progress text shown for this task; safe to call from the worker."""
+        self.check_cancelled()
+        self.progress = progress
+
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+class BackgroundTasks:
+    """Runs manager operations on worker threads and delivers results on the Tk thread.
+
+    Workers never touch Tk: results are put on a queue that the Tk event loop drains
+    every POLL_INTERVAL_MS via root.after, where the callbacks run. Several tasks can
+    be in flight at once. Cancelling a task stops it at its next check_cancelled()
+    call (or before it starts) and suppresses its callbacks.
+    """
+
+    def __init__(self, root, max_workers=4, on_change=None):
+        self.root = root
+        self.on_change = on_change
+        self.tasks = {}
+        self._ids = itertools.count(1)
+        self._results = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-task")
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, label, fn, on_success=None, on_error=None):
+        """Run fn(task) in the background; on_success(result) / on_error(exc) run on the Tk thread."""
+        task = Task(next(self._ids), label)
+        self.tasks[task.id] = task
+        task.future = self._executor.submit(self._run, task, fn, on_success, on_error)
+        self._changed()
+        return task
+
+    def cancel(self, task_id):
+        task = self.tasks.get(task_id)
+        if task is None or task.state in FINISHED_STATES:
+            return False
+        task._cancel_event.set()
+        task.state = "cancelled"
+        task.finished = time.monotonic()
+        task.future.cancel()
+        logging.info("Cancelled task %d (%s).", task.id, task.label)
+        self._changed()
+        return True
+
+    def active(self):
+        return [t for t in self.tasks.values() if t.state not in FINISHED_STATES]
+
+    def clear_finished(self):
+        for task_id in [t.id for t in self.tasks.values() if t.state in FINISHED_STATES]:
+            del self.tasks[task_id]
+        self._changed()
+
+    def shutdown(self):
+        for task in list(self.tasks.values()):
+            task._cancel_event.set()
+        self._executor.shutdown(wait=False)
+
+    def _run(self, task, fn, on_success, on_error):
+        task.state = "running"
+        if task.cancelled:
+            task.state = "cancelled"
+            return
+        self._results.put((task, None, None, None))
+        try:
+            result = fn(task)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            logging.exception("Task %d (%s) failed", task.id, task.label)
+            self._results.put((task, "failed", on_error, e))
+            return
+        self._results.put((task, "done", on_success, result))
+
+    def _poll(self):
+        changed = False
+        try:
+            while True:
+                task, state, callback, value = self._results.get_nowait()
+                changed = True
+                if state is None or task.cancelled:
+                    continue
+                task.state = state
+                task.finished = time.monotonic()
+                if callback:
+                    try:
+                        callback(value)
+                    except Exception:
+                        logging.exception("Callback for task %d (%s) failed", task.id, task.label)
+        except queue.Empty:
+            pass
+        if changed or self.active():
+            self._changed()
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
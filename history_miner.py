@@ -0,0 +1,325 @@
+import os
+import re
+import heapq
+import shutil
+import logging
+from collections import Counter
+
+DEFAULT_CAPACITY = 2000   # counters per sketch
+MAX_PREFIX_WORDS = 4
+MIN_COUNT = 5
+MIN_LENGTH = 8            # shorter commands are not worth an alias
+MAX_COMMAND_LENGTH = 300  # longer lines are pasted scripts, not habits
+READ_SIZE = 1 << 20
+BATCH_LINES = 20000
+
+HISTORY_FILES = (
+    "~/.bash_history",
+    "~/.zsh_history",
+    "~/.local/share/fish/fish_history",
+    os.path.join(os.environ.get("APPDATA", "~"), "Microsoft", "Windows", "PowerShell", "PSReadLine",
+                 "ConsoleHost_history.txt"),
+)
+
+_ZSH_META = 0x83
+_ZSH_EXTENDED = re.compile(r": \d+:\d+;")
+_WORD_START = re.compile(r"[A-Za-z0-9]")
+_NAME = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]*$")
+# Builtins and keywords that shutil.which() cannot see but an alias would shadow.
+SHELL_WORDS = {
+    "cd", "bg", "fg", "if", "fi", "do", "in", "for", "case", "esac", "done", "then", "else", "elif",
+    "while", "until", "time", "type", "alias", "echo", "eval", "exec", "exit", "export", "history",
+    "jobs", "kill", "read", "set", "source", "test", "trap", "ulimit", "umask", "unset", "wait",
+}
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch (Metwally et al.) with a fixed number of counters.
+
+    Every item seen more than N / capacity times out of N is guaranteed to be kept, and
+    each kept count overestimates the true one by at most its recorded error. When the
+    sketch is full, a new item takes over the smallest counter. The smallest counter is
+    found through a min-heap whose entries may be stale and are refreshed lazily; the
+    heap is rebuilt if it grows too large, so memory stays bounded however long the
+    stream is.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self._heap = []
+
+    def add(self, item, count=1):
+        self.total += count
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+            return
+        heap = self._heap
+        if len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+            heapq.heappush(heap, (count, item))
+            return
+        if len(heap) > 4 * self.capacity:
+            heap[:] = [(c, i) for i, c in counts.items()]
+            heapq.heapify(heap)
+        # Heap entries go stale as counts grow; refresh them until the top is current,
+        # then hand the smallest counter to the new item.
+        while True:
+            floor, victim = heap[0]
+            current = counts.get(victim)
+            if current == floor:
+                break
+            if current is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (current, victim))
+        del counts[victim]
+        del self.errors[victim]
+        counts[item] = floor + count
+        self.errors[item] = floor
+        heapq.heapreplace(heap, (floor + count, item))
+
+    def top(self, n=None):
+        """(item, count, error) for the heaviest items, heaviest first."""
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [(item, count, self.errors[item]) for item, count in ranked[:n]]
+
+def default_history_files():
+    files = [os.path.expanduser(path) for path in HISTORY_FILES]
+    histfile = os.environ.get("HISTFILE")
+    if histfile:
+        files.insert(0, os.path.expanduser(histfile))
+    seen = []
+    for path in files:
+        if os.path.isfile(path) and path not in seen:
+            seen.append(path)
+    return seen
+
+def iter_history_commands(path):
+    """Yield the commands of a bash, zsh, fish or PowerShell history file, reading it in chunks.
+
+    Handles zsh extended history (": <time>:<duration>;command"), zsh's metafied bytes,
+    bash timestamp lines and backslash continued multi-line commands; memory use
+    does not depend on the size of the file.
+    """
+    zsh = "zsh" in os.path.basename(path)  # also switched on by the first extended history line
+    fish = "fish" in os.path.basename(path)
+    pending = None
+    for raw in _iter_lines(path):
+        if zsh and _ZSH_META in raw:
+            raw = _unmetafy(raw)
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if pending is not None:
+            # Keep only enough of a continued command to recognize it as too long.
+            if len(pending) <= MAX_COMMAND_LENGTH:
+                pending += "\n" + line
+            if line.endswith("\\"):
+                continue
+            line, pending = pending, None
+        elif line.startswith(": ") and _ZSH_EXTENDED.match(line):
+            zsh = True
+            line = line.split(";", 1)[1]
+        elif fish:
+            if not line.startswith("- cmd: "):
+                continue
+            line = line[len("- cmd: "):]
+        elif line.startswith("#") and line[1:].isdigit():
+            continue  # bash HISTTIMEFORMAT timestamp
+        if line.endswith("\\"):
+            pending = line
+            continue
+        yield line
+
+def _iter_lines(path):
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            if len(tail) > READ_SIZE:
+                tail = tail[:MAX_COMMAND_LENGTH * 4]  # A runaway line; nobody types that
+            yield from lines
+        if tail:
+            yield tail
+
+def _unmetafy(raw):
+    out = bytearray()
+    meta = False
+    for byte in raw:
+        if meta:
+            out.append(byte ^ 0x20)
+            meta = False
+        elif byte == _ZSH_META:
+            meta = True
+        else:
+            out.append(byte)
+    return bytes(out)
+
+def normalize(command):
+    """Collapse whitespace; return None for lines that cannot become an alias."""
+    if len(command) > MAX_COMMAND_LENGTH or "\n" in command:
+        return None
+    return " ".join(command.split()) or None
+
+class HistoryMiner:
+    """Counts whole commands and their leading words with two Space-Saving sketches.
+
+    Lines are tallied exactly in a batch of BATCH_LINES first, and each batch is added
+    to the sketches as weighted counts, so a command repeated within a batch costs one
+    sketch update instead of one per use.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_prefix_words=MAX_PREFIX_WORDS):
+        self.commands = SpaceSaving(capacity)
+        self.prefixes = SpaceSaving(capacity)
+        self.max_prefix_words = max_prefix_words
+        self.lines = 0
+        self._batch_commands = Counter()
+        self._batch_prefixes = Counter()
+
+    def feed(self, command):
+        self.lines += 1
+        if self.lines % BATCH_LINES == 0:
+            self.flush()
+        command = normalize(command)
+        if command is None:
+            return
+        # Aliases are written as alias name='command'; a single quote would end the definition.
+        if "'" not in command:
+            self._batch_commands[command] += 1
+        words = command.split(" ")
+        # "git commit -m x" and "git commit -m y" share the prefixes "git commit" and
+        # "git commit -m"; the bare first word is not worth an alias of its own.
+        for n in range(2, min(len(words) - 1, self.max_prefix_words) + 1):
+            prefix = " ".join(words[:n])
+            if "'" in prefix:
+                break
+            self._batch_prefixes[prefix] += 1
+
+    def flush(self):
+        for batch, sketch in ((self._batch_commands, self.commands), (self._batch_prefixes, self.prefixes)):
+            # Heaviest first, so this batch's own rare items are the ones evicted.
+            for item, count in batch.most_common():
+                sketch.add(item, count)
+            batch.clear()
+
+    def feed_file(self, path):
+        for command in iter_history_commands(path):
+            self.feed(command)
+
+    def suggest(self, existing, limit=20, min_count=MIN_COUNT, min_length=MIN_LENGTH):
+        """Rank alias candidates by the keystrokes they would save.
+
+        `existing` maps alias names to commands; their names are never proposed, and
+        commands they already cover, or that already start with an alias, are skipped.
+        Returns dicts with name, command, count, error and saved keystrokes.
+        """
+        self.flush()
+        commands = self.commands.top()
+        # A prefix that is nearly always used in one longer form adds nothing of its own.
+        longest_use = {}
+        for command, count, _ in commands:
+            words = command.split(" ")
+            for n in range(2, min(len(words) - 1, self.max_prefix_words) + 1):
+                prefix = " ".join(words[:n])
+                longest_use[prefix] = max(longest_use.get(prefix, 0), count)
+        existing_commands = set(existing.values())
+        scored = {}
+        for entries, kind in ((commands, "command"), (self.prefixes.top(), "prefix")):
+            for command, count, error in entries:
+                # count - error is what the sketch guarantees was really seen.
+                if count - error < min_count or len(command) < min_length or command in existing_commands:
+                    continue
+                if command.split(" ", 1)[0] in existing:
+                    continue
+                if kind == "prefix" and longest_use.get(command, 0) >= count - error:
+                    continue
+                saved = count * (len(command) - 3)
+                if command not in scored or scored[command]["saved"] < saved:
+                    scored[command] = {"command": command, "count": count, "error": error,
+                                       "kind": kind, "saved": saved}
+        ranked = sorted(scored.values(), key=lambda c: (-c["saved"], c["command"]))
+        taken = set(existing)
+        suggestions = []
+        for candidate in ranked:
+            name = alias_name_for(candidate["command"], taken)
+            if name is None:
+                continue
+            taken.add(name)
+            candidate["name"] = name
+            candidate["saved"] = candidate["count"] * (len(candidate["command"]) - len(name))
+            suggestions.append(candidate)
+            if len(suggestions) >= limit:
+                break
+        suggestions.sort(key=lambda c: (-c["saved"], c["command"]))
+        return suggestions
+
+def alias_name_for(command, taken):
+    """Initials of the command's words ("kubectl get pods" -> "kgp"), lengthened until the
+    name is free: not an existing alias, not already suggested and not a program on PATH."""
+    words = []
+    for word in command.split(" "):
+        start = _WORD_START.search(word)  # "--build" -> "b", "~/projects" -> "p"
+        if start:
+            words.append(word[start.start():])
+    if not words:
+        return None
+    base = "".join(w[0] for w in words).lower()
+    candidates = [base]
+    last = words[-1]
+    for extra in range(2, min(len(last), 4) + 1):
+        candidates.append(base[:-1] + last[:extra].lower())
+    candidates.extend(f"{base}{i}" for i in range(2, 10))
+    for name in candidates:
+        if len(name) < 2 or not _NAME.match(name):
+            continue
+        if name in taken or name in SHELL_WORDS or shutil.which(name):
+            continue
+        return name
+    return None
+
+def format_suggestions(suggestions):
+    if not suggestions:
+        return "No alias suggestions: no frequent command is long enough to be worth one."
+    lines = [f"{'#':>3}  {'alias':<10} {'uses':>7} {'saves':>8}  command"]
+    for i, s in enumerate(suggestions, 1):
+        uses = f"{s['count']}" if not s["error"] else f"~{s['count']}"
+        lines.append(f"{i:>3}  {s['name']:<10} {uses:>7} {s['saved']:>8}  {s['command']}")
+    return "\n".join(lines)
+
+def parse_selection(text, count):
+    """Parse "1,3-5" or "all" into zero-based indexes below `count`."""
+    text = text.strip().lower()
+    if not text:
+        return []
+    if text == "all":
+        return list(range(count))
+    chosen = []
+    for part in text.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-", 1)
+            numbers = range(int(start), int(end) + 1)
+        else:
+            numbers = [int(part)]
+        for n in numbers:
+            if not 1 <= n <= count:
+                raise ValueError(f"No suggestion number {n}")
+            if n - 1 not in chosen:
+                chosen.append(n - 1)
+    return chosen
+
+def mine(paths, capacity=DEFAULT_CAPACITY):
+    miner = HistoryMiner(capacity)
+    for path in paths:
+        try:
+            miner.feed_file(path)
+        except OSError as e:
+            logging.warning("Could not read history file %s: %s", path, e)
+    return miner
@@ -0,0 +1,85 @@
+import json
+import os
+import logging
+
+INVENTORY_PATH = os.path.expanduser("~/.alias_manager_inventory.json")
+
+def load_inventory(path=None):
+    """Load the host inventory, or return None if there is no inventory file.
+
+    Expected format:
+        {
+            "defaults": {"username": "admin", "password": "secret", "os": "windows"},
+            "hosts": {
+                "ws01": {"host": "10.0.0.11"},
+                "mac01": {"host": "10.0.0.50", "os": "osx", "username": "me"}
+            },
+            "groups": {
+                "lab": ["ws01", "ws02"],
+                "everything": ["lab", "mac01"]
+            }
+        }
+    A host entry may also be a plain string, which is used as the address.
+    """
+    path = path or INVENTORY_PATH
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            inventory = json.load(f)
+    except Exception as e:
+        logging.exception("Could not read inventory %s", path)
+        raise IOError(f"Could not read inventory {path}: {e}")
+    inventory.setdefault("defaults", {})
+    inventory.setdefault("hosts", {})
+    inventory.setdefault("groups", {})
+    return inventory
+
+def resolve_targets(inventory, names, default_os=None):
+    """Expand host and group names into a de-duplicated list of target dicts.
+
+    Each target has the keys name, host, username, password and os.
+    """
+    defaults = inventory.get("defaults", {})
+    hosts = inventory.get("hosts", {})
+    groups = inventory.get("groups", {})
+    targets = []
+    seen = set()
+
+    def expand(name, stack):
+        if name in groups:
+            if name in stack:
+                raise ValueError(f"Inventory group '{name}' includes itself")
+            for member in groups[name]:
+                expand(member, stack + [name])
+            return
+        if name in seen:
+            return
+        seen.add(name)
+        entry = hosts.get(name, name)
+        if isinstance(entry, str):
+            entry = {"host": entry}
+        target = {
+            "name": name,
+            "host": entry.get("host", name),
+            "username": entry.get("username", defaults.get("username")),
+            "password": entry.get("password", defaults.get("password")),
+            "os": entry.get("os", defaults.get("os", default_os)),
+        }
+        if not target["os"]:
+            raise ValueError(f"No remote OS configured for host '{name}'")
+        targets.append(target)
+
+    for name in names:
+        expand(name, [])
+    return targets
+
+def targets_from_config(config, remote_os):
+    """Build a single-target list from the classic remote_* keys in the config file."""
+    return [{
+        "name": config.get("remote_host"),
+        "host": config.get("remote_host"),
+        "username": config.get("remote_username"),
+        "password": config.get("remote_password"),
+        "os": remote_os,
+    }]
@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import uuid
+import time
+import random
+import logging
+import threading
+import subprocess
+from config import LOG_PATH
+
+JOURNAL_PATH = os.path.expanduser("~/.alias_manager_journal.jsonl")
+RETRY_BASE = 2
+MAX_BACKOFF = 300
+FLUSHER_MAX_RUNTIME = 3600
+LOCK_STALE_AFTER = 30
+
+def target_key(target):
+    return f"{target['username']}@{target['host']}"
+
+def coalesce_journal_ops(records):
+    """Reduce a host's queued journal records to the net (action, name, command) operations.
+
+    Only the last change to each alias is kept. An alias whose first queued record is a
+    create recorded as new ("new" is true) and whose last is a delete collapses to
+    nothing at all. When it is not known whether the create overwrote an alias that
+    already existed on the host, the delete is kept so a stale alias cannot survive.
+    """
+    first = {}
+    last = {}
+    created = set()
+    for record in records:
+        name = record["name"]
+        first.setdefault(name, record)
+        last[name] = record
+        if record["action"] == "create":
+            created.add(name)
+    ops = []
+    for name, record in last.items():
+        if record["action"] == "delete":
+            if first[name]["action"] == "create" and first[name].get("new", False):
+                continue
+            ops.append(("delete", name, None))
+        else:
+            ops.append(("create" if name in created else "update", name, record["command"]))
+    return ops
+
+class _FileLock:
+    """Cross-process lock held by exclusively creating a lock file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE_AFTER:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.01)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class OperationJournal:
+    """Durable append-only log of alias changes that still have to reach remote hosts.
+
+    Every line is a JSON record: either an operation for one target host, or an
+    acknowledgement listing the ids of operations that were pushed.
+    Records are appended with one write and fsynced, so a queued change survives a crash
+    or a closed terminal. compact() drops everything that has been acknowledged.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = _FileLock(path + ".lock")
+
+    def record(self, target, ops, new_names=None):
+        """Queue (action, name, command) operations for a target.
+
+        When the caller knows which created names did not exist before, it passes them
+        as new_names and the other creates are marked as overwrites; otherwise nothing
+        is recorded and a later delete of the same name is still pushed.
+        """
+        target = {key: target.get(key) for key in ("name", "host", "username", "os")}
+        now = time.time()
+        records = []
+        for action, name, command in ops:
+            record = {"id": uuid.uuid4().hex[:16], "target": target, "time": now,
+                      "action": action, "name": name, "command": command}
+            if new_names is not None:
+                record["new"] = name in new_names
+            records.append(record)
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                os.write(fd, lines.encode("utf-8"))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        logging.info("Journaled %d operation(s) for %s.", len(ops), target_key(target))
+
+    def pending(self):
+        """Return {target key: {"target", "records"}} for the unacknowledged operations, in order."""
+        records = []
+        acked = set()
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # A record still being written
+                    record = json.loads(raw)
+                    if "ack" in record:
+                        acked.update(record["ids"])
+                    else:
+                        records.append(record)
+        pending = {}
+        for record in records:
+            if record["id"] in acked:
+                continue
+            key = target_key(record["target"])
+            pending.setdefault(key, {"target": record["target"], "records": []})["records"].append(record)
+        return pending
+
+    def acknowledge(self, key, records):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"ack": key, "ids": [r["id"] for r in records]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact(self):
+        """Rewrite the journal keeping only the operations not yet acknowledged."""
+        with self._lock:
+            pending = self.pending()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for item in pending.values():
+                    for record in item["records"]:
+                        f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+class JournalFlusher:
+    """Pushes journaled operations to their hosts, one coalesced batch per host.
+
+    A host that fails is retried with exponential backoff (with jitter) capped at
+    max_backoff seconds; the others are unaffected. Use flush_once() from a loop of
+    your own or start() to run it on a background thread.
+    """
+
+    def __init__(self, journal=None, credentials=None, pool=None, interval=5, max_backoff=MAX_BACKOFF):
+        self.journal = journal or OperationJournal()
+        self.credentials = credentials or lookup_password
+        self.pool = pool
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._failures = {}
+        self._next_attempt = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush_once(self):
+        """Try every host that is due; returns {target key: error text or None}."""
+        from alias_manager_remote import RemoteAliasManager
+        results = {}
+        now = time.monotonic()
+        pending = self.journal.pending()
+        for key, item in pending.items():
+            if self._next_attempt.get(key, 0) > now:
+                continue
+            target = item["target"]
+            ops = coalesce_journal_ops(item["records"])
+            try:
+                if ops:
+                    manager = RemoteAliasManager(target["os"], target["host"], target["username"],
+                                                 self.credentials(target), pool=self.pool)
+                    try:
+                        manager.apply_batch(ops)
+                    finally:
+                        manager.close()
+                self.journal.acknowledge(key, item["records"])
+            except Exception as e:
+                failures = self._failures.get(key, 0) + 1
+                self._failures[key] = failures
+                delay = min(self.max_backoff, RETRY_BASE ** failures) * random.uniform(0.5, 1.0)
+                self._next_attempt[key] = time.monotonic() + delay
+                logging.warning("Pushing %d journaled operation(s) to %s failed (attempt %d, retry in %.0fs): %s",
+                                len(ops), key, failures, delay, e)
+                results[key] = str(e)
+                continue
+            self._failures.pop(key, None)
+            self._next_attempt.pop(key, None)
+            logging.info("Pushed %d net operation(s) from %d journaled to %s.", len(ops), len(item["records"]), key)
+            results[key] = None
+        if pending and all(error is None for error in results.values()) and len(results) == len(pending):
+            self.journal.compact()
+        return results
+
+    def seconds_until_due(self):
+        """Seconds until the next host with queued operations may be retried, or None if none are queued."""
+        pending = self.journal.pending()
+        if not pending:
+            return None
+        now = time.monotonic()
+        return max(0, min(self._next_attempt.get(key, 0) - now for key in pending))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.flush_once()
+            except Exception:
+                logging.exception("Journal flush failed")
+            due = self.seconds_until_due()
+            self._stop.wait(self.interval if due is None else max(self.interval, due))
+
+def lookup_password(target):
+    """Find the password for a journaled target in the config file or the inventory."""
+    from config import CONFIG_PATH
+    from inventory import load_inventory
+    try:
+        with open(CONFIG_PATH, "r") as f:
+            config = json.load(f)
+        if config.get("remote_host") == target["host"]:
+            return config.get("remote_password")
+    except (IOError, ValueError):
+        pass
+    try:
+        inventory = load_inventory()
+    except IOError:
+        inventory = None
+    if inventory:
+        for entry in inventory["hosts"].values():
+            if isinstance(entry, dict) and entry.get("host") == target["host"] and "password" in entry:
+                return entry["password"]
+        return inventory["defaults"].get("password")
+    return None
+
+def spawn_flusher(journal_path=JOURNAL_PATH):
+    """Start a detached process that drains the journal, unless one is already running."""
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), journal_path],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     cwd=os.path.dirname(os.path.abspath(__file__)), **kwargs)
+
+def drain(journal_path=JOURNAL_PATH, max_runtime=FLUSHER_MAX_RUNTIME):
+    """Flush until the journal is empty or max_runtime passes; only one drain runs at a time."""
+    pid_path = journal_path + ".flusher"
+    try:
+        if time.time() - os.path.getmtime(pid_path) > max_runtime + 60:
+            os.remove(pid_path)  # Left behind by a flusher that was killed
+    except OSError:
+        pass
+    journal = OperationJournal(journal_path)
+    deadline = time.monotonic() + max_runtime
+    while True:
+        try:
+            fd = os.open(pid_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            logging.info("A journal flusher is already running.")
+            return
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            flusher = JournalFlusher(journal)
+            while time.monotonic() < deadline:
+                flusher.flush_once()
+                due = flusher.seconds_until_due()
+                if due is None:
+                    break
+                time.sleep(max(0.1, due))
+        finally:
+            os.remove(pid_path)
+        # A change queued after the last flush but before the pid file was removed saw this
+        # flusher still running and started none, so look again now that it is gone.
+        if time.monotonic() >= deadline or not journal.pending():
+            return
+
+if __name__ == "__main__":
+    logging.basicConfig(filename=LOG_PATH,
+                        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    drain(*sys.argv[1:2])
@@ -2,29 +2,91 @@ import platform
 import argparse
 import logging
 import os
-from config import load_config
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import timing
+from config import LOG_PATH, load_config
 
 # Set up logging
 logging.basicConfig(
-    filename='alias_manager.log',
+    filename=LOG_PATH,
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(
         description="CLI Alias Manager for local and remote machines (dual creation)"
     )
     parser.add_argument("--alias", help="Alias name to create")
     parser.add_argument("--command", help="Command that the alias should execute")
-    return parser.parse_args()
+    parser.add_argument("--manifest", help="JSON manifest of aliases to create/update/delete in bulk")
+    parser.add_argument("--history", action="store_true",
+                        help="List stored snapshots of the local shell profile")
+    parser.add_argument("--restore", metavar="SNAPSHOT",
+                        help="Restore the local shell profile to a snapshot (history index or hash prefix)")
+    parser.add_argument("--rollback-on-remote-failure", action="store_true",
+                        help="Undo the local alias change if the remote change fails")
+    parser.add_argument("--sync", action="store_true",
+                        help="Make the remote alias set match the local one, sending only the differences")
+    parser.add_argument("--no-prune", action="store_true",
+                        help="With --sync, keep remote aliases that do not exist locally")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="With --sync or --suggest, report the changes without making them")
+    parser.add_argument("--audit", action="store_true",
+                        help="Report hosts whose aliases differ from the local set (or --manifest)")
+    parser.add_argument("--report", metavar="PATH",
+                        help="With --audit, write the JSON drift report to PATH instead of stdout")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="Queue remote changes in the local journal and push them in the background")
+    parser.add_argument("--flush", action="store_true",
+                        help="Push the remote changes queued in the journal now")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and push alias edits made to the local profile to the remote host(s)")
+    parser.add_argument("--poll", action="store_true",
+                        help="With --watch, poll for changes instead of using OS file notifications")
+    parser.add_argument("--measure-startup", nargs="?", type=int, const=10, metavar="RUNS",
+                        help="Time shell startup (default 10 runs) and compare with the previous measurement")
+    parser.add_argument("--search", metavar="QUERY",
+                        help="Find aliases by name prefix or by text in the name or command (typos allowed)")
+    parser.add_argument("--limit", type=int, default=20,
+                        help="Maximum number of --search results or --suggest candidates (default: 20)")
+    parser.add_argument("--local-only", action="store_true",
+                        help="With --search or --suggest, leave out the remote host's aliases")
+    parser.add_argument("--suggest", action="store_true",
+                        help="Propose aliases for the longest frequent commands in the shell history")
+    parser.add_argument("--history-file", action="append", metavar="PATH",
+                        help="With --suggest, history file to read instead of the detected ones (repeatable)")
+    parser.add_argument("--min-count", type=int, default=5,
+                        help="With --suggest, ignore commands used fewer times than this (default: 5)")
+    parser.add_argument("--accept", metavar="CHOICE",
+                        help="With --suggest, create these suggestions without asking (e.g. 1,3-5 or all)")
+    parser.add_argument("--action", choices=["create", "update", "delete"], default="create",
+                        help="Operation to fan out with --targets (default: create)")
+    parser.add_argument("--targets", action="append",
+                        help="Inventory hosts or groups to push to (comma separated, repeatable)")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Maximum number of hosts worked on at once with --targets")
+    parser.add_argument("--timeout", type=int, default=30,
+                        help="Per-host connect and command timeout in seconds with --targets")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print how long each phase (connect, auth, remote commands, profile I/O) took")
+    parser.add_argument("--profile-output", metavar="PATH",
+                        help="Write the timing data to PATH (implies timing is collected)")
+    parser.add_argument("--profile-format", choices=["jsonl", "prometheus"], default="jsonl",
+                        help="Format for --profile-output: one JSON object per span or Prometheus text")
+    return parser.parse_args(argv)
 
 def reload_shell():
     """Reload the current shell if on macOS; on Windows, instruct the user."""
     local_os = platform.system()
     if local_os == "Darwin":
         shell = os.environ.get("SHELL")
-        if shell:
+        if shell and not sys.stdin.isatty():
+            # Called from a script or through the agent: there is no terminal to hand over.
+            print(f"Run 'exec {shell}' to apply the changes to your current shell.")
+        elif shell:
             print(f"Reloading your shell ({shell}) to apply changes...")
             input("Press Enter to reload your shell now...")
             # Replace current process with a new shell process.
@@ -36,67 +98,651 @@ def reload_shell():
     else:
         print("Shell reload is not supported on this OS.")
 
-def main():
-    args = parse_args()
-    
-    # Ask only for alias and command if not provided as arguments.
-    if not args.alias:
-        args.alias = input("Enter the alias name: ").strip()
-    if not args.command:
-        args.command = input("Enter the command for the alias: ").strip()
-    
-    local_os = platform.system()
-    logging.info("Local OS detected: %s", local_os)
-    
-    # Create local alias using the appropriate module.
+def get_local_manager(local_os, store=None):
+    """The local alias manager, behind the SQLite alias store when "alias_store" is set in the config."""
+    from config import read_config
     if local_os == "Darwin":
         from alias_manager_osx import OSXAliasManager
-        local_manager = OSXAliasManager()
+        manager, platform_name = OSXAliasManager(), "osx"
     elif local_os == "Windows":
         from alias_manager_windows import WindowsAliasManager
-        local_manager = WindowsAliasManager()
+        manager, platform_name = WindowsAliasManager(), "windows"
     else:
-        logging.error("Unsupported local OS: %s", local_os)
-        print("Unsupported local OS for alias creation.")
-        return
+        return None
+    if store is None and not read_config().get("alias_store"):
+        return manager
+    from alias_store import AliasStore, StoreBackedManager
+    return StoreBackedManager(manager, store or AliasStore(), platform=platform_name)
 
-    try:
-        local_manager.create_alias(args.alias, args.command)
-        print("Local alias created successfully.")
-    except Exception as e:
-        logging.exception("Local alias creation failed:")
-        print("Local alias creation failed:", e)
-        return
+def ops_for_target(local_manager, ops, target_os, target_host):
+    """The ops as one remote host should get them: with the alias store, its own overrides win."""
+    if not hasattr(local_manager, "remote_ops"):
+        return ops
+    from alias_manager_remote import split_host_port
+    return local_manager.remote_ops(ops, target_os, split_host_port(target_host)[0])
 
-    # Determine remote target OS (assumes remote is the "other" OS).
+def get_remote_os(local_os):
+    """Return the (remote_os, display name) pair for the "other" OS."""
     if local_os == "Darwin":
-        remote_os = "windows"
-        os_msg = "Windows"
+        return "windows", "Windows"
     elif local_os == "Windows":
-        remote_os = "osx"
-        os_msg = "OSX"
-    else:
-        print("Remote creation not supported for local OS:", local_os)
-        return
+        return "osx", "OSX"
+    return None, None
 
-    # Load remote configuration from the config file.
+def run_manifest(manifest_path, write_behind=False):
+    """Apply a whole alias manifest locally and remotely, one rewrite and one connection each."""
+    from manifest import load_manifest
+    try:
+        ops = load_manifest(manifest_path)
+    except Exception as e:
+        print("Could not load manifest:", e)
+        return False
+    return apply_ops(ops, write_behind)
+
+def apply_ops(ops, write_behind=False):
+    """Apply (action, name, command) ops locally in one rewrite, then remotely in one connection."""
+    local_os = platform.system()
+    local_manager = get_local_manager(local_os)
+    if local_manager is None:
+        logging.error("Unsupported local OS: %s", local_os)
+        print("Unsupported local OS for alias creation.")
+        return False
+    try:
+        summary = local_manager.apply_batch(ops)
+        print(f"Local aliases applied: {summary['created']} created, "
+              f"{summary['updated']} updated, {summary['deleted']} deleted.")
+        if summary["missing"]:
+            print("Not found locally (skipped):", ", ".join(summary["missing"]))
+    except Exception as e:
+        logging.exception("Local alias apply failed:")
+        print("Local alias apply failed:", e)
+        return False
+
+    remote_os, os_msg = get_remote_os(local_os)
     config = load_config()
     remote_host = config.get("remote_host")
     remote_username = config.get("remote_username")
     remote_password = config.get("remote_password")
-    
     if not (remote_host and remote_username and remote_password):
         print("Remote configuration not found in config file. Please set it up.")
+        return False
+
+    from alias_manager_remote import RemoteAliasManager
+    from inventory import targets_from_config
+    from ssh_pool import pool_from_config
+    ops = ops_for_target(local_manager, ops, remote_os, remote_host)
+    if write_behind or config.get("write_behind"):
+        if queue_remote(targets_from_config(config, remote_os), ops):
+            print(f"Remote changes queued for {remote_host}; they are pushed in the background.")
+        return True
+    try:
+        remote_manager = RemoteAliasManager(remote_os, remote_host, remote_username, remote_password,
+                                            pool=pool_from_config(config))
+        result = remote_manager.apply_batch(ops)
+        print(f"Remote aliases applied on {os_msg} machine: {result['applied']} entries.")
+    except Exception as e:
+        logging.exception("Remote alias apply failed:")
+        print("Remote alias apply failed:", e)
+        if queue_remote(targets_from_config(config, remote_os), ops):
+            print("The remote changes were queued and will be retried in the background.")
+        return False
+    return True
+
+def show_history():
+    if platform.system() != "Darwin":
+        print("Profile history is only available on macOS.")
         return
+    from alias_manager_osx import OSXAliasManager
+    manager = OSXAliasManager()
+    history = manager.history()
+    if not history:
+        print(f"No snapshots of {manager.profile_path} yet.")
+        return
+    print(f"Snapshots of {manager.profile_path} (oldest first):")
+    for index, entry in enumerate(history):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"]))
+        print(f"{index:>4}  {entry['hash'][:12]}  {when}  {entry['size']} bytes")
+
+def restore_profile(ref):
+    if platform.system() != "Darwin":
+        print("Profile restore is only available on macOS.")
+        return
+    from alias_manager_osx import OSXAliasManager
+    manager = OSXAliasManager()
+    try:
+        entry = manager.restore(ref)
+        print(f"Restored {manager.profile_path} to snapshot {entry['hash'][:12]}.")
+    except Exception as e:
+        logging.exception("Profile restore failed:")
+        print("Profile restore failed:", e)
+
+def inventory_targets(target_args, local_os):
+    """Resolve --targets values against the inventory; prints the problem and returns None on error."""
+    from inventory import load_inventory, resolve_targets
+    try:
+        inventory = load_inventory()
+    except Exception as e:
+        print("Could not load inventory:", e)
+        return None
+    if inventory is None:
+        print("No host inventory found. Create ~/.alias_manager_inventory.json to use --targets.")
+        return None
+    names = [name.strip() for value in target_args for name in value.split(",") if name.strip()]
+    try:
+        return resolve_targets(inventory, names, default_os=get_remote_os(local_os)[0])
+    except ValueError as e:
+        print("Invalid targets:", e)
+        return None
 
+def format_sync_summary(summary):
+    if summary["in_sync"]:
+        return f"{summary['host']}: already in sync."
+    return (f"{summary['host']}: {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['deleted']} deleted.")
+
+def run_sync(args):
+    """Reconcile the remote alias set(s) with the local one using alias digests."""
+    from functools import partial
+    from alias_sync import sync_aliases
+
+    local_os = platform.system()
+    local_manager = get_local_manager(local_os)
+    if local_manager is None:
+        print("Unsupported local OS for alias sync.")
+        return False
+    try:
+        local_aliases = local_manager.list_aliases()
+    except Exception as e:
+        logging.exception("Listing local aliases failed:")
+        print("Listing local aliases failed:", e)
+        return False
+    if hasattr(local_manager, "store"):
+        # Each host gets the aliases the store resolves for it, overrides included.
+        def operation(remote_manager):
+            from alias_manager_remote import split_host_port
+            aliases = local_manager.store.aliases(remote_manager.remote_os, split_host_port(remote_manager.host)[0])
+            return sync_aliases(aliases, remote_manager, prune=not args.no_prune, dry_run=args.dry_run)
+    else:
+        operation = partial(sync_aliases, local_aliases, prune=not args.no_prune, dry_run=args.dry_run)
+
+    if args.targets:
+        from fanout import run_fanout, format_summary
+        targets = inventory_targets(args.targets, local_os)
+        if targets is None:
+            return False
+        results = run_fanout(targets, operation,
+                             concurrency=args.concurrency, timeout=args.timeout)
+        for r in results:
+            if r["ok"]:
+                print(format_sync_summary(r["result"]))
+        print(format_summary(results))
+        return all(r["ok"] for r in results)
+
+    remote_os, os_msg = get_remote_os(local_os)
+    config = load_config()
+    if not (config.get("remote_host") and config.get("remote_username") and config.get("remote_password")):
+        print("Remote configuration not found in config file. Please set it up.")
+        return False
+    try:
+        summary = operation(connect_remote(remote_os, config))
+    except Exception as e:
+        logging.exception("Alias sync failed:")
+        print("Alias sync failed:", e)
+        return False
+    print(format_sync_summary(summary))
+    return True
+
+def run_search(args):
+    """Search the local and remote alias sets and print the ranked matches."""
+    from alias_search import AliasSearchIndex, format_results
+    from config import read_config
+
+    local_os = platform.system()
+    index = AliasSearchIndex()
+    local_manager = get_local_manager(local_os)
+    if local_manager is not None:
+        try:
+            index.load(local_manager.list_aliases(), "local")
+        except Exception as e:
+            logging.exception("Listing local aliases failed:")
+            print("Listing local aliases failed:", e)
+    remote_os, os_msg = get_remote_os(local_os)
+    config = read_config()
+    if not args.local_only and remote_os and config.get("remote_host") and config.get("remote_username"):
+        try:
+            index.load(connect_remote(remote_os, config).list_aliases(), "remote")
+        except Exception as e:
+            logging.exception("Listing remote aliases failed:")
+            print(f"Remote aliases on {config['remote_host']} left out: {e}")
+    print(format_results(index.search(args.search, limit=args.limit)))
+
+def run_suggest(args):
+    """Mine the shell history for frequent long commands and create the accepted suggestions.
+
+    Returns True when aliases were created.
+    """
+    from config import read_config
+    from history_miner import default_history_files, mine, format_suggestions, parse_selection
+
+    paths = args.history_file or default_history_files()
+    if not paths:
+        print("No shell history file found; pass one with --history-file.")
+        return False
+    local_os = platform.system()
+    local_manager = get_local_manager(local_os)
+    if local_manager is None:
+        logging.error("Unsupported local OS: %s", local_os)
+        print("Unsupported local OS for alias creation.")
+        return False
+    existing = dict(local_manager.list_aliases())
+    remote_os, _ = get_remote_os(local_os)
+    config = read_config()
+    if not args.local_only and remote_os and config.get("remote_host") and config.get("remote_username"):
+        try:
+            # Remote-only names are taken too: sync would otherwise overwrite one of them.
+            for name, command in connect_remote(remote_os, config).list_aliases().items():
+                existing.setdefault(name, command)
+        except Exception as e:
+            logging.exception("Listing remote aliases failed:")
+            print(f"Remote aliases on {config['remote_host']} not checked for name clashes: {e}")
+
+    with timing.span("history.mine", files=len(paths)):
+        miner = mine(paths)
+    suggestions = miner.suggest(existing, limit=args.limit, min_count=args.min_count)
+    print(f"Read {miner.lines} commands from {', '.join(paths)}.")
+    print(format_suggestions(suggestions))
+    if not suggestions:
+        return False
+
+    selection = args.accept
+    if selection is None:
+        try:
+            selection = input("Aliases to create (e.g. 1,3-5 or all; empty for none): ")
+        except EOFError:
+            selection = ""
+    try:
+        chosen = [suggestions[i] for i in parse_selection(selection, len(suggestions))]
+    except ValueError as e:
+        print("Invalid selection:", e)
+        return False
+    if not chosen:
+        print("No aliases created.")
+        return False
+    ops = [("create", s["name"], s["command"]) for s in chosen]
+    if args.dry_run:
+        for _, name, command in ops:
+            print(f"Would create alias {name}='{command}'")
+        return False
+    return apply_ops(ops, args.write_behind)
+
+def run_audit(args):
+    """Report which hosts' aliases drift from the canonical set (the manifest, or the local aliases)."""
+    import json
+    from fleet_audit import audit_fleet, format_report
+
+    local_os = platform.system()
+    try:
+        if args.manifest:
+            from manifest import load_manifest
+            canonical = {name: command for action, name, command in load_manifest(args.manifest)
+                         if action != "delete"}
+        else:
+            local_manager = get_local_manager(local_os)
+            if local_manager is None:
+                print("Unsupported local OS; pass --manifest to give the canonical alias set.")
+                return False
+            canonical = local_manager.list_aliases()
+    except Exception as e:
+        logging.exception("Loading the canonical alias set failed:")
+        print("Could not load the canonical alias set:", e)
+        return False
+
+    if args.targets:
+        targets = inventory_targets(args.targets, local_os)
+        if targets is None:
+            return False
+    else:
+        from inventory import targets_from_config
+        config = load_config()
+        if not config.get("remote_host"):
+            print("Remote configuration not found in config file. Please set it up.")
+            return False
+        targets = targets_from_config(config, get_remote_os(local_os)[0])
+
+    report = audit_fleet(targets, canonical, concurrency=args.concurrency, timeout=args.timeout)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(format_report(report))
+        print(f"Drift report written to {args.report}.")
+    else:
+        print(json.dumps(report, indent=2))
+    return report["summary"]["drifted"] == 0 and report["summary"]["failed"] == 0
+
+def run_watch(args):
+    """Push every local alias edit, including hand edits of the profile, until interrupted."""
+    from watcher import AliasFileSource, watch
+    from fanout import run_fanout, format_summary
+
+    local_os = platform.system()
+    if local_os == "Darwin":
+        from alias_manager_osx import OSXAliasManager
+        manager = OSXAliasManager()
+        if manager.alias_file:
+            source = AliasFileSource([manager.profile_path, manager.alias_file.path,
+                                      manager.alias_file.lazy_path], manager.list_aliases)
+        else:
+            source = AliasFileSource(manager.profile_path)
+    elif local_os == "Windows":
+        from alias_manager_windows import WindowsAliasManager
+        manager = WindowsAliasManager()
+        source = AliasFileSource([manager.index_path], manager.list_aliases)
+    else:
+        print("Unsupported local OS for watch mode.")
+        return False
+
+    if args.targets:
+        targets = inventory_targets(args.targets, local_os)
+        if targets is None:
+            return False
+    else:
+        from inventory import targets_from_config
+        config = load_config()
+        if not config.get("remote_host"):
+            print("Remote configuration not found in config file. Please set it up.")
+            return False
+        targets = targets_from_config(config, get_remote_os(local_os)[0])
+    from ssh_pool import get_pool
+    pool = get_pool()
+
+    def push(ops):
+        print(f"Pushing {len(ops)} alias change(s): " + ", ".join(f"{a} {n}" for a, n, _ in ops))
+        results = run_fanout(targets, lambda manager: manager.apply_batch(ops),
+                             concurrency=args.concurrency, timeout=args.timeout, pool=pool)
+        print(format_summary(results))
+        failed = [target for target, r in zip(targets, results) if not r["ok"]]
+        if failed and queue_remote(failed, ops):
+            print(f"Queued the changes for {len(failed)} unreachable host(s).")
+
+    print(f"Watching {', '.join(source.directories)} for alias changes. Press Ctrl+C to stop.")
+    try:
+        watch(source, push, poll=args.poll)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    return True
+
+def show_startup_time(runs):
+    from alias_file import measure_startup, record_startup
+    shell = os.environ.get("SHELL")
+    if not shell:
+        print("Could not determine your shell.")
+        return
+    print(f"Starting {shell} {runs} times...")
+    try:
+        result = measure_startup(shell, runs)
+    except Exception as e:
+        logging.exception("Startup measurement failed:")
+        print("Startup measurement failed:", e)
+        return
+    local_manager = get_local_manager(platform.system())
+    if local_manager is not None:
+        result["aliases"] = len(local_manager.list_aliases())
+        result["output"] = "file" if getattr(local_manager, "alias_file", None) else "profile"
+    previous = record_startup(result)
+    print(f"Shell startup: median {result['median'] * 1000:.1f} ms, min {result['min'] * 1000:.1f} ms, "
+          f"mean {result['mean'] * 1000:.1f} ms.")
+    if previous:
+        change = (result["median"] - previous["median"]) / previous["median"] * 100
+        print(f"Previous measurement ({time.strftime('%Y-%m-%d %H:%M', time.localtime(previous['time']))}, "
+              f"{previous.get('output', '?')} output): median {previous['median'] * 1000:.1f} ms ({change:+.1f}%).")
+
+def run_targets(args):
+    """Apply an alias change locally once, then push it to every inventory target in parallel."""
+    from fanout import run_fanout, format_summary
+
+    if args.manifest:
+        from manifest import load_manifest
+        try:
+            ops = load_manifest(args.manifest)
+        except Exception as e:
+            print("Could not load manifest:", e)
+            return False
+    else:
+        if not args.alias:
+            args.alias = input("Enter the alias name: ").strip()
+        if args.action != "delete" and not args.command:
+            args.command = input("Enter the command for the alias: ").strip()
+        ops = [(args.action, args.alias, args.command if args.action != "delete" else None)]
+
+    local_os = platform.system()
+    targets = inventory_targets(args.targets, local_os)
+    if targets is None:
+        return False
+
+    local_manager = get_local_manager(local_os)
+    if local_manager is not None:
+        try:
+            local_manager.apply_batch(ops)
+            print("Local aliases applied successfully.")
+        except Exception as e:
+            logging.exception("Local alias change failed:")
+            print("Local alias change failed:", e)
+            return False
+
+    print(f"Pushing {len(ops)} alias change(s) to {len(targets)} host(s)...")
+    if args.write_behind:
+        if queue_remote(targets, ops, local_manager=local_manager):
+            print(f"{len(ops)} alias change(s) queued for {len(targets)} host(s); they are pushed in the background.")
+        return True
+    results = run_fanout(targets, lambda manager: manager.apply_batch(
+                             ops_for_target(local_manager, ops, manager.remote_os, manager.host)),
+                         concurrency=args.concurrency, timeout=args.timeout)
+    print(format_summary(results))
+    failed = [target for target, r in zip(targets, results) if not r["ok"]]
+    if failed and queue_remote(failed, ops, local_manager=local_manager):
+        print(f"The changes were queued for the {len(failed)} failed host(s) and will be retried in the background.")
+    return not failed
+
+def queue_remote(targets, ops, new_names=None, local_manager=None):
+    """Journal ops for later delivery to targets and make sure a background flusher is running."""
+    from journal import OperationJournal, spawn_flusher
+    try:
+        journal = OperationJournal()
+        for target in targets:
+            journal.record(target, ops_for_target(local_manager, ops, target["os"], target["host"]), new_names)
+        spawn_flusher()
+    except Exception as e:
+        logging.exception("Could not queue remote changes:")
+        print("Could not queue remote changes:", e)
+        return False
+    return True
+
+def flush_journal():
+    """Push every queued remote change once and report what is still pending."""
+    from journal import JournalFlusher
+    flusher = JournalFlusher()
+    results = flusher.flush_once()
+    if not results:
+        print("No queued remote changes.")
+        return True
+    for key, error in results.items():
+        print(f"{key:<32} {'pushed' if error is None else 'FAILED: ' + error}")
+    remaining = flusher.journal.pending()
+    if remaining:
+        print(f"{sum(len(item['records']) for item in remaining.values())} change(s) still queued "
+              f"for {len(remaining)} host(s).")
+    return not remaining
+
+def connect_remote(remote_os, config):
     from alias_manager_remote import RemoteAliasManager
+    from ssh_pool import pool_from_config
+    return RemoteAliasManager(remote_os, config.get("remote_host"), config.get("remote_username"),
+                              config.get("remote_password"), pool=pool_from_config(config))
+
+def create_remote_alias(connect_future, alias_name, command):
+    remote_manager = connect_future.result()
+    remote_manager.create_alias(alias_name, command)
+
+def future_error(future):
+    """Wait for a future and return the exception it raised, or None."""
     try:
-        remote_manager = RemoteAliasManager(remote_os, remote_host, remote_username, remote_password)
-        remote_manager.create_alias(args.alias, args.command)
-        print(f"Remote alias created successfully on {os_msg} machine.")
+        future.result()
     except Exception as e:
-        logging.exception("Remote alias creation failed:")
-        print("Remote alias creation failed:", e)
+        logging.exception("Operation failed:")
+        return e
+    return None
+
+def rollback_local(local_manager, alias_name, previous_command):
+    """Undo a local create_alias, restoring the previous definition if there was one."""
+    try:
+        if previous_command is None:
+            local_manager.delete_alias(alias_name)
+        else:
+            local_manager.update_alias(alias_name, previous_command)
+        print(f"Rolled back local alias '{alias_name}'.")
+    except Exception as e:
+        logging.exception("Local rollback failed:")
+        print("Local rollback failed:", e)
+
+def report_timing(args):
+    """Print and/or export the phase timings collected during this run."""
+    timing.disable()
+    if args.profile:
+        print(timing.format_breakdown(), file=sys.stderr)
+    if args.profile_output:
+        try:
+            timing.export(args.profile_output, args.profile_format)
+        except IOError as e:
+            print(e, file=sys.stderr)
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiling = args.profile or args.profile_output
+    if profiling:
+        timing.reset()
+        timing.enable()
+    try:
+        run(args)
+    finally:
+        if profiling:
+            report_timing(args)
+
+def run(args):
+    if args.measure_startup:
+        show_startup_time(args.measure_startup)
+        return
+
+    if args.history:
+        show_history()
+        return
+    if args.restore:
+        restore_profile(args.restore)
+        return
+
+    if args.search:
+        run_search(args)
+        return
+
+    if args.audit:
+        sys.exit(0 if run_audit(args) else 1)
+
+    if args.suggest:
+        if run_suggest(args):
+            reload_shell()
+        return
+
+    if args.watch:
+        run_watch(args)
+        return
+
+    if args.sync:
+        run_sync(args)
+        return
+
+    if args.targets:
+        run_targets(args)
+        return
+
+    if args.flush:
+        sys.exit(0 if flush_journal() else 1)
+
+    if args.manifest:
+        if run_manifest(args.manifest, args.write_behind):
+            reload_shell()
+        return
+    
+    local_os = platform.system()
+    logging.info("Local OS detected: %s", local_os)
+    remote_os, os_msg = get_remote_os(local_os)
+
+    config = load_config() if remote_os is not None else {}
+    remote_configured = bool(config.get("remote_host") and config.get("remote_username")
+                             and config.get("remote_password"))
+    write_behind = args.write_behind or config.get("write_behind")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # Start connecting to the remote host while the user is still typing.
+        connect_future = None
+        if remote_configured and not write_behind:
+            connect_future = executor.submit(connect_remote, remote_os, config)
+
+        # Ask only for alias and command if not provided as arguments.
+        if not args.alias:
+            args.alias = input("Enter the alias name: ").strip()
+        if not args.command:
+            args.command = input("Enter the command for the alias: ").strip()
+
+        # Create local alias using the appropriate module.
+        local_manager = get_local_manager(local_os)
+        if local_manager is None:
+            logging.error("Unsupported local OS: %s", local_os)
+            print("Unsupported local OS for alias creation.")
+            return
+
+        previous_command = None
+        if args.rollback_on_remote_failure or remote_configured:
+            previous_command = local_manager.list_aliases().get(args.alias)
+
+        ops = [("create", args.alias, args.command)]
+        if remote_configured:
+            ops = ops_for_target(local_manager, ops, remote_os, config["remote_host"])
+
+        # Run the local and remote changes at the same time.
+        local_future = executor.submit(local_manager.create_alias, args.alias, args.command)
+        remote_future = None
+        if connect_future is not None:
+            remote_future = executor.submit(create_remote_alias, connect_future, args.alias, ops[0][2])
+
+        local_error = future_error(local_future)
+        remote_error = future_error(remote_future) if remote_future is not None else None
+
+    if local_error:
+        print("Local alias creation failed:", local_error)
+    else:
+        print("Local alias created successfully.")
+
+    if remote_os is None:
+        print("Remote creation not supported for local OS:", local_os)
+        return
+    if not remote_configured:
+        print("Remote configuration not found in config file. Please set it up.")
+        return
+    from inventory import targets_from_config
+    new_names = [args.alias] if previous_command is None else []
+    if write_behind:
+        if queue_remote(targets_from_config(config, remote_os), ops, new_names):
+            print(f"Remote alias queued for {config['remote_host']}; it is pushed in the background.")
+    elif remote_error:
+        print("Remote alias creation failed:", remote_error)
+        if not local_error and args.rollback_on_remote_failure:
+            rollback_local(local_manager, args.alias, previous_command)
+            return
+        if queue_remote(targets_from_config(config, remote_os), ops, new_names):
+            print("The remote change was queued and will be retried in the background.")
+        return
+    else:
+        print(f"Remote alias created successfully on {os_msg} machine.")
+    if local_error:
         return
 
     # After aliases are added, reload the shell to pick up new aliases.
@@ -0,0 +1,51 @@
+import json
+import logging
+
+VALID_ACTIONS = ("create", "update", "delete")
+
+def load_manifest(path):
+    """Read an alias manifest and return a list of (action, name, command) operations.
+
+    The manifest is a JSON list of entries, or an object with an "aliases" list:
+        [{"name": "ll", "command": "ls -la"},
+         {"name": "gs", "command": "git status", "action": "update"},
+         {"name": "old", "action": "delete"}]
+    The action defaults to "create".
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        logging.exception("Could not read manifest %s", path)
+        raise IOError(f"Could not read manifest {path}: {e}")
+    if isinstance(data, dict):
+        data = data.get("aliases", [])
+    if not isinstance(data, list):
+        raise ValueError(f"Manifest {path} must contain a list of aliases")
+
+    ops = []
+    for index, entry in enumerate(data):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Manifest entry {index} is not an object")
+        action = str(entry.get("action", "create")).lower()
+        alias_name = str(entry.get("name", "")).strip()
+        command = entry.get("command")
+        if action not in VALID_ACTIONS:
+            raise ValueError(f"Manifest entry {index} has unknown action '{action}'")
+        if not alias_name:
+            raise ValueError(f"Manifest entry {index} has no alias name")
+        if action != "delete" and not command:
+            raise ValueError(f"Manifest entry {index} ('{alias_name}') has no command")
+        ops.append((action, alias_name, command if action != "delete" else None))
+    logging.info("Loaded %d operations from manifest %s.", len(ops), path)
+    return ops
+
+def coalesce_ops(ops):
+    """Collapse a list of operations so only the last one per alias name remains.
+
+    Returns a dict of name -> (action, command), ordered by first appearance.
+    """
+    pending = {}
+    for action, alias_name, command in ops:
+        pending[alias_name] = (action, command)
+    return pending
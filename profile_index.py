@@ -0,0 +1,261 @@
+import os
+import logging
+import threading
+from atomic_file import write_atomic
+from manifest import coalesce_ops
+from timing import timed
+
+BLOCK_START = "# >>> AliasManager >>>"
+BLOCK_END = "# <<< AliasManager <<<"
+
+def parse_alias_line(line):
+    """Return (name, command) for an `alias name='command'` line, or None."""
+    line = line.strip()
+    if line.startswith("alias "):
+        # Expected format: alias name='command'
+        parts = line.split("=", 1)
+        if len(parts) == 2:
+            alias_def = parts[0].strip()  # e.g., "alias ll"
+            command_def = parts[1].strip().strip("'")
+            return alias_def[6:], command_def  # Remove 'alias ' prefix
+    return None
+
+def parse_aliases(lines):
+    """Parse alias definitions out of shell profile lines into a name -> command dict."""
+    aliases = {}
+    for line in lines:
+        parsed = parse_alias_line(line)
+        if parsed:
+            aliases[parsed[0]] = parsed[1]
+    return aliases
+
+def format_alias_line(alias_name, command):
+    return f"alias {alias_name}='{command}'\n"
+
+def apply_ops_to_lines(lines, ops):
+    """Apply (action, name, command) operations to profile lines in memory.
+
+    Returns the new list of lines and a summary dict of created/updated/deleted counts
+    and the names that could not be updated or deleted because they were missing.
+    """
+    pending = coalesce_ops(ops)
+    summary = {"created": 0, "updated": 0, "deleted": 0, "missing": []}
+    written = set()
+    output = []
+    for line in lines:
+        if line.startswith("alias "):
+            alias_key = line[6:].split("=", 1)[0].strip()
+            if alias_key in pending:
+                action, command = pending[alias_key]
+                if action == "delete":
+                    if alias_key not in written:
+                        summary["deleted"] += 1
+                        written.add(alias_key)
+                    continue
+                if alias_key in written:
+                    continue  # Drop duplicate definitions of the same alias
+                output.append(format_alias_line(alias_key, command))
+                summary["updated"] += 1
+                written.add(alias_key)
+                continue
+        output.append(line)
+    if output and not output[-1].endswith("\n"):
+        output[-1] += "\n"
+    for alias_key, (action, command) in pending.items():
+        if alias_key in written:
+            continue
+        if action == "create":
+            output.append(format_alias_line(alias_key, command))
+            summary["created"] += 1
+        else:
+            summary["missing"].append(alias_key)
+    return output, summary
+
+class ProfileIndex:
+    """Parsed view of a shell profile with a dedicated AliasManager block.
+
+    The profile is parsed once into the aliases defined outside the managed block and
+    the alias lines inside it (name -> line number within the block). Edits are made
+    to the block in memory and the profile is replaced atomically with the new block
+    spliced in, so a crash never leaves a half-written profile. The index remembers the file's mtime and size so a
+    stale copy is re-parsed only after someone else changes the file, and when only the
+    managed block changed, only the block is parsed again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None
+        self.outside_aliases = {}  # name -> command for alias lines outside the block
+        self.block_lines = []      # alias lines inside the block, newline terminated
+        self.block_aliases = {}    # name -> index into block_lines
+        self.block_commands = {}   # name -> command for the aliases in the block
+        self.block_start = None    # byte offset of the start marker, None if no block yet
+        self.block_end = None      # byte offset just past the end marker
+        self._outside = None       # (bytes before the block, bytes after it) as last read
+
+    def is_stale(self):
+        return self.stamp != _stat_stamp(self.path)
+
+    @timed("profile.parse")
+    def load(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.outside_aliases = {}
+        self.block_lines = []
+        self.block_aliases = {}
+        self.block_commands = {}
+        self.block_start = self.block_end = None
+        offset = 0
+        in_block = False
+        for raw in data.splitlines(keepends=True):
+            line = raw.decode("utf-8", errors="surrogateescape")
+            marker = line.strip()
+            if marker == BLOCK_START and self.block_start is None:
+                in_block = True
+                self.block_start = offset
+            elif marker == BLOCK_END and in_block:
+                in_block = False
+                self.block_end = offset + len(raw)
+            elif in_block:
+                self._add_block_line(line)
+            else:
+                parsed = parse_alias_line(line)
+                if parsed:
+                    self.outside_aliases[parsed[0]] = parsed[1]
+            offset += len(raw)
+        if in_block:
+            # Unterminated block: treat everything after the start marker as the block.
+            self.block_end = offset
+        self._outside = None if self.block_start is None else (data[:self.block_start], data[self.block_end:])
+        self.stamp = _stat_stamp(self.path)
+        logging.info("Indexed %d managed and %d other aliases in %s.",
+                     len(self.block_aliases), len(self.outside_aliases), self.path)
+
+    @timed("profile.refresh")
+    def refresh(self):
+        """Catch up with a changed file, re-parsing only the managed block if nothing around it changed."""
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = self._unchanged_block_end(data)
+        if end is None:
+            self.load()
+            return
+        self.block_lines = []
+        self.block_aliases = {}
+        self.block_commands = {}
+        for raw in data[self.block_start:end].splitlines(keepends=True)[1:-1]:
+            self._add_block_line(raw.decode("utf-8", errors="surrogateescape"))
+        self.block_end = end
+        self.stamp = _stat_stamp(self.path)
+        logging.info("Re-read the %d managed aliases in %s.", len(self.block_aliases), self.path)
+
+    def _unchanged_block_end(self, data):
+        # The new end of the block when the bytes before and after it are as last read, else None.
+        if self._outside is None:
+            return None
+        prefix, suffix = self._outside
+        start = len(prefix)
+        first_end = data.find(b"\n", start)
+        if not data.startswith(prefix) or data[start:first_end].strip() != BLOCK_START.encode():
+            return None
+        marker = data.find(b"\n" + BLOCK_END.encode(), start)
+        if marker < 0:
+            return None
+        line_end = data.find(b"\n", marker + 1)
+        end = len(data) if line_end < 0 else line_end + 1
+        if data[marker + 1:end].strip() != BLOCK_END.encode() or data[end:] != suffix:
+            return None
+        return end
+
+    def _add_block_line(self, line):
+        parsed = parse_alias_line(line)
+        if parsed:
+            self.block_aliases[parsed[0]] = len(self.block_lines)
+            self.block_commands[parsed[0]] = parsed[1]
+            self.block_lines.append(format_alias_line(*parsed))
+
+    def aliases(self):
+        aliases = dict(self.outside_aliases)
+        aliases.update(self.block_commands)
+        return aliases
+
+    def set_alias(self, alias_name, command):
+        line = format_alias_line(alias_name, command)
+        self.block_commands[alias_name] = command
+        if alias_name in self.block_aliases:
+            self.block_lines[self.block_aliases[alias_name]] = line
+        else:
+            self.block_aliases[alias_name] = len(self.block_lines)
+            self.block_lines.append(line)
+
+    def remove_alias(self, alias_name):
+        index = self.block_aliases.pop(alias_name, None)
+        if index is None:
+            return False
+        del self.block_lines[index]
+        del self.block_commands[alias_name]
+        for other, other_index in self.block_aliases.items():
+            if other_index > index:
+                self.block_aliases[other] = other_index - 1
+        return True
+
+    @timed("profile.write_block")
+    def write_block(self):
+        """Write the managed block back, leaving the rest of the profile as it was."""
+        block = (BLOCK_START + "\n" + "".join(self.block_lines) + BLOCK_END + "\n")
+        block = block.encode("utf-8", errors="surrogateescape")
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if self.is_stale():
+            # Changed on disk since it was parsed: the stored offsets may point anywhere.
+            self.block_start, self.block_end = _find_block(data)
+        if self.block_start is None:
+            start = len(data)
+            if data and not data.endswith(b"\n"):
+                block = b"\n" + block
+            suffix = b""
+        else:
+            start = self.block_start
+            suffix = data[self.block_end:]
+        data = data[:start] + block + suffix
+        write_atomic(self.path, data)
+        if block.startswith(b"\n"):
+            start += 1
+            block = block[1:]
+        self.block_start = start
+        self.block_end = start + len(block)
+        self._outside = (data[:start], suffix)
+        self.stamp = _stat_stamp(self.path)
+
+def _find_block(data):
+    """(start, end) byte offsets of the managed block in profile bytes, or (None, None)."""
+    offset = 0
+    start = None
+    for raw in data.splitlines(keepends=True):
+        marker = raw.strip()
+        if start is None and marker == BLOCK_START.encode():
+            start = offset
+        elif start is not None and marker == BLOCK_END.encode():
+            return start, offset + len(raw)
+        offset += len(raw)
+    return (start, offset) if start is not None else (None, None)
+
+def _stat_stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_profile_index(path):
+    """Return the cached index for a profile, re-parsing it only if the file changed."""
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = ProfileIndex(path)
+        if index.is_stale():
+            if index.stamp is None:
+                index.load()
+            else:
+                index.refresh()
+        return index
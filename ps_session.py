@@ -0,0 +1,218 @@
+import sys
+import time
+import uuid
+import base64
+import socket
+import logging
+import threading
+import subprocess
+import weakref
+import paramiko
+from timing import span
+
+POWERSHELL_COMMAND = "powershell -NoProfile -NonInteractive -Command -"
+END_MARKER = "<<<AM-END"
+# A script may run silently for this long before its session is given up on.
+SCRIPT_TIMEOUT = 600
+
+# Sent once when the session starts. Each request is a single line
+#     __am_run '<id>' '<base64 script>'
+# and is answered with the script's output lines followed by
+#     <<<AM-END <id> <1|0>>>>
+# where the last field says whether the script completed without an error.
+BOOTSTRAP = (
+    "function __am_run($id, $b64) { $ok = 1; "
+    "try { $ErrorActionPreference = 'Stop'; "
+    "$script = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($b64)); "
+    "Invoke-Expression $script 2>&1 | ForEach-Object { [Console]::Out.WriteLine(\"$_\") } } "
+    "catch { [Console]::Out.WriteLine(\"$_\"); $ok = 0 }; "
+    "[Console]::Out.WriteLine(\"" + END_MARKER + " $id $ok>>>\"); [Console]::Out.Flush() }\n"
+)
+
+class SessionError(IOError):
+    """The session broke (timeout, dropped channel), as opposed to a script that failed."""
+
+class SessionTimeout(SessionError):
+    """A script did not finish within the session's script timeout."""
+
+class PowerShellSession:
+    """A long-lived PowerShell process that runs scripts sent to it over stdin.
+
+    PowerShell only starts once per session, so a sequence of operations pays its
+    startup cost once. The process can be remote (an SSH channel) or local (a
+    subprocess); the local form is used with the stand-in below for testing.
+    """
+
+    def __init__(self, stdin, stdout, closer=None, settimeout=None, script_timeout=SCRIPT_TIMEOUT):
+        self._stdin = stdin
+        self._stdout = stdout
+        self._closer = closer
+        self._settimeout = settimeout
+        self.script_timeout = script_timeout
+        self._lock = threading.Lock()
+        self.closed = False
+        # The first script also waits for PowerShell itself to start.
+        self._phase = "powershell.start_and_run"
+        self._send(BOOTSTRAP)
+
+    @classmethod
+    def from_client(cls, client, command=None, timeout=None, script_timeout=SCRIPT_TIMEOUT):
+        """Start a session on an authenticated paramiko SSHClient.
+
+        `timeout` bounds opening the channel. Each script then has `script_timeout`
+        seconds to finish, however long it stays silent; one that takes longer fails
+        with SessionTimeout and the session is closed.
+        """
+        try:
+            with span("powershell.open_channel"):
+                transport = client.get_transport()
+                if transport is None or not transport.is_active():
+                    raise SessionError("SSH transport is not connected")
+                channel = transport.open_session(timeout=timeout)
+                channel.settimeout(timeout)
+                channel.set_combine_stderr(True)
+                channel.exec_command(command or POWERSHELL_COMMAND)
+            return cls(channel.makefile_stdin("wb"), channel.makefile("r"), closer=channel.close,
+                       settimeout=channel.settimeout, script_timeout=script_timeout)
+        except SessionError:
+            raise
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            raise SessionError(f"Could not start PowerShell session: {e}")
+
+    @classmethod
+    def from_process(cls, argv):
+        """Start a session on a local process, e.g. the stand-in: [sys.executable, "ps_session.py"]."""
+        process = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True, bufsize=1)
+        def closer():
+            process.stdin.close()
+            process.wait()
+        return cls(process.stdin, process.stdout, closer=closer)
+
+    def run_lines(self, script):
+        """Run a script and return its output lines.
+
+        Raises IOError if the script failed, and SessionError (an IOError) if the
+        session itself broke or timed out; the session is then closed.
+        """
+        with self._lock:
+            if self.closed:
+                raise SessionError("PowerShell session is closed")
+            request_id = uuid.uuid4().hex
+            encoded = base64.b64encode(script.encode("utf-8")).decode("ascii")
+            self._send(f"__am_run '{request_id}' '{encoded}'\n")
+            phase, self._phase = self._phase, "powershell.run"
+            lines = []
+            deadline = None if self.script_timeout is None else time.monotonic() + self.script_timeout
+            with span(phase):
+                while True:
+                    line = self._read_line(deadline)
+                    status = self._end_status(line, request_id)
+                    if status is not None:
+                        break
+                    lines.append(line)
+            if status != "1":
+                raise IOError("\n".join(lines[-20:]) or "PowerShell script failed")
+            return lines
+
+    def run(self, script):
+        """Run a script and return its output as a string."""
+        return "\n".join(self.run_lines(script))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._closer:
+                self._closer()
+        except Exception as e:
+            logging.warning("Error closing PowerShell session: %s", e)
+
+    def _read_line(self, deadline=None):
+        try:
+            if self._settimeout is not None and deadline is not None:
+                # Reads wait up to the script's deadline, not a fixed time per line.
+                self._settimeout(max(0.001, deadline - time.monotonic()))
+            line = self._stdout.readline()
+        except (socket.timeout, paramiko.SSHException, EOFError, OSError) as e:
+            # The rest of the response may still arrive, so the framing is lost either way.
+            self.close()
+            if isinstance(e, socket.timeout):
+                raise SessionTimeout(f"PowerShell script did not finish within {self.script_timeout} seconds")
+            raise SessionError(f"PowerShell session failed: {e}")
+        if not line:
+            self.closed = True
+            raise SessionError("PowerShell session ended unexpectedly")
+        return line.rstrip("\r\n")
+
+    def _end_status(self, line, request_id):
+        if not line.startswith(END_MARKER):
+            return None
+        fields = line[len(END_MARKER):].strip().rstrip(">").split()
+        if len(fields) == 2 and fields[0] == request_id:
+            return fields[1]
+        return None
+
+    def _send(self, text):
+        try:
+            self._stdin.write(text)
+            self._stdin.flush()
+        except Exception as e:
+            self.closed = True
+            raise SessionError(f"Could not write to PowerShell session: {e}")
+
+_sessions = weakref.WeakKeyDictionary()  # SSHClient -> its sessions; the first is get_session()'s
+_sessions_lock = threading.Lock()
+
+def get_sessions(client, count, timeout=None, command=None, script_timeout=SCRIPT_TIMEOUT):
+    """Return `count` PowerShell sessions bound to an SSHClient, starting the missing ones.
+
+    Each session has its own channel, so scripts that do not depend on each other can
+    run in them side by side; the sessions stay open for the next batch.
+    """
+    with _sessions_lock:
+        sessions = _sessions.setdefault(client, [])
+        for i in range(count):
+            if i < len(sessions) and not sessions[i].closed:
+                continue
+            session = PowerShellSession.from_client(client, command, timeout, script_timeout)
+            if i < len(sessions):
+                sessions[i] = session
+            else:
+                sessions.append(session)
+            logging.info("Started persistent PowerShell session %d.", i + 1)
+        return sessions[:count]
+
+def get_session(client, timeout=None, command=None, script_timeout=SCRIPT_TIMEOUT):
+    """Return the PowerShell session bound to an SSHClient, starting one if needed."""
+    return get_sessions(client, 1, timeout, command, script_timeout)[0]
+
+def drop_session(client):
+    """Close and forget the sessions bound to an SSHClient, e.g. after its transport died."""
+    with _sessions_lock:
+        sessions = _sessions.pop(client, [])
+    for session in sessions:
+        session.close()
+
+def serve_stand_in():
+    """Speak the session framing on stdin/stdout, running each script with the local shell.
+
+    This lets PowerShellSession be exercised without a Windows host.
+    """
+    for line in sys.stdin:
+        line = line.strip()
+        if not line.startswith("__am_run "):
+            continue
+        request_id, encoded = [part.strip("'") for part in line.split()[1:3]]
+        script = base64.b64decode(encoded).decode("utf-8")
+        result = subprocess.run(script, shell=True, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True)
+        sys.stdout.write(result.stdout)
+        if result.stdout and not result.stdout.endswith("\n"):
+            sys.stdout.write("\n")
+        sys.stdout.write(f"{END_MARKER} {request_id} {1 if result.returncode == 0 else 0}>>>\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    serve_stand_in()
@@ -0,0 +1,128 @@
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from timing import span
+
+CHUNK_SIZE = 32768
+STDERR_LIMIT = 65536
+# OpenSSH allows 10 sessions per connection by default (MaxSessions); stay below it.
+DEFAULT_MAX_CHANNELS = 8
+
+class RemoteCommandError(IOError):
+    def __init__(self, exit_status, stderr):
+        super().__init__(f"{stderr or 'remote command failed'} (exit {exit_status})")
+        self.exit_status = exit_status
+        self.stderr = stderr
+
+class RemoteCommand:
+    """A started remote command whose stdout and stderr are read at the same time.
+
+    stderr is drained on a helper thread into a buffer that keeps only its last
+    STDERR_LIMIT bytes, so a chatty command can never stall on a full stderr window.
+    stdout is read in CHUNK_SIZE pieces and handed out line by line by iter_lines(),
+    so memory stays flat however large the output is. Success is decided by the exit
+    status alone; a non-zero status raises RemoteCommandError with the stderr tail.
+    """
+
+    def __init__(self, stdin, stdout, stderr):
+        self.stdin = stdin
+        self.channel = stdout.channel
+        self._stderr = bytearray()
+        self._done = threading.Event()
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, name="remote-stderr", daemon=True)
+        self._stderr_thread.start()
+
+    @property
+    def stderr(self):
+        return self._stderr.decode("utf-8", errors="replace").strip()
+
+    def iter_lines(self):
+        """Yield stdout lines (without line endings) as they arrive, then check the exit status."""
+        try:
+            with span("remote.read_output"):
+                yield from self._read_lines()
+        finally:
+            self._done.set()
+        self._stderr_thread.join()
+        exit_status = self.channel.recv_exit_status()
+        if exit_status != 0:
+            raise RemoteCommandError(exit_status, self.stderr)
+
+    def _read_lines(self):
+        pending = b""
+        while True:
+            data = self.channel.recv(CHUNK_SIZE)
+            if not data:
+                break
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+        if pending:
+            yield pending.rstrip(b"\r").decode("utf-8", errors="replace")
+
+    def wait(self):
+        """Discard stdout, wait for the command and raise RemoteCommandError if it failed."""
+        for _ in self.iter_lines():
+            pass
+
+    def _drain_stderr(self):
+        while True:
+            try:
+                data = self.channel.recv_stderr(CHUNK_SIZE)
+            except socket.timeout:
+                if self._done.is_set():
+                    return
+                continue
+            except Exception as e:
+                logging.debug("Reading remote stderr stopped: %s", e)
+                return
+            if not data:
+                return
+            self._stderr += data
+            if len(self._stderr) > STDERR_LIMIT:
+                del self._stderr[:-STDERR_LIMIT]
+
+class ChannelScheduler:
+    """Runs independent remote commands concurrently, each on its own channel of one transport.
+
+    `start_command(command)` must open a channel and start the command, returning a
+    RemoteCommand. At most `max_channels` channels are open at a time, so N commands
+    cost about ceil(N / max_channels) round trips instead of N, with no extra
+    connections. Jobs are command strings or (command, stdin_text) pairs; run() returns
+    one result dict per job, in the order of the jobs:
+
+        {"command": ..., "ok": True, "lines": [...], "error": None, "exit_status": 0}
+    """
+
+    def __init__(self, start_command, max_channels=DEFAULT_MAX_CHANNELS):
+        self.start_command = start_command
+        self.max_channels = max(1, max_channels)
+
+    def run(self, jobs):
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_channels, len(jobs)),
+                                thread_name_prefix="remote-channel") as executor:
+            return list(executor.map(self._run_job, jobs))
+
+    def _run_job(self, job):
+        command, stdin_text = job if isinstance(job, tuple) else (job, None)
+        result = {"command": command, "ok": False, "lines": [], "error": None, "exit_status": None}
+        try:
+            remote = self.start_command(command)
+            if stdin_text is not None:
+                remote.stdin.write(stdin_text)
+            remote.stdin.channel.shutdown_write()
+            result["lines"] = list(remote.iter_lines())
+            result["ok"] = True
+            result["exit_status"] = 0
+        except RemoteCommandError as e:
+            result["error"] = str(e)
+            result["exit_status"] = e.exit_status
+        except Exception as e:
+            logging.debug("Remote command %r failed: %s", command, e)
+            result["error"] = str(e) or type(e).__name__
+        return result
@@ -0,0 +1,119 @@
+import uuid
+import logging
+from profile_index import parse_aliases, parse_alias_line, apply_ops_to_lines
+from timing import span
+
+REMOTE_PROFILE = ".bash_profile"  # SFTP paths are relative to the remote home directory
+
+class SFTPProfileEditor:
+    """Read-modify-write editor for a remote macOS shell profile over SFTP.
+
+    Edits are queued in memory; flush() downloads the profile once, applies every
+    queued edit with the same parser as OSXAliasManager and uploads the result to a
+    temporary file that is renamed over the profile. Use it as a context manager to
+    flush on exit:
+
+        with SFTPProfileEditor(client) as editor:
+            editor.create_alias("ll", "ls -la")
+            editor.delete_alias("old")
+    """
+
+    def __init__(self, client, profile_path=REMOTE_PROFILE):
+        with span("sftp.open"):
+            self.sftp = client.open_sftp()
+        self.profile_path = profile_path
+        self.pending = []
+
+    def create_alias(self, alias_name, command):
+        self.pending.append(("create", alias_name, command))
+
+    def update_alias(self, alias_name, new_command):
+        self.pending.append(("update", alias_name, new_command))
+
+    def delete_alias(self, alias_name):
+        self.pending.append(("delete", alias_name, None))
+
+    def list_aliases(self):
+        return parse_aliases(self._read_lines())
+
+    def iter_aliases(self):
+        """Yield (name, command) pairs while reading the profile, without holding all of it."""
+        try:
+            f = self.sftp.open(self.profile_path, "r", bufsize=32768)
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                parsed = parse_alias_line(line.decode("utf-8", errors="replace") if isinstance(line, bytes) else line)
+                if parsed:
+                    yield parsed
+
+    def apply(self, ops):
+        """Queue a list of (action, name, command) operations and flush them."""
+        self.pending.extend(ops)
+        return self.flush()
+
+    def flush(self):
+        """Write all queued edits back with one download and one atomic upload."""
+        if not self.pending:
+            return {"created": 0, "updated": 0, "deleted": 0, "missing": []}
+        ops, self.pending = self.pending, []
+        lines = self._read_lines()
+        output, summary = apply_ops_to_lines(lines, ops)
+        tmp_path = f"{self.profile_path}.aliasmgr-{uuid.uuid4().hex[:8]}"
+        try:
+            with span("sftp.upload"):
+                with self.sftp.open(tmp_path, "w") as f:
+                    f.set_pipelined(True)
+                    f.write("".join(output))
+                try:
+                    mode = self.sftp.stat(self.profile_path).st_mode
+                    self.sftp.chmod(tmp_path, mode & 0o7777)
+                except IOError:
+                    pass  # The profile does not exist yet
+                self._rename(tmp_path, self.profile_path)
+        except Exception as e:
+            logging.exception("Error writing remote profile %s over SFTP", self.profile_path)
+            try:
+                self.sftp.remove(tmp_path)
+            except IOError:
+                pass
+            raise IOError(f"Error writing remote profile {self.profile_path}: {e}")
+        logging.info("Flushed %d edits to remote profile %s: %d created, %d updated, %d deleted.",
+                     len(ops), self.profile_path, summary["created"], summary["updated"], summary["deleted"])
+        return summary
+
+    def close(self):
+        self.sftp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+    def _read_lines(self):
+        try:
+            with span("sftp.download"):
+                with self.sftp.open(self.profile_path, "r") as f:
+                    f.prefetch()
+                    data = f.read()
+        except FileNotFoundError:
+            return []
+        return data.decode("utf-8", errors="replace").splitlines(keepends=True)
+
+    def _rename(self, source, destination):
+        try:
+            # Atomic replace on OpenSSH servers (posix-rename@openssh.com).
+            self.sftp.posix_rename(source, destination)
+        except IOError:
+            # Plain SFTP rename refuses to overwrite, so fall back to remove + rename.
+            try:
+                self.sftp.remove(destination)
+            except IOError:
+                pass
+            self.sftp.rename(source, destination)
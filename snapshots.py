@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+from atomic_file import write_atomic
+
+SNAPSHOT_DIR = os.path.expanduser("~/.alias_manager_snapshots")
+MAX_SNAPSHOTS = 50
+
+class SnapshotStore:
+    """Content-addressed history of a file.
+
+    Each distinct version is stored once, compressed, under objects/ by its SHA-256;
+    a per-file append-only log records when each version was seen. Snapshotting an
+    unchanged file only costs a stat() and a read of that small log, and only the
+    newest `max_snapshots` versions of each file are kept.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, max_snapshots=MAX_SNAPSHOTS):
+        self.root = root
+        self.max_snapshots = max_snapshots
+
+    def snapshot(self, path):
+        """Record the current content of path if it changed. Returns the entry, or None."""
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        history = self.history(path)
+        last = history[-1] if history else None
+        if last and last.get("stamp") == stamp:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if last and last["hash"] == digest:
+            return None
+        self._write_object(digest, data)
+        entry = {"hash": digest, "time": time.time(), "size": len(data), "stamp": stamp}
+        with open(self._log_path(path), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        logging.info("Snapshot %s of %s stored.", digest[:12], path)
+        if len(history) + 1 > self.max_snapshots:
+            self._prune(path, history + [entry])
+        return entry
+
+    def history(self, path):
+        """Return the snapshot entries for path, oldest first."""
+        log_path = self._log_path(path)
+        if not os.path.exists(log_path):
+            return []
+        entries = []
+        with open(log_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+        return entries
+
+    def restore(self, path, ref):
+        """Restore path to a snapshot given by hash prefix or by history index (-1 = newest).
+
+        The current content is snapshotted first, so a restore can itself be undone.
+        """
+        history = self.history(path)
+        entry = self._find(history, ref)
+        if entry is None:
+            raise ValueError(f"No snapshot '{ref}' for {path}")
+        if os.path.exists(path):
+            self.snapshot(path)
+        # Like any other profile write, this keeps a symlinked profile a link and keeps its mode.
+        write_atomic(path, self._read_object(entry["hash"]))
+        logging.info("Restored %s to snapshot %s.", path, entry["hash"][:12])
+        return entry
+
+    def _find(self, history, ref):
+        ref = str(ref)
+        try:
+            return history[int(ref)]
+        except (ValueError, IndexError):
+            pass
+        matches = [e for e in history if e["hash"].startswith(ref)]
+        return matches[-1] if matches else None
+
+    def _prune(self, path, history):
+        keep = history[-self.max_snapshots:]
+        tmp_path = self._log_path(path) + ".tmp"
+        with open(tmp_path, "w") as f:
+            for entry in keep:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self._log_path(path))
+        self._collect_garbage()
+
+    def _collect_garbage(self):
+        # Objects can be shared between files, so only drop those no log refers to.
+        referenced = set()
+        logs_dir = os.path.join(self.root, "logs")
+        for name in os.listdir(logs_dir):
+            with open(os.path.join(logs_dir, name), "r") as f:
+                for line in f:
+                    if line.strip():
+                        referenced.add(json.loads(line)["hash"])
+        objects_dir = os.path.join(self.root, "objects")
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if prefix + name not in referenced:
+                    os.remove(os.path.join(objects_dir, prefix, name))
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def _write_object(self, digest, data):
+        object_path = self._object_path(digest)
+        if os.path.exists(object_path):
+            return
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = object_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(data))
+        os.replace(tmp_path, object_path)
+
+    def _read_object(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def _log_path(self, path):
+        logs_dir = os.path.join(self.root, "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+        key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(logs_dir, key + ".jsonl")
@@ -0,0 +1,131 @@
+import time
+import atexit
+import logging
+import threading
+import contextlib
+
+DEFAULT_IDLE_TTL = 300
+DEFAULT_KEEPALIVE = 30
+
+class SSHConnectionPool:
+    """Shares authenticated SSH clients between RemoteAliasManager instances.
+
+    Connections are keyed by (host, username), kept alive with SSH keepalives, closed after
+    `idle_ttl` seconds without use and transparently re-opened when their transport dies.
+    A connection is in use while someone holds a lease() on it; leased connections are
+    never closed as idle, and idle time counts from the end of the last lease.
+    """
+
+    def __init__(self, idle_ttl=DEFAULT_IDLE_TTL, keepalive=DEFAULT_KEEPALIVE):
+        self.idle_ttl = idle_ttl
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._host_locks = {}
+        self._entries = {}
+        self._stop = threading.Event()
+        self._reaper = threading.Thread(target=self._reap_loop, name="ssh-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def get_client(self, host, username, password, timeout=10, reconnect=False):
+        key = (host, username)
+        with self._lock:
+            host_lock = self._host_locks.setdefault(key, threading.Lock())
+        # Connect outside the pool lock so a slow host doesn't block the others.
+        with host_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and not reconnect and self._is_alive(entry["client"]):
+                entry["last_used"] = time.monotonic()
+                return entry["client"]
+            if entry is not None:
+                logging.info("Replacing pooled SSH connection to %s.", host)
+                with self._lock:
+                    self._entries.pop(key, None)
+                self._close_client(entry["client"])
+            from alias_manager_remote import connect_client
+            client = connect_client(host, username, password, timeout)
+            transport = client.get_transport()
+            if transport is not None and self.keepalive:
+                transport.set_keepalive(self.keepalive)
+            with self._lock:
+                self._entries[key] = {"client": client, "last_used": time.monotonic(), "leases": 0}
+            return client
+
+    @contextlib.contextmanager
+    def lease(self, client):
+        """Mark a pooled client as in use for the duration of the with block."""
+        self.acquire(client)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def acquire(self, client):
+        """Take a lease on a pooled client; pair with release(). Clients not in the pool are ignored."""
+        self._adjust_leases(client, 1)
+
+    def release(self, client):
+        """Return a lease; a client that was replaced since has no leases left to return."""
+        self._adjust_leases(client, -1)
+
+    def _adjust_leases(self, client, delta):
+        with self._lock:
+            entry = next((e for e in self._entries.values() if e["client"] is client), None)
+            if entry is not None:
+                entry["leases"] = max(0, entry["leases"] + delta)
+                entry["last_used"] = time.monotonic()
+
+    def evict_idle(self):
+        """Close every connection that is not leased and has been idle longer than idle_ttl."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items()
+                       if not entry["leases"] and now - entry["last_used"] > self.idle_ttl]
+            clients = [self._entries.pop(key)["client"] for key in expired]
+        for key, client in zip(expired, clients):
+            logging.info("Evicting idle SSH connection to %s.", key[0])
+            self._close_client(client)
+        return len(expired)
+
+    def close_all(self):
+        self._stop.set()
+        with self._lock:
+            clients = [entry["client"] for entry in self._entries.values()]
+            self._entries.clear()
+        for client in clients:
+            self._close_client(client)
+
+    def _reap_loop(self):
+        interval = max(1, min(self.idle_ttl, 60))
+        while not self._stop.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception:
+                logging.exception("SSH pool eviction failed")
+
+    def _is_alive(self, client):
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _close_client(self, client):
+        try:
+            client.close()
+        except Exception as e:
+            logging.warning("Error closing pooled SSH connection: %s", e)
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_pool(idle_ttl=DEFAULT_IDLE_TTL, keepalive=DEFAULT_KEEPALIVE):
+    """Return the process-wide connection pool, creating it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SSHConnectionPool(idle_ttl=idle_ttl, keepalive=keepalive)
+            atexit.register(_default_pool.close_all)
+        return _default_pool
+
+def pool_from_config(config):
+    """Return the shared pool using the ssh_idle_ttl/ssh_keepalive settings from the config file."""
+    return get_pool(idle_ttl=config.get("ssh_idle_ttl", DEFAULT_IDLE_TTL),
+                    keepalive=config.get("ssh_keepalive", DEFAULT_KEEPALIVE))
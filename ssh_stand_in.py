@@ -0,0 +1,256 @@
+import os
+import time
+import heapq
+import socket
+import logging
+import threading
+import subprocess
+import paramiko
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if username == self.server.username and password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_OPEN_REQUEST
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.server._run_exec, args=(channel, command.decode("utf-8")),
+                         name="stand-in-exec", daemon=True).start()
+        return True
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+    def chattr(self, attr):
+        if attr.st_mode is not None:
+            os.fchmod(self.readfile.fileno(), attr.st_mode & 0o7777)
+        return paramiko.SFTP_OK
+
+class _SFTPInterface(paramiko.SFTPServerInterface):
+    """Serves the stand-in's root directory, which plays the remote home directory."""
+
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = server.server.root
+
+    def _path(self, path):
+        return os.path.join(self.root, os.path.normpath("/" + path).lstrip("/"))
+
+    def open(self, path, flags, attr):
+        path = self._path(path)
+        try:
+            fd = os.open(path, flags, 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        f = os.fdopen(fd, mode)
+        handle = _SFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = f
+        return handle
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def chattr(self, path, attr):
+        if attr.st_mode is not None:
+            os.chmod(self._path(path), attr.st_mode & 0o7777)
+        return paramiko.SFTP_OK
+
+    def remove(self, path):
+        try:
+            os.remove(self._path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        if os.path.exists(self._path(newpath)):
+            return paramiko.SFTP_FAILURE
+        os.rename(self._path(oldpath), self._path(newpath))
+        return paramiko.SFTP_OK
+
+    def posix_rename(self, oldpath, newpath):
+        os.replace(self._path(oldpath), self._path(newpath))
+        return paramiko.SFTP_OK
+
+    def canonicalize(self, path):
+        return "/" + os.path.normpath("/" + path).lstrip("/")
+
+class _Link:
+    """Forwards one direction of a connection, delaying every chunk by `delay` seconds
+    and pacing the bytes to `bandwidth` bytes per second (None for unlimited)."""
+
+    def __init__(self, source, destination, delay, bandwidth):
+        self.source = source
+        self.destination = destination
+        self.delay = delay
+        self.bandwidth = bandwidth
+        self.queue = []
+        self.cond = threading.Condition()
+        threading.Thread(target=self._receive, name="stand-in-link", daemon=True).start()
+        threading.Thread(target=self._send, name="stand-in-link", daemon=True).start()
+
+    def _receive(self):
+        sequence = 0
+        while True:
+            try:
+                data = self.source.recv(65536)
+            except OSError:
+                data = b""
+            with self.cond:
+                sequence += 1
+                heapq.heappush(self.queue, (time.monotonic() + self.delay, sequence, data))
+                self.cond.notify()
+            if not data:
+                return
+
+    def _send(self):
+        free_at = time.monotonic()
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+                due, _, data = heapq.heappop(self.queue)
+            pause = due - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            if not data:
+                _shutdown(self.destination)
+                return
+            if self.bandwidth:
+                free_at = max(free_at, time.monotonic()) + len(data) / self.bandwidth
+                pause = free_at - time.monotonic()
+                if pause > 0:
+                    time.sleep(pause)
+            try:
+                self.destination.sendall(data)
+            except OSError:
+                _shutdown(self.source)
+                return
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+class StandInSSHServer:
+    """In-process SSH server for benchmarks and experiments, standing in for a macOS host.
+
+    Commands run with the local /bin/sh in `root`, which is also HOME for them and the
+    top of the SFTP tree, so RemoteAliasManager(remote_os="osx") works against it
+    unchanged. `latency` is the injected round-trip time in seconds and `bandwidth`
+    caps each direction in bytes per second:
+
+        server = StandInSSHServer(root, latency=0.05, bandwidth=1_000_000)
+        port = server.start()
+        manager = RemoteAliasManager("osx", f"127.0.0.1:{port}", server.username, server.password)
+    """
+
+    def __init__(self, root, username="bench", password="bench", latency=0.0, bandwidth=None):
+        self.root = root
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._sock = None
+        self._transports = []
+
+    def start(self):
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(128)
+        threading.Thread(target=self._accept_loop, name="stand-in-accept", daemon=True).start()
+        port = self._sock.getsockname()[1]
+        logging.info("SSH stand-in listening on 127.0.0.1:%d (latency %.3fs).", port, self.latency)
+        return port
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        for transport in self._transports:
+            transport.close()
+        self._transports = []
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            if self.latency or self.bandwidth:
+                outer, inner = socket.socketpair()
+                _Link(client, outer, self.latency / 2, self.bandwidth)
+                _Link(outer, client, self.latency / 2, self.bandwidth)
+                client = inner
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _SFTPInterface)
+            self._transports.append(transport)
+            try:
+                transport.start_server(server=_ServerInterface(self))
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                logging.debug("Stand-in handshake failed: %s", e)
+
+    def _run_exec(self, channel, command):
+        env = dict(os.environ, HOME=self.root)
+        process = subprocess.Popen(command, shell=True, cwd=self.root, env=env, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        def pump_stdin():
+            try:
+                while True:
+                    data = channel.recv(65536)
+                    if not data:
+                        break
+                    process.stdin.write(data)
+                    process.stdin.flush()
+            except (OSError, ValueError):
+                pass
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+        def pump_stderr():
+            for data in iter(lambda: process.stderr.read1(65536), b""):
+                channel.sendall_stderr(data)
+
+        threading.Thread(target=pump_stdin, daemon=True).start()
+        stderr_thread = threading.Thread(target=pump_stderr, daemon=True)
+        stderr_thread.start()
+        try:
+            for data in iter(lambda: process.stdout.read1(65536), b""):
+                channel.sendall(data)
+            stderr_thread.join()
+            channel.send_exit_status(process.wait())
+        except OSError:
+            process.kill()
+        finally:
+            channel.close()
@@ -0,0 +1,32 @@
+import os
+import sys
+import paramiko
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import auth_cache
+from ssh_stand_in import StandInSSHServer
+
+@pytest.fixture(autouse=True)
+def private_auth_cache(tmp_path, monkeypatch):
+    # Connecting records the working auth method; keep that out of the real home directory.
+    monkeypatch.setattr(auth_cache, "AUTH_CACHE_PATH", str(tmp_path / "auth_cache.json"))
+    monkeypatch.setattr(auth_cache, "_cache", None)
+
+@pytest.fixture
+def stand_in(tmp_path):
+    server = StandInSSHServer(str(tmp_path))
+    server.port = server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def ssh_client(stand_in):
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect("127.0.0.1", port=stand_in.port, username=stand_in.username, password=stand_in.password,
+                   allow_agent=False, look_for_keys=False, timeout=5)
+    yield client
+    client.close()
@@ -0,0 +1,61 @@
+import os
+import json
+import socket
+import main
+from agent import AliasAgent
+
+def run_in_agent(tmp_path, monkeypatch, env):
+    seen = {}
+
+    def fake_main(argv):
+        seen.update({name: os.environ.get(name) for name in env})
+        seen["cwd"] = os.getcwd()
+        print("ran", *argv)
+
+    monkeypatch.setattr(main, "main", fake_main)
+    agent = AliasAgent(path=str(tmp_path / "agent.sock"))
+    server, client = socket.socketpair()
+    with server, client:
+        status = agent._run(server, ["--sync"], str(tmp_path), env)
+        server.shutdown(socket.SHUT_WR)
+        frames = [json.loads(line) for line in client.makefile("r")]
+    return status, seen, frames
+
+def test_request_runs_with_client_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHELL", "/bin/bash")
+    monkeypatch.setenv("HISTFILE", "/agent/history")
+    before = os.getcwd()
+    env = {"SHELL": "/bin/zsh", "HISTFILE": None}
+    status, seen, frames = run_in_agent(tmp_path, monkeypatch, env)
+    assert status == 0
+    assert seen["SHELL"] == "/bin/zsh"
+    assert seen["HISTFILE"] is None
+    assert seen["cwd"] == str(tmp_path)
+    assert "".join(f["data"] for f in frames) == "ran --sync\n"
+    # The agent's own environment is back once the request is done.
+    assert os.environ["SHELL"] == "/bin/bash"
+    assert os.environ["HISTFILE"] == "/agent/history"
+    assert os.getcwd() == before
+
+def handle(tmp_path, monkeypatch, request):
+    ran = []
+    monkeypatch.setattr(main, "main", lambda argv: ran.append(argv))
+    agent = AliasAgent(path=str(tmp_path / "agent.sock"))
+    server, client = socket.socketpair()
+    with client:
+        client.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        agent._handle(server)
+        frames = [json.loads(line) for line in client.makefile("r")]
+    return ran, frames
+
+def test_request_from_another_home_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", "/home/agent")
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    env = {"SHELL": "/bin/zsh", "HISTFILE": None, "HOME": "/root", "LOCALAPPDATA": None}
+    ran, frames = handle(tmp_path, monkeypatch, {"op": "run", "argv": ["--sync"], "env": env})
+    assert ran == []
+    assert "HOME" in frames[0]["refused"] and "LOCALAPPDATA" not in frames[0]["refused"]
+    ran, frames = handle(tmp_path, monkeypatch, {"op": "run", "argv": ["--sync"],
+                                                 "env": dict(env, HOME="/home/agent")})
+    assert ran == [["--sync"]] and frames == [{"exit": 0}]
+    assert os.environ["HOME"] == "/home/agent"
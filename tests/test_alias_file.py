@@ -0,0 +1,61 @@
+import shutil
+import subprocess
+import pytest
+from alias_file import GeneratedAliasFile, changes_shell_state
+
+@pytest.mark.parametrize("command", [
+    "cd ~/projects", "source venv/bin/activate", ". ~/.bashrc", "git pull && cd src",
+    "export EDITOR=vim", "FOO=bar", "builtin cd /tmp", "conda activate base", "(ls); pushd /tmp",
+])
+def test_state_changing_commands(command):
+    assert changes_shell_state(command)
+
+@pytest.mark.parametrize("command", ["git status", "ls -la | grep cd", "FOO=bar make", "echo export", "grep -r source ."])
+def test_ordinary_commands(command):
+    assert not changes_shell_state(command)
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".bash_history").write_text("gs\ngs\nll -a\n")
+    return tmp_path
+
+def make_file(home):
+    return GeneratedAliasFile(str(home / ".bash_profile"), "/bin/bash", path=str(home / "aliases.sh"),
+                              lazy=True, eager_limit=10)
+
+def test_lazy_split_keeps_used_and_stateful_aliases_eager(home):
+    alias_file = make_file(home)
+    aliases = {"gs": "git status", "ll": "ls -l", "proj": "cd ~/projects", "rare": "echo rare"}
+    alias_file.write(aliases)
+    eager = (home / "aliases.sh").read_text()
+    lazy = (home / "aliases.sh.lazy").read_text()
+    assert "alias gs='git status'" in eager and "alias proj='cd ~/projects'" in eager
+    assert lazy == "rare\techo rare\n"
+    assert "command_not_found_handle" in eager
+    assert alias_file.load() == aliases
+
+def test_new_aliases_stay_eager_until_used(home):
+    alias_file = make_file(home)
+    alias_file.write({"gs": "git status", "rare": "echo rare"})
+    alias_file.write({"gs": "git status", "rare": "echo rare", "fresh": "echo fresh"})
+    assert "alias fresh='echo fresh'" in (home / "aliases.sh").read_text()
+    # Still unused after another change: still eager.
+    alias_file.write({"gs": "git status", "rare": "echo rare", "fresh": "echo fresh", "other": "echo other"})
+    text = (home / "aliases.sh").read_text()
+    assert "alias fresh='echo fresh'" in text and "alias other='echo other'" in text
+    assert (home / "aliases.sh.lazy").read_text() == "rare\techo rare\n"
+    # Once in the history the usual ranking applies and the pin is dropped.
+    with open(home / ".bash_history", "a") as f:
+        f.write("fresh\n")
+    alias_file.write({"gs": "git status", "rare": "echo rare", "fresh": "echo fresh", "other": "echo other"})
+    assert alias_file._new_names() == {"other"}
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash")
+def test_bash_dispatcher_chains_to_existing_handler(home):
+    make_file(home).write({"gs": "git status", "rare": "echo rare"})
+    script = ("command_not_found_handle() { echo \"previous $1\"; return 127; }\n"
+              f". {home / 'aliases.sh'}\n. {home / 'aliases.sh'}\n"
+              "rare 'a b'\nnosuch; echo \"status $?\"\n")
+    result = subprocess.run(["bash", "-c", script], capture_output=True, text=True, timeout=30)
+    assert result.stdout == "rare a b\nprevious nosuch\nstatus 127\n"
@@ -0,0 +1,33 @@
+import os
+import json
+import alias_manager_windows
+from alias_manager_windows import WindowsAliasManager
+
+def make_legacy(tmp_path):
+    legacy = tmp_path / "System32"
+    legacy.mkdir()
+    (legacy / "gs.bat").write_text("@echo off\nREM AliasManager\ngit status\n")
+    (legacy / "other.bat").write_text("@echo off\necho not ours\n")
+    return legacy
+
+def test_legacy_directory_is_scanned_once(tmp_path, monkeypatch):
+    legacy = make_legacy(tmp_path)
+    alias_dir = str(tmp_path / "AliasManager")
+    monkeypatch.setattr(WindowsAliasManager, "_register_path", lambda self: False)
+    manager = WindowsAliasManager(alias_dir, str(legacy))
+    assert manager.list_aliases() == {"gs": "git status"}
+    assert (legacy / "gs.bat").exists()
+    with open(os.path.join(alias_dir, "aliases.json")) as f:
+        assert json.load(f)["legacy_files"] == [str(legacy / "gs.bat")]
+
+    scans = []
+    monkeypatch.setattr(alias_manager_windows.os, "scandir", lambda path: scans.append(path) or iter(()))
+    WindowsAliasManager(alias_dir, str(legacy))
+    monkeypatch.setattr(WindowsAliasManager, "_register_path", lambda self: True)
+    manager = WindowsAliasManager(alias_dir, str(legacy))
+    assert scans == []
+    assert not (legacy / "gs.bat").exists() and (legacy / "other.bat").exists()
+    assert os.path.exists(os.path.join(alias_dir, "bin", "gs.bat"))
+    assert manager.list_aliases() == {"gs": "git status"}
+    with open(os.path.join(alias_dir, "aliases.json")) as f:
+        assert json.load(f)["legacy_files"] == []
@@ -0,0 +1,60 @@
+from alias_search import AliasSearchIndex, ngrams
+
+def make_index():
+    index = AliasSearchIndex()
+    index.load({"gs": "git status", "gst": "git stash", "gstatus": "git status -sb",
+                "GitLog": "git log --oneline", "dcu": "docker compose up -d"}, "local")
+    index.load({"gs": "git status --short"}, "remote")
+    return index
+
+def names(results):
+    return [r["name"] for r in results]
+
+def test_ngrams_padding():
+    assert " gs" in ngrams("GS")
+    assert ngrams("status", pad=False) == {"sta", "tat", "atu", "tus"}
+
+def test_exact_name_ranks_first_then_prefixes_shortest_first():
+    results = make_index().search("gs")
+    assert names(results)[:1] == ["gs"]
+    assert results[0]["sources"] == {"local": "git status", "remote": "git status --short"}
+    assert names(make_index().search("gst"))[:2] == ["gst", "gstatus"]
+
+def test_mid_word_substring_of_name():
+    assert "gstatus" in names(make_index().search("tatu"))
+    assert "gstatus" in names(make_index().search("ta", fields=("name",)))
+
+def test_mid_word_substring_of_command():
+    assert names(make_index().search("ompos")) == ["dcu"]
+
+def test_mixed_case_queries():
+    index = make_index()
+    assert index.complete_name("git") == ["GitLog"]
+    assert index.complete_name("GST") == ["gst", "gstatus"]
+    assert names(index.search("gitlog"))[:1] == ["GitLog"]
+    assert names(index.search("ONELINE")) == ["GitLog"]
+
+def test_fuzzy_match_after_substring_tiers():
+    index = make_index()
+    assert names(index.search("docker compse"))[:1] == ["dcu"]
+    assert index.search("docker compse")[0]["score"] < 40
+
+def test_follows_updates_and_removals():
+    index = make_index()
+    index.apply_ops([("update", "dcu", "docker compose down"), ("delete", "GitLog", None)])
+    assert names(index.search("compose down")) == ["dcu"]
+    assert index.complete_name("git") == []
+    assert index.search("oneline") == []
+    index.remove("gs", "local")
+    assert make_index().search("gs")[0]["sources"]["remote"] == "git status --short"
+    assert index.aliases["gs"] == {"remote": "git status --short"}
+    index.remove("gs")
+    assert "gs" not in index.complete_name("gs")
+
+def test_names_differing_only_in_case_share_a_trie_node():
+    index = AliasSearchIndex()
+    index.set("ll", "ls -l")
+    index.set("LL", "ls -L")
+    assert index.complete_name("l") == ["LL", "ll"]
+    index.remove("LL")
+    assert index.complete_name("L") == ["ll"]
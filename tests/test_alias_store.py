@@ -0,0 +1,103 @@
+import pytest
+from alias_store import AliasStore, StoreBackedManager, scope_for
+
+class FakeManager:
+    def __init__(self, aliases=None):
+        self.aliases = dict(aliases or {})
+        self.batches = []
+
+    def list_aliases(self):
+        return dict(self.aliases)
+
+    def apply_batch(self, ops):
+        self.batches.append(list(ops))
+        for action, name, command in ops:
+            if action == "delete":
+                self.aliases.pop(name, None)
+            else:
+                self.aliases[name] = command
+
+def make_store(tmp_path):
+    return AliasStore(str(tmp_path / "aliases.db"))
+
+def test_most_specific_scope_wins(tmp_path):
+    store = make_store(tmp_path)
+    store.apply_ops([("create", "gst", "git status"), ("create", "ll", "ls -l")])
+    store.apply_ops([("create", "gst", "git status -sb")], scope=scope_for(platform="osx"))
+    store.apply_ops([("create", "gst", "git st")], scope=scope_for(host="laptop"))
+    assert store.aliases("osx", "laptop") == {"gst": "git st", "ll": "ls -l"}
+    assert store.aliases("osx", "desktop") == {"gst": "git status -sb", "ll": "ls -l"}
+    assert store.aliases("windows", "build-01") == {"gst": "git status", "ll": "ls -l"}
+    assert store.overrides(["gst", "ll"], "osx", "desktop") == {"gst": "git status -sb"}
+    assert store.diff(("osx", "laptop"), ("windows", "build-01")) == {
+        "only_a": [], "only_b": [], "changed": ["gst"]}
+
+def test_deleting_an_override_falls_back(tmp_path):
+    store = make_store(tmp_path)
+    store.apply_ops([("create", "gst", "git status")])
+    host = scope_for(host="laptop")
+    store.apply_ops([("create", "gst", "git st")], scope=host)
+    store.apply_ops([("delete", "gst", None)], scope=host)
+    assert store.aliases("osx", "laptop") == {"gst": "git status"}
+    store.apply_ops([("delete", "gst", None)])
+    assert store.aliases("osx", "laptop") == {}
+
+def test_apply_ops_summary(tmp_path):
+    store = make_store(tmp_path)
+    assert store.apply_ops([("create", "a", "one"), ("create", "b", "two")])["created"] == 2
+    summary = store.apply_ops([("create", "a", "one"), ("update", "b", "three"),
+                               ("delete", "c", None), ("update", "d", "four")])
+    assert summary == {"created": 0, "updated": 1, "deleted": 0, "missing": ["c", "d"]}
+    assert [row["version"] for row in store.history("b")] == [2, 1]
+
+def test_pending_returns_only_changes_since_render(tmp_path):
+    store = make_store(tmp_path)
+    store.apply_ops([("create", "a", "one"), ("create", "b", "two")])
+    ops, seq = store.pending("local", "osx", "laptop")
+    assert sorted(ops) == [("create", "a", "one"), ("create", "b", "two")]
+    store.mark_rendered("local", seq)
+    assert store.pending("local", "osx", "laptop") == ([], seq)
+
+    store.apply_ops([("update", "a", "uno"), ("delete", "b", None)])
+    store.apply_ops([("create", "c", "tres")], scope=scope_for(host="desktop"))
+    ops, seq = store.pending("local", "osx", "laptop")
+    assert sorted(ops) == [("create", "a", "uno"), ("delete", "b", None)]
+    store.mark_rendered("local", seq)
+    assert store.rendered_seq("local") == seq
+    assert store.pending("local", "osx", "laptop")[0] == []
+
+def test_store_backed_manager_imports_then_renders_changes(tmp_path):
+    manager = FakeManager({"ll": "ls -l"})
+    backed = StoreBackedManager(manager, make_store(tmp_path), "osx", "laptop")
+    assert manager.batches == []
+    assert backed.list_aliases() == {"ll": "ls -l"}
+
+    backed.apply_batch([("create", "gst", "git status")])
+    assert manager.batches == [[("create", "gst", "git status")]]
+    backed.set_for("ll", "ls -la", host="laptop")
+    assert manager.batches[-1] == [("update", "ll", "ls -la")]
+    backed.set_for("ll", "ls -lh", host="desktop")
+    assert len(manager.batches) == 2
+    assert manager.aliases == {"ll": "ls -la", "gst": "git status"}
+    assert backed.remote_ops([("create", "ll", "ls -l")], "osx", "desktop") == [("create", "ll", "ls -lh")]
+
+def test_store_backed_manager_edits_the_scope_an_alias_resolves_from(tmp_path):
+    manager = FakeManager()
+    store = make_store(tmp_path)
+    backed = StoreBackedManager(manager, store, "osx", "laptop")
+    backed.set_for("proj", "cd ~/src", host="laptop")
+    assert store.scope_of("proj", "osx", "laptop") == scope_for(host="laptop")
+    assert store.scope_of("proj", "osx", "desktop") is None
+    backed.update_alias("proj", "cd ~/code")
+    assert backed.list_aliases() == {"proj": "cd ~/code"}
+    assert store.aliases("osx", "desktop") == {}
+    backed.delete_alias("proj")
+    assert backed.list_aliases() == {} and manager.aliases == {}
+    with pytest.raises(ValueError):
+        backed.delete_alias("proj")
+
+    backed.apply_batch([("create", "gst", "git status")])
+    backed.set_for("gst", "git status -sb", platform="osx")
+    backed.delete_alias("gst")
+    assert backed.list_aliases() == {"gst": "git status"}
+    assert manager.aliases == {"gst": "git status"}
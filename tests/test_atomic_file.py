@@ -0,0 +1,31 @@
+import os
+import stat
+from atomic_file import write_atomic
+
+def test_replaces_contents_and_keeps_mode(tmp_path):
+    path = tmp_path / "profile"
+    path.write_text("old\n")
+    os.chmod(path, 0o600)
+    write_atomic(str(path), "new\n")
+    assert path.read_text() == "new\n"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert os.listdir(tmp_path) == ["profile"]
+
+def test_symlinked_file_stays_a_link(tmp_path):
+    repo = tmp_path / "dotfiles"
+    repo.mkdir()
+    target = repo / "bashrc"
+    target.write_text("old\n")
+    os.chmod(target, 0o640)
+    link = tmp_path / ".bashrc"
+    link.symlink_to(target)
+    write_atomic(str(link), b"new\n")
+    assert link.is_symlink()
+    assert target.read_text() == "new\n"
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+    assert sorted(os.listdir(repo)) == ["bashrc"]
+
+def test_creates_missing_file(tmp_path):
+    path = tmp_path / "new_file"
+    write_atomic(str(path), "text\n")
+    assert path.read_text() == "text\n"
@@ -0,0 +1,72 @@
+import random
+from collections import Counter
+from history_miner import HistoryMiner, SpaceSaving, alias_name_for, iter_history_commands, parse_selection
+
+def test_space_saving_is_exact_below_capacity():
+    sketch = SpaceSaving(10)
+    for item in "aabbbc":
+        sketch.add(item)
+    assert sketch.top() == [("b", 3, 0), ("a", 2, 0), ("c", 1, 0)]
+
+def test_space_saving_guarantees_on_a_skewed_stream():
+    rng = random.Random(7)
+    capacity = 50
+    stream = [f"heavy{i}" for i in range(5) for _ in range(400)]
+    stream += [f"rare{rng.randrange(5000)}" for _ in range(8000)]
+    rng.shuffle(stream)
+    sketch = SpaceSaving(capacity)
+    for item in stream:
+        sketch.add(item)
+    truth = Counter(stream)
+    assert sketch.total == len(stream)
+    assert len(sketch.counts) == capacity
+    for item, count, error in sketch.top():
+        # Counts never underestimate, and overestimate by at most the recorded error,
+        # which is bounded by N / capacity.
+        assert count - error <= truth[item] <= count
+        assert error <= len(stream) / capacity
+    # Every item above N / capacity is kept.
+    kept = {item for item, _, _ in sketch.top()}
+    assert {item for item, n in truth.items() if n > len(stream) / capacity} <= kept
+
+def test_weighted_adds_match_repeated_adds():
+    one, many = SpaceSaving(3), SpaceSaving(3)
+    for item, count in [("a", 5), ("b", 2), ("c", 1), ("d", 4), ("e", 1)]:
+        one.add(item, count)
+        for _ in range(count):
+            many.add(item)
+    assert one.total == many.total == 13
+    assert one.top(1)[0][:2] == ("a", 5)
+
+def test_history_formats(tmp_path):
+    zsh = tmp_path / ".zsh_history"
+    zsh.write_bytes(b": 1700000000:0;git status\n: 1700000001:0;echo one \\\ntwo\n")
+    assert list(iter_history_commands(str(zsh))) == ["git status", "echo one \\\ntwo"]
+    bash = tmp_path / ".bash_history"
+    bash.write_text("#1700000000\nls -la\n")
+    assert list(iter_history_commands(str(bash))) == ["ls -la"]
+    fish = tmp_path / "fish_history"
+    fish.write_text("- cmd: git push\n  when: 1700000000\n")
+    assert list(iter_history_commands(str(fish))) == ["git push"]
+
+def test_suggestions_skip_existing_and_rank_by_saved_keystrokes():
+    miner = HistoryMiner(capacity=100)
+    for _ in range(20):
+        miner.feed("kubectl get pods --all-namespaces")
+    for _ in range(30):
+        miner.feed("git status")
+    for _ in range(3):
+        miner.feed("docker compose up --build")
+    suggestions = miner.suggest({"gs": "git status"}, min_count=5)
+    assert [s["command"] for s in suggestions] == ["kubectl get pods --all-namespaces"]
+    assert suggestions[0]["name"] not in {"gs"}
+    assert suggestions[0]["count"] == 20
+
+def test_alias_name_for_avoids_taken_names():
+    assert alias_name_for("kubectl get pods", set()) == "kgp"
+    assert alias_name_for("kubectl get pods", {"kgp"}) == "kgpo"
+
+def test_parse_selection():
+    assert parse_selection("1,3-4", 5) == [0, 2, 3]
+    assert parse_selection("all", 2) == [0, 1]
+    assert parse_selection("", 2) == []
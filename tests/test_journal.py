@@ -0,0 +1,87 @@
+import os
+import journal
+from journal import JournalFlusher, OperationJournal, coalesce_journal_ops, drain
+
+TARGET = {"name": "mac", "host": "127.0.0.1:1", "username": "bench", "os": "osx"}
+
+def records(*ops, new=None):
+    result = []
+    for i, (action, name, command) in enumerate(ops):
+        record = {"id": str(i), "action": action, "name": name, "command": command}
+        if new is not None:
+            record["new"] = name in new
+        result.append(record)
+    return result
+
+def test_last_change_wins():
+    ops = coalesce_journal_ops(records(("update", "a", "one"), ("update", "a", "two"), ("delete", "b", None)))
+    assert ops == [("update", "a", "two"), ("delete", "b", None)]
+
+def test_create_then_update_stays_a_create():
+    assert coalesce_journal_ops(records(("create", "a", "one"), ("update", "a", "two"))) == [("create", "a", "two")]
+
+def test_create_then_delete_keeps_delete_without_new_flags():
+    # Queued without new_names, e.g. by apply_ops or run_targets: the alias may have existed remotely.
+    ops = records(("create", "a", "one"), ("update", "a", "two"), ("delete", "a", None))
+    assert coalesce_journal_ops(ops) == [("delete", "a", None)]
+
+def test_create_over_existing_alias_then_delete_is_kept():
+    ops = records(("create", "a", "one"), ("delete", "a", None), new=())
+    assert coalesce_journal_ops(ops) == [("delete", "a", None)]
+    assert coalesce_journal_ops(records(("create", "a", "one"), ("delete", "a", None), new=("a",))) == []
+
+def test_delete_then_create_is_a_create():
+    assert coalesce_journal_ops(records(("delete", "a", None), ("create", "a", "x"))) == [("create", "a", "x")]
+
+def test_update_then_delete_is_a_delete():
+    assert coalesce_journal_ops(records(("update", "a", "x"), ("delete", "a", None))) == [("delete", "a", None)]
+
+def test_record_pending_acknowledge_compact(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    log = OperationJournal(path)
+    log.record(TARGET, [("create", "a", "one"), ("delete", "a", None)])
+    log.record(dict(TARGET, host="other"), [("create", "b", "two")], new_names=())
+    pending = log.pending()
+    assert sorted(pending) == ["bench@127.0.0.1:1", "bench@other"]
+    assert "new" not in pending["bench@127.0.0.1:1"]["records"][0]
+    assert pending["bench@other"]["records"][0]["new"] is False
+    log.acknowledge("bench@other", pending["bench@other"]["records"])
+    log.compact()
+    assert list(log.pending()) == ["bench@127.0.0.1:1"]
+    with open(path) as f:
+        assert len(f.readlines()) == 2
+
+def test_drain_picks_up_changes_queued_while_it_was_finishing(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.jsonl")
+    log = OperationJournal(path)
+    log.record(TARGET, [("create", "a", "one")])
+    flushed = []
+
+    class RacingFlusher(JournalFlusher):
+        def flush_once(self):
+            pending = self.journal.pending()
+            for key, item in pending.items():
+                flushed.append([r["name"] for r in item["records"]])
+                self.journal.acknowledge(key, item["records"])
+            if len(flushed) == 1:
+                # Queued after this flush; its own flusher found the pid file and gave up.
+                self.journal.record(TARGET, [("create", "b", "two")])
+            return {}
+
+        def seconds_until_due(self):
+            return None
+
+    monkeypatch.setattr(journal, "JournalFlusher", RacingFlusher)
+    drain(path, max_runtime=10)
+    assert flushed == [["a"], ["b"]]
+    assert log.pending() == {}
+    assert not os.path.exists(path + ".flusher")
+
+def test_drain_leaves_a_running_flusher_alone(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    OperationJournal(path).record(TARGET, [("create", "a", "one")])
+    with open(path + ".flusher", "w") as f:
+        f.write("1")
+    drain(path, max_runtime=10)
+    assert os.path.exists(path + ".flusher")
+    assert OperationJournal(path).pending()
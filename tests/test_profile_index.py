@@ -0,0 +1,102 @@
+import os
+import pytest
+from profile_index import BLOCK_END, BLOCK_START, ProfileIndex, apply_ops_to_lines, format_alias_line, parse_alias_line
+
+def load(path):
+    index = ProfileIndex(str(path))
+    index.load()
+    return index
+
+def test_parse_and_format_round_trip():
+    line = format_alias_line("gs", "git status -s")
+    assert parse_alias_line(line) == ("gs", "git status -s")
+
+def test_block_appended_and_reloaded(tmp_path):
+    path = tmp_path / ".zshrc"
+    path.write_text("export PATH=$PATH:/opt/bin\nalias old='ls'")
+    index = load(path)
+    index.set_alias("gs", "git status")
+    index.set_alias("ll", "ls -la")
+    index.write_block()
+    assert not index.is_stale()
+    text = path.read_text()
+    assert text.startswith("export PATH=$PATH:/opt/bin\nalias old='ls'\n" + BLOCK_START + "\n")
+    assert text.endswith(BLOCK_END + "\n")
+    reloaded = load(path)
+    assert reloaded.aliases() == {"old": "ls", "gs": "git status", "ll": "ls -la"}
+    assert reloaded.block_start == index.block_start
+    assert reloaded.block_end == index.block_end
+
+def test_block_rewritten_between_surrounding_lines(tmp_path):
+    path = tmp_path / ".bash_profile"
+    path.write_text("# head\n" + BLOCK_START + "\nalias a='one'\nalias b='two'\n" + BLOCK_END + "\n# tail\n")
+    index = load(path)
+    index.set_alias("a", "uno")
+    assert index.remove_alias("b")
+    assert not index.remove_alias("missing")
+    index.set_alias("c", "three")
+    index.write_block()
+    assert path.read_text() == ("# head\n" + BLOCK_START + "\nalias a='uno'\nalias c='three'\n"
+                                + BLOCK_END + "\n# tail\n")
+    assert load(path).aliases() == {"a": "uno", "c": "three"}
+
+def test_write_block_replaces_file_and_keeps_symlink_and_mode(tmp_path):
+    target = tmp_path / "dotfiles_zshrc"
+    target.write_text("# mine\n")
+    os.chmod(target, 0o600)
+    link = tmp_path / ".zshrc"
+    link.symlink_to(target)
+    inode = os.stat(target).st_ino
+    index = load(link)
+    index.set_alias("gs", "git status")
+    index.write_block()
+    assert link.is_symlink()
+    assert os.stat(target).st_ino != inode  # replaced, not rewritten in place
+    assert os.stat(target).st_mode & 0o777 == 0o600
+    assert load(link).aliases() == {"gs": "git status"}
+
+def test_stale_after_external_edit(tmp_path):
+    path = tmp_path / ".zshrc"
+    path.write_text("alias a='one'\n")
+    index = load(path)
+    path.write_text("alias a='one'\nalias b='two'\n")
+    assert index.is_stale()
+
+def test_apply_ops_to_lines_outside_block():
+    lines = ["alias a='one'\n", "echo hi\n", "alias b='two'\n"]
+    output, _ = apply_ops_to_lines(lines, [("update", "a", "uno"), ("delete", "b", None)])
+    assert output == ["alias a='uno'\n", "echo hi\n"]
+
+def test_write_block_after_external_edit_splices_at_current_block(tmp_path):
+    path = tmp_path / ".zshrc"
+    path.write_text(BLOCK_START + "\nalias a='one'\n" + BLOCK_END + "\n")
+    index = load(path)
+    path.write_text("# added by an installer\nexport X=1\n" + BLOCK_START + "\nalias a='one'\n" + BLOCK_END + "\n# tail\n")
+    index.set_alias("b", "two")
+    index.write_block()
+    assert path.read_text() == ("# added by an installer\nexport X=1\n" + BLOCK_START
+                                + "\nalias a='one'\nalias b='two'\n" + BLOCK_END + "\n# tail\n")
+    assert load(path).block_start == index.block_start
+
+def test_refresh_reparses_only_the_block_when_the_rest_is_unchanged(tmp_path, monkeypatch):
+    path = tmp_path / ".zshrc"
+    head = "# head\nalias out='ls'\n"
+    path.write_text(head + BLOCK_START + "\nalias a='one'\n" + BLOCK_END + "\n# tail\n")
+    index = load(path)
+    path.write_text(head + BLOCK_START + "\nalias a='uno'\nalias b='two'\n" + BLOCK_END + "\n# tail\n")
+    monkeypatch.setattr(ProfileIndex, "load", lambda self: pytest.fail("full re-parse"))
+    index.refresh()
+    assert index.aliases() == {"out": "ls", "a": "uno", "b": "two"}
+    assert not index.is_stale()
+    index.set_alias("c", "three")
+    index.write_block()
+    assert path.read_text().endswith("alias c='three'\n" + BLOCK_END + "\n# tail\n")
+
+def test_refresh_falls_back_to_a_full_parse_when_outside_lines_change(tmp_path):
+    path = tmp_path / ".zshrc"
+    path.write_text("alias out='ls'\n" + BLOCK_START + "\nalias a='one'\n" + BLOCK_END + "\n")
+    index = load(path)
+    path.write_text("alias out='ls -l'\n" + BLOCK_START + "\nalias a='one'\n" + BLOCK_END + "\nalias x='y'\n")
+    index.refresh()
+    assert index.aliases() == {"out": "ls -l", "a": "one", "x": "y"}
+    assert load(path).block_end == index.block_end
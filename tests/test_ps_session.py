@@ -0,0 +1,68 @@
+import sys
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from conftest import REPO
+from ps_session import PowerShellSession, SessionError, SessionTimeout, drop_session, get_session, get_sessions
+
+STAND_IN_COMMAND = f"{sys.executable} {REPO}/ps_session.py"
+
+def test_session_runs_scripts_over_ssh(ssh_client):
+    session = PowerShellSession.from_client(ssh_client, command=STAND_IN_COMMAND, timeout=5)
+    assert session.run_lines("echo one; echo two") == ["one", "two"]
+    assert session.run("echo three") == "three"
+    session.close()
+
+def test_failed_script_raises_ioerror_and_keeps_session(ssh_client):
+    session = PowerShellSession.from_client(ssh_client, command=STAND_IN_COMMAND, timeout=5)
+    with pytest.raises(IOError) as info:
+        session.run_lines("echo broken; exit 3")
+    assert not isinstance(info.value, SessionError)
+    assert session.run("echo still-here") == "still-here"
+    session.close()
+
+def test_silent_command_outlasts_the_connect_timeout(ssh_client):
+    session = PowerShellSession.from_client(ssh_client, command=STAND_IN_COMMAND, timeout=0.5, script_timeout=5)
+    assert session.run_lines("sleep 1.5; echo late") == ["late"]
+    assert session.run("echo next") == "next"
+    session.close()
+
+def test_hung_command_times_out_and_closes_session(ssh_client):
+    session = PowerShellSession.from_client(ssh_client, command=STAND_IN_COMMAND, timeout=5, script_timeout=0.5)
+    started = time.monotonic()
+    with pytest.raises(SessionTimeout):
+        session.run_lines("sleep 5")
+    assert time.monotonic() - started < 3
+    assert session.closed
+    with pytest.raises(SessionError):
+        session.run_lines("echo again")
+
+def test_get_session_replaces_dropped_session(ssh_client):
+    first = get_session(ssh_client, timeout=5, command=STAND_IN_COMMAND)
+    assert get_session(ssh_client, timeout=5, command=STAND_IN_COMMAND) is first
+    drop_session(ssh_client)
+    assert first.closed
+    second = get_session(ssh_client, timeout=5, command=STAND_IN_COMMAND)
+    assert second is not first
+    assert second.run("echo ok") == "ok"
+    drop_session(ssh_client)
+
+def test_dead_transport_raises_session_error(ssh_client):
+    ssh_client.close()
+    with pytest.raises(SessionError):
+        PowerShellSession.from_client(ssh_client, command=STAND_IN_COMMAND, timeout=1)
+
+def test_get_sessions_runs_scripts_side_by_side(ssh_client):
+    sessions = get_sessions(ssh_client, 3, timeout=5, command=STAND_IN_COMMAND)
+    assert len({id(s) for s in sessions}) == 3
+    assert sessions[0] is get_session(ssh_client, timeout=5, command=STAND_IN_COMMAND)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        outputs = list(executor.map(lambda s: s.run("sleep 1; echo done"), sessions))
+    assert outputs == ["done"] * 3
+    assert time.monotonic() - started < 2.5
+    sessions[1].close()
+    again = get_sessions(ssh_client, 3, timeout=5, command=STAND_IN_COMMAND)
+    assert again[0] is sessions[0] and again[2] is sessions[2] and again[1] is not sessions[1]
+    drop_session(ssh_client)
+    assert all(s.closed for s in again)
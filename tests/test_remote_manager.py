@@ -0,0 +1,44 @@
+import os
+import pytest
+from alias_manager_remote import RemoteAliasManager
+
+COMMAND = r"grep -E 'a|b' /tmp/x && echo \done & wait"
+
+@pytest.fixture(params=["shell", "sftp"])
+def manager(request, stand_in):
+    with open(os.path.join(stand_in.root, ".bash_profile"), "w") as f:
+        f.write("export PATH=$PATH:/usr/local/bin\nalias keep='ls'\n")
+    manager = RemoteAliasManager("osx", f"127.0.0.1:{stand_in.port}", stand_in.username, stand_in.password,
+                                 osx_engine=request.param)
+    yield manager
+    manager.close()
+
+def test_create_update_delete_round_trip(manager, stand_in):
+    manager.create_alias("gs", "git status")
+    assert manager.list_aliases() == {"keep": "ls", "gs": "git status"}
+    manager.update_alias("gs", COMMAND)
+    assert manager.list_aliases()["gs"] == COMMAND
+    manager.delete_alias("gs")
+    assert manager.list_aliases() == {"keep": "ls"}
+    with open(os.path.join(stand_in.root, ".bash_profile")) as f:
+        assert f.read().startswith("export PATH=$PATH:/usr/local/bin\n")
+
+def test_update_matches_the_name_literally(manager):
+    manager.create_alias("g.s", "one")
+    manager.create_alias("gxs", "two")
+    manager.update_alias("g.s", "three/four")
+    assert manager.list_aliases()["gxs"] == "two"
+    assert manager.list_aliases()["g.s"] == "three/four"
+
+def test_create_passes_the_command_through_unexpanded(manager, stand_in):
+    command = 'echo "$HOME" `whoami` $(date)'
+    manager.create_alias("odd", command)
+    manager.create_alias("odd", command)
+    assert manager.list_aliases() == {"keep": "ls", "odd": command}
+    with open(os.path.join(stand_in.root, ".bash_profile")) as f:
+        assert f.read().count("alias odd=") == 1
+
+def test_apply_batch(manager):
+    result = manager.apply_batch([("create", "a", "echo a"), ("create", "b", "echo b"), ("delete", "keep", None)])
+    assert result["applied"] == 3
+    assert manager.list_aliases() == {"a": "echo a", "b": "echo b"}
@@ -0,0 +1,22 @@
+import os
+import stat
+from snapshots import SnapshotStore
+
+def test_restore_keeps_symlink_and_mode(tmp_path):
+    repo = tmp_path / "dotfiles"
+    repo.mkdir()
+    target = repo / "bash_profile"
+    target.write_text("alias a='one'\n")
+    os.chmod(target, 0o640)
+    link = tmp_path / ".bash_profile"
+    link.symlink_to(target)
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    entry = store.snapshot(str(link))
+    target.write_text("alias a='two'\n")
+    assert store.restore(str(link), entry["hash"][:8])["hash"] == entry["hash"]
+    assert link.is_symlink()
+    assert target.read_text() == "alias a='one'\n"
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+    assert sorted(os.listdir(repo)) == ["bash_profile"]
+    # The content it replaced was snapshotted first.
+    assert len(store.history(str(link))) == 2
@@ -0,0 +1,57 @@
+import threading
+import time
+from alias_manager_remote import RemoteAliasManager
+from ssh_pool import SSHConnectionPool
+
+def make_pool(idle_ttl):
+    pool = SSHConnectionPool(idle_ttl=idle_ttl, keepalive=0)
+    pool._stop.set()  # evict_idle() is called by hand below
+    return pool
+
+def test_leased_client_is_not_evicted(stand_in):
+    pool = make_pool(idle_ttl=0.2)
+    manager = RemoteAliasManager("osx", f"127.0.0.1:{stand_in.port}", stand_in.username, stand_in.password,
+                                 pool=pool)
+    evicted = []
+
+    def evict_while_running():
+        time.sleep(0.6)
+        evicted.append(pool.evict_idle())
+
+    evictor = threading.Thread(target=evict_while_running)
+    evictor.start()
+    results = manager.run_commands(["sleep 1; echo done"])
+    evictor.join()
+    assert results[0]["ok"] and results[0]["lines"] == ["done"]
+    assert evicted == [0]
+    assert manager.client.get_transport().is_active()
+    # Idle time counts from the end of the last lease.
+    assert pool.evict_idle() == 0
+    time.sleep(0.3)
+    assert pool.evict_idle() == 1
+    pool.close_all()
+
+def test_get_client_reuses_live_connection(stand_in):
+    pool = make_pool(idle_ttl=60)
+    host = f"127.0.0.1:{stand_in.port}"
+    first = pool.get_client(host, stand_in.username, stand_in.password)
+    assert pool.get_client(host, stand_in.username, stand_in.password) is first
+    second = pool.get_client(host, stand_in.username, stand_in.password, reconnect=True)
+    assert second is not first
+    assert not first.get_transport()
+    pool.close_all()
+
+def test_reconnect_moves_the_lease_to_the_new_client(stand_in):
+    pool = make_pool(idle_ttl=0)
+    manager = RemoteAliasManager("osx", f"127.0.0.1:{stand_in.port}", stand_in.username, stand_in.password,
+                                 pool=pool)
+    old = manager.client
+    with manager._lease():
+        old.get_transport().close()
+        assert list(manager._run_command("echo back").iter_lines()) == ["back"]
+        assert manager.client is not old
+        assert [e["leases"] for e in pool._entries.values()] == [1]
+        assert pool.evict_idle() == 0
+    assert [e["leases"] for e in pool._entries.values()] == [0]
+    assert pool.evict_idle() == 1
+    pool.close_all()
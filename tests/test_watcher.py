@@ -0,0 +1,77 @@
+import os
+import select
+import threading
+import time
+import pytest
+from watcher import AliasFileSource, _KqueueBackend, _PollingBackend, diff_aliases, make_backend, watch
+
+def test_diff_aliases():
+    old = {"a": "one", "b": "two", "c": "three"}
+    new = {"a": "one", "b": "deux", "d": "four"}
+    assert diff_aliases(old, new) == [("update", "b", "deux"), ("create", "d", "four"), ("delete", "c", None)]
+    assert diff_aliases(new, new) == []
+    assert diff_aliases({}, {"a": "x"}) == [("create", "a", "x")]
+
+def test_source_reloads_only_when_a_file_changed(tmp_path):
+    profile = tmp_path / ".zshrc"
+    profile.write_text("alias a='one'\n")
+    loads = []
+    source = AliasFileSource(str(profile), lambda: loads.append(1) or {"a": profile.read_text()})
+    assert source.refresh() == [("create", "a", "alias a='one'\n")]
+    assert source.refresh() == []
+    assert len(loads) == 1
+    profile.write_text("alias a='uno'\n")
+    assert source.refresh()[0][0] == "update"
+    assert len(loads) == 2
+
+def test_watch_reports_hand_edits_and_atomic_saves(tmp_path):
+    profile = tmp_path / ".bash_profile"
+    profile.write_text("alias a='one'\n")
+    source = AliasFileSource(str(profile))
+    seen = []
+    stop = threading.Event()
+    thread = threading.Thread(target=watch, args=(source, seen.append), kwargs={"debounce": 0.1, "stop": stop})
+    thread.start()
+    try:
+        time.sleep(0.3)
+        with open(profile, "a") as f:
+            f.write("alias b='two'\n")
+        deadline = time.monotonic() + 5
+        while not seen and time.monotonic() < deadline:
+            time.sleep(0.05)
+        tmp = tmp_path / "saved.tmp"
+        tmp.write_text("alias b='two'\n")
+        os.replace(tmp, profile)
+        while len(seen) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+    assert seen == [[("create", "b", "two")], [("delete", "a", None)]]
+
+def test_polling_backend_is_the_fallback(tmp_path):
+    source = AliasFileSource(str(tmp_path / "missing"))
+    backend = make_backend(source, poll=True)
+    assert isinstance(backend, _PollingBackend)
+    backend.close()
+
+@pytest.mark.skipif(not hasattr(select, "kqueue"), reason="kqueue is not available")
+def test_kqueue_watches_files_and_directories_only_for_missing_files(tmp_path):
+    present = tmp_path / "present"
+    present.write_text("x")
+    missing = tmp_path / "missing"
+    backend = _KqueueBackend([], [], [str(present), str(missing)])
+    try:
+        assert sorted(backend.fds.values()) == [str(present)]
+        assert list(backend.dir_fds.values()) == [str(tmp_path)]
+        missing.write_text("y")
+        assert backend.wait(1)
+        assert sorted(backend.fds.values()) == [str(missing), str(present)]
+        assert backend.dir_fds == {}
+        tmp = tmp_path / "new"
+        tmp.write_text("z")
+        os.replace(tmp, present)
+        assert backend.wait(1)
+        assert sorted(backend.fds.values()) == [str(missing), str(present)]
+    finally:
+        backend.close()
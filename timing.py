@@ -0,0 +1,161 @@
+import json
+import time
+import threading
+import functools
+
+# Spans are only recorded after enable(); until then span() hands out one shared
+# no-op object and timed() functions pay a single flag check per call.
+_enabled = False
+_started = None
+_records = []
+_lock = threading.Lock()
+_local = threading.local()
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault("stack", [])
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._t0
+        stack = _local.stack
+        # Spans opened inside generators can close out of order; drop this one wherever it is.
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            stack.remove(self)
+        record = {"name": self.name, "parent": self.parent, "start": self.start, "duration": duration,
+                  "thread": threading.current_thread().name, "ok": exc_type is None}
+        if self.attrs:
+            record.update(self.attrs)
+        with _lock:
+            _records.append(record)
+        return False
+
+def enable():
+    global _enabled, _started
+    with _lock:
+        _enabled = True
+        if _started is None:
+            _started = time.perf_counter()
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    global _started
+    with _lock:
+        del _records[:]
+        _started = time.perf_counter() if _enabled else None
+
+def span(name, **attrs):
+    """Time a phase: `with span("ssh.handshake", host=host): ...`. A no-op unless enabled."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+def timed(name):
+    """Decorator that records every call of the function as a span called `name`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def records():
+    with _lock:
+        return list(_records)
+
+def summary():
+    """Return {phase: {"count", "errors", "total", "min", "max"}} in first-seen order (seconds)."""
+    phases = {}
+    for r in records():
+        phase = phases.get(r["name"])
+        if phase is None:
+            phase = phases[r["name"]] = {"count": 0, "errors": 0, "total": 0.0,
+                                         "min": r["duration"], "max": r["duration"]}
+        phase["count"] += 1
+        phase["errors"] += 0 if r["ok"] else 1
+        phase["total"] += r["duration"]
+        phase["min"] = min(phase["min"], r["duration"])
+        phase["max"] = max(phase["max"], r["duration"])
+    return phases
+
+def format_breakdown():
+    """Per-phase table, slowest total first. Nested phases are included in their parents' time."""
+    phases = summary()
+    if not phases:
+        return "No timing data was recorded."
+    wall = time.perf_counter() - _started if _started is not None else 0.0
+    width = max(len(name) for name in phases) + 2
+    lines = [f"{'phase':<{width}}{'calls':>7}{'total ms':>12}{'mean ms':>11}{'max ms':>11}{'% wall':>8}"]
+    for name, p in sorted(phases.items(), key=lambda item: -item[1]["total"]):
+        share = f"{100 * p['total'] / wall:.1f}" if wall else "-"
+        lines.append(f"{name:<{width}}{p['count']:>7}{p['total'] * 1000:>12.1f}"
+                     f"{p['total'] * 1000 / p['count']:>11.2f}{p['max'] * 1000:>11.2f}{share:>8}")
+    lines.append(f"wall time {wall * 1000:.1f} ms")
+    return "\n".join(lines)
+
+def to_jsonl():
+    """One JSON object per recorded span, with its duration in milliseconds."""
+    lines = []
+    for r in records():
+        entry = dict(r, duration_ms=round(r["duration"] * 1000, 3))
+        del entry["duration"]
+        lines.append(json.dumps(entry, sort_keys=True))
+    return "".join(line + "\n" for line in lines)
+
+def to_prometheus(prefix="alias_manager_phase"):
+    """Per-phase totals in the Prometheus text exposition format."""
+    phases = summary()
+    out = [f"# HELP {prefix}_seconds Time spent in each AliasManager phase.",
+           f"# TYPE {prefix}_seconds summary"]
+    for name, p in phases.items():
+        out.append(f'{prefix}_seconds_sum{{phase="{_label(name)}"}} {p["total"]:.6f}')
+        out.append(f'{prefix}_seconds_count{{phase="{_label(name)}"}} {p["count"]}')
+    out.append(f"# HELP {prefix}_max_seconds Slowest single call of each phase.")
+    out.append(f"# TYPE {prefix}_max_seconds gauge")
+    for name, p in phases.items():
+        out.append(f'{prefix}_max_seconds{{phase="{_label(name)}"}} {p["max"]:.6f}')
+    out.append(f"# HELP {prefix}_errors_total Calls of each phase that raised.")
+    out.append(f"# TYPE {prefix}_errors_total counter")
+    for name, p in phases.items():
+        out.append(f'{prefix}_errors_total{{phase="{_label(name)}"}} {p["errors"]}')
+    return "\n".join(out) + "\n"
+
+def export(path, fmt="jsonl"):
+    """Write the recorded spans to `path` as "jsonl" or "prometheus" text."""
+    text = to_prometheus() if fmt == "prometheus" else to_jsonl()
+    try:
+        with open(path, "w") as f:
+            f.write(text)
+    except Exception as e:
+        raise IOError(f"Could not write timing data to {path}: {e}")
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,287 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+
+DEFAULT_DEBOUNCE = 0.5
+POLL_INTERVAL = 2.0
+
+def diff_aliases(old, new):
+    """Return the (action, name, command) operations that turn alias dict old into new."""
+    ops = []
+    for name, command in new.items():
+        if name not in old:
+            ops.append(("create", name, command))
+        elif old[name] != command:
+            ops.append(("update", name, command))
+    for name in old:
+        if name not in new:
+            ops.append(("delete", name, None))
+    return ops
+
+class AliasFileSource:
+    """Aliases read from one or more files, re-read only when a file's mtime or size changed.
+
+    `paths` are the files the aliases come from; `load` returns the current alias dict
+    and defaults to the first path's cached ProfileIndex, which re-parses only the
+    managed block when the rest of the profile is unchanged.
+    """
+
+    def __init__(self, paths, load=None):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.load = load or self._load_profile
+        self.directories = sorted({os.path.dirname(p) for p in self.paths})
+        self.names = {os.path.basename(p) for p in self.paths}
+        self.stamp = None
+        self.aliases = {}
+
+    def refresh(self):
+        """Return the operations since the last refresh, or [] if no file changed."""
+        stamp = tuple(_stat_stamp(path) for path in self.paths)
+        if stamp == self.stamp:
+            return []
+        self.stamp = stamp
+        aliases = self.load()
+        ops = diff_aliases(self.aliases, aliases)
+        self.aliases = aliases
+        return ops
+
+    def _load_profile(self):
+        from profile_index import get_profile_index
+        if not os.path.exists(self.paths[0]):
+            return {}
+        return get_profile_index(self.paths[0]).aliases()
+
+def _stat_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class _PollingBackend:
+    """Fallback that reports a possible change every `interval` seconds; the sources then only stat()."""
+
+    def __init__(self, directories, names, paths=(), interval=POLL_INTERVAL):
+        self.interval = interval
+        self.next_check = time.monotonic() + interval
+
+    def wait(self, timeout=None):
+        remaining = self.next_check - time.monotonic()
+        time.sleep(max(0, remaining if timeout is None else min(timeout, remaining)))
+        if time.monotonic() < self.next_check:
+            return False
+        self.next_check = time.monotonic() + self.interval
+        return True
+
+    def close(self):
+        pass
+
+class _InotifyBackend:
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, directories, names, paths=()):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.names = names
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in directories:
+            # Watch the directory so editors that save by renaming a new file are seen too.
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            data = os.read(self.fd, 65536)
+            if self.names is None:
+                return True
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+                if os.fsdecode(name) in self.names:
+                    return True
+                offset += 16 + length
+
+    def close(self):
+        os.close(self.fd)
+
+class _KqueueBackend:
+    """macOS: vnode events on the watched files themselves.
+
+    A file that does not exist (yet) is covered by a watch on its directory, kept only
+    until the file appears. When a watched file is deleted or renamed away, as editors
+    and atomic saves do, only that file is registered again.
+    """
+
+    FILE_EVENTS = (select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND | select.KQ_NOTE_DELETE
+                   | select.KQ_NOTE_RENAME) if hasattr(select, "kqueue") else 0
+
+    def __init__(self, directories, names, paths=()):
+        self.paths = list(paths) or [os.path.join(d, n) for d in directories for n in names]
+        self.kq = select.kqueue()
+        self.fds = {}       # fd -> watched file path
+        self.dir_fds = {}   # fd -> directory watched for a missing file
+        for path in self.paths:
+            self._watch_file(path)
+        self._watch_missing()
+
+    def _add(self, path, fflags):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        self.kq.control([select.kevent(fd, filter=select.KQ_FILTER_VNODE,
+                                       flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR, fflags=fflags)], 0, 0)
+        return fd
+
+    def _watch_file(self, path):
+        if path in self.fds.values():
+            return
+        fd = self._add(path, self.FILE_EVENTS)
+        if fd is not None:
+            self.fds[fd] = path
+
+    def _watch_missing(self):
+        # Directories are only watched while one of their files is missing.
+        watched = set(self.fds.values())
+        needed = {os.path.dirname(p) for p in self.paths if p not in watched}
+        for fd, directory in list(self.dir_fds.items()):
+            if directory not in needed:
+                del self.dir_fds[fd]
+                os.close(fd)
+        for directory in needed - set(self.dir_fds.values()):
+            fd = self._add(directory, select.KQ_NOTE_WRITE)
+            if fd is not None:
+                self.dir_fds[fd] = directory
+
+    def wait(self, timeout=None):
+        events = self.kq.control(None, 16, timeout)
+        changed = False
+        for event in events:
+            path = self.fds.get(event.ident)
+            if path is not None and event.fflags & (select.KQ_NOTE_DELETE | select.KQ_NOTE_RENAME):
+                # The file was replaced or removed; closing the fd also drops its event.
+                del self.fds[event.ident]
+                os.close(event.ident)
+                self._watch_file(path)
+                changed = True
+            elif event.ident in self.dir_fds:
+                watched = set(self.fds.values())
+                for missing in [p for p in self.paths if p not in watched]:
+                    self._watch_file(missing)
+                changed = True
+        if changed:
+            self._watch_missing()
+        return bool(events)
+
+    def close(self):
+        for fd in list(self.fds) + list(self.dir_fds):
+            os.close(fd)
+        self.kq.close()
+
+class _WindowsChangeBackend:
+    FILE_NOTIFY_CHANGE_FILE_NAME = 0x01
+    FILE_NOTIFY_CHANGE_SIZE = 0x08
+    FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+    WAIT_OBJECT_0 = 0
+    INFINITE = 0xFFFFFFFF
+
+    def __init__(self, directories, names, paths=()):
+        import ctypes
+        self.kernel32 = ctypes.windll.kernel32
+        self.kernel32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        flags = (self.FILE_NOTIFY_CHANGE_FILE_NAME | self.FILE_NOTIFY_CHANGE_SIZE
+                 | self.FILE_NOTIFY_CHANGE_LAST_WRITE)
+        self.handles = []
+        for directory in directories:
+            handle = self.kernel32.FindFirstChangeNotificationW(directory, False, flags)
+            if handle in (None, ctypes.c_void_p(-1).value):
+                self.close()
+                raise OSError(f"FindFirstChangeNotification failed for {directory}")
+            self.handles.append(handle)
+
+    def wait(self, timeout=None):
+        import ctypes
+        handles = (ctypes.c_void_p * len(self.handles))(*self.handles)
+        ms = self.INFINITE if timeout is None else int(timeout * 1000)
+        result = self.kernel32.WaitForMultipleObjects(len(self.handles), handles, False, ms)
+        index = result - self.WAIT_OBJECT_0
+        if 0 <= index < len(self.handles):
+            self.kernel32.FindNextChangeNotification(ctypes.c_void_p(self.handles[index]))
+            return True
+        return False
+
+    def close(self):
+        import ctypes
+        for handle in self.handles:
+            self.kernel32.FindCloseChangeNotification(ctypes.c_void_p(handle))
+        self.handles = []
+
+def make_backend(source, poll=False):
+    """Pick the native change notification for this platform, falling back to polling."""
+    if not poll:
+        if sys.platform.startswith("linux"):
+            candidates = [_InotifyBackend]
+        elif hasattr(select, "kqueue"):
+            candidates = [_KqueueBackend]
+        elif os.name == "nt":
+            candidates = [_WindowsChangeBackend]
+        else:
+            candidates = []
+        for backend in candidates:
+            try:
+                return backend(source.directories, source.names, source.paths)
+            except (OSError, AttributeError) as e:
+                logging.warning("%s unavailable, polling instead: %s", backend.__name__, e)
+    return _PollingBackend(source.directories, source.names, source.paths)
+
+def watch(source, on_change, debounce=DEFAULT_DEBOUNCE, poll=False, stop=None):
+    """Call on_change(ops) whenever the source's aliases change, until stop (an Event) is set.
+
+    The current aliases are taken as the baseline, so only later edits are reported.
+    A burst of writes is collected until the files have been quiet for `debounce`
+    seconds. Between changes the thread blocks in the OS notification call (or sleeps
+    between stat() calls when polling), so an idle watch costs next to nothing.
+    """
+    source.refresh()
+    backend = make_backend(source, poll)
+    logging.info("Watching %s for alias changes using %s.", ", ".join(source.directories),
+                 type(backend).__name__)
+    try:
+        while stop is None or not stop.is_set():
+            if not backend.wait(None if stop is None else 1.0):
+                continue
+            while backend.wait(debounce):
+                pass
+            try:
+                ops = source.refresh()
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    logging.warning("Could not read aliases while watching: %s", e)
+                continue
+            if ops:
+                logging.info("Detected %d alias change(s).", len(ops))
+                on_change(ops)
+    finally:
+        backend.close()